@@ -1,8 +1,8 @@
 -- change to chirpstack database
 \c chirpstack
 
--- delete already used HA api keys
-DELETE FROM api_key WHERE name = 'chirpha';
+-- delete already used HA api keys, except key cached by chirpha (id passed in variable cached_key_id)
+DELETE FROM api_key WHERE name = 'chirpha' AND id::text <> :'cached_key_id';
 
 -- exit psql
 \q
@@ -0,0 +1,424 @@
+"""Chirp2MQTT getHaDeviceInfo codec evaluation: JavaScript engines, worker pool and results cache."""
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import copy
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import re
+import resource
+import threading
+
+import dukpy
+
+try:
+    import quickjs
+except ImportError:
+    quickjs = None
+
+_LOGGER = logging.getLogger(__name__)
+
+_worker_engine = None
+
+
+def extract_codec(codec_script):
+    """Get getHaDeviceInfo function and code following it from profile codec script, None if function is missing."""
+    mi_start = re.search(r"function\s+getHaDeviceInfo", codec_script)
+    return codec_script[mi_start.start():] if mi_start else None
+
+
+class DukpyEngine:
+    """Duktape JavaScript engine (dukpy)."""
+
+    name = "dukpy"
+
+    @staticmethod
+    def available():
+        """Check if engine can be used."""
+        return True
+
+    def __init__(self) -> None:
+        """Create interpreter."""
+        self._interpreter = dukpy.JSInterpreter()
+
+    def evaluate(self, code):
+        """Evaluate code, return value of last statement."""
+        return self._interpreter.evaljs(code)
+
+
+class QuickJsEngine:
+    """QuickJS JavaScript engine (quickjs)."""
+
+    name = "quickjs"
+
+    @staticmethod
+    def available():
+        """Check if engine can be used."""
+        return quickjs is not None
+
+    def __init__(self) -> None:
+        """Create interpreter context."""
+        self._context = quickjs.Context()
+
+    def evaluate(self, code):
+        """Evaluate code, return value of last statement."""
+        return self._context.eval(code)
+
+
+JS_ENGINES = {engine.name: engine for engine in (DukpyEngine, QuickJsEngine)}
+
+
+def select_js_engine(name):
+    """Get JavaScript engine class by name, default engine if requested one is unknown or not installed."""
+    engine = JS_ENGINES.get(name)
+    if not engine or not engine.available():
+        _LOGGER.warning("JavaScript engine '%s' is not available, using '%s'", name, DukpyEngine.name)
+        engine = DukpyEngine
+    return engine
+
+
+def evaluate_ha_device_info(engine, codec_code):
+    """Evaluate getHaDeviceInfo codec with engine, return discovery data json."""
+    return engine.evaluate(codec_code+"; JSON.stringify(getHaDeviceInfo())")
+
+
+class NotLiteralCodec(Exception):
+    """Codec is not plain object literal return, engine evaluation is needed."""
+
+
+class LiteralCodecParser:
+    """Parser of getHaDeviceInfo codecs returning object literal, discovery data is built without JavaScript engine."""
+
+    HEADER = re.compile(r"function\s+getHaDeviceInfo\s*\(\s*\)\s*\{")
+    IDENTIFIER = re.compile(r"[A-Za-z_$][A-Za-z0-9_$]*")
+    NUMBER = re.compile(r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+    ARRAY_INDEX = re.compile(r"0|[1-9]\d*")
+    ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f", "v": "\v", "0": "\0", "\n": ""}
+    KEYWORDS = {"true": True, "false": False, "null": None}
+
+    def __init__(self, codec_code) -> None:
+        """Prepare codec source for parsing."""
+        self._code = codec_code
+        self._pos = 0
+
+    def parse(self):
+        """Get discovery data returned by getHaDeviceInfo, NotLiteralCodec raised if function holds any logic."""
+        header = self.HEADER.match(self._code)
+        if not header:
+            raise NotLiteralCodec("function header")
+        self._pos = header.end()
+        self.expect_word("return")
+        discovery = self.parse_value()
+        if not isinstance(discovery, dict):
+            raise NotLiteralCodec("returned value is not object")
+        self.skip_separators()
+        self.expect("}")
+        self.skip_separators()
+        if self._pos < len(self._code):
+            raise NotLiteralCodec("code after function")
+        return discovery
+
+    def skip_space(self):
+        """Skip white space and comments."""
+        while self._pos < len(self._code):
+            if self._code[self._pos].isspace():
+                self._pos += 1
+            elif self._code.startswith("//", self._pos):
+                end = self._code.find("\n", self._pos)
+                self._pos = len(self._code) if end < 0 else end + 1
+            elif self._code.startswith("/*", self._pos):
+                end = self._code.find("*/", self._pos + 2)
+                if end < 0:
+                    raise NotLiteralCodec("unterminated comment")
+                self._pos = end + 2
+            else:
+                break
+
+    def skip_separators(self):
+        """Skip white space, comments and empty statements."""
+        self.skip_space()
+        while self._code.startswith(";", self._pos):
+            self._pos += 1
+            self.skip_space()
+
+    def peek(self):
+        """Get next significant character, empty at end of code."""
+        self.skip_space()
+        return self._code[self._pos:self._pos + 1]
+
+    def expect(self, char):
+        """Consume expected character."""
+        if self.peek() != char:
+            raise NotLiteralCodec(f"'{char}' expected at {self._pos}")
+        self._pos += 1
+
+    def expect_word(self, word):
+        """Consume expected keyword."""
+        self.skip_space()
+        identifier = self.IDENTIFIER.match(self._code, self._pos)
+        if not identifier or identifier.group() != word:
+            raise NotLiteralCodec(f"'{word}' expected at {self._pos}")
+        self._pos = identifier.end()
+
+    def parse_value(self):
+        """Parse object, array, string, number or true/false/null literal."""
+        char = self.peek()
+        if char == "{":
+            return self.parse_object()
+        if char == "[":
+            return self.parse_array()
+        if char in ("'", '"'):
+            return self.parse_string()
+        number = self.NUMBER.match(self._code, self._pos)
+        if number:
+            self._pos = number.end()
+            value = float(number.group())
+            # JSON.stringify prints integral numbers below 1e21 without fraction
+            return int(value) if value.is_integer() and abs(value) < 1e21 else value
+        identifier = self.IDENTIFIER.match(self._code, self._pos)
+        if identifier and identifier.group() in self.KEYWORDS:
+            self._pos = identifier.end()
+            return self.KEYWORDS[identifier.group()]
+        raise NotLiteralCodec(f"expression at {self._pos}")
+
+    def parse_object(self):
+        """Parse object literal with identifier or string keys."""
+        self.expect("{")
+        result = {}
+        while self.peek() != "}":
+            if self.peek() in ("'", '"'):
+                key = self.parse_string()
+            else:
+                identifier = self.IDENTIFIER.match(self._code, self._pos)
+                if not identifier:
+                    raise NotLiteralCodec(f"object key at {self._pos}")
+                key = identifier.group()
+                self._pos = identifier.end()
+            if key == "__proto__" or self.ARRAY_INDEX.fullmatch(key):   # keys with special meaning/order in JavaScript
+                raise NotLiteralCodec(f"object key '{key}'")
+            self.expect(":")
+            result[key] = self.parse_value()
+            if self.peek() != ",":
+                break
+            self._pos += 1
+        self.expect("}")
+        return result
+
+    def parse_array(self):
+        """Parse array literal."""
+        self.expect("[")
+        result = []
+        while self.peek() != "]":
+            result.append(self.parse_value())
+            if self.peek() != ",":
+                break
+            self._pos += 1
+        self.expect("]")
+        return result
+
+    def parse_string(self):
+        """Parse single or double quoted string literal."""
+        quote = self.peek()
+        self._pos += 1
+        chars = []
+        while True:
+            if self._pos >= len(self._code):
+                raise NotLiteralCodec("unterminated string")
+            char = self._code[self._pos]
+            self._pos += 1
+            if char == quote:
+                return "".join(chars)
+            if char == "\n":
+                raise NotLiteralCodec("line break in string")
+            if char != "\\":
+                chars.append(char)
+                continue
+            escape = self._code[self._pos:self._pos + 1]
+            self._pos += 1
+            if escape in ("u", "x"):
+                digits = self._code[self._pos:self._pos + (4 if escape == "u" else 2)]
+                if len(digits) != (4 if escape == "u" else 2) or not all(c in "0123456789abcdefABCDEF" for c in digits):
+                    raise NotLiteralCodec("string escape")
+                chars.append(chr(int(digits, 16)))
+                self._pos += len(digits)
+            elif escape in self.ESCAPES:
+                if escape == "0" and self._code[self._pos:self._pos + 1].isdigit():
+                    raise NotLiteralCodec("octal escape")
+                chars.append(self.ESCAPES[escape])
+            elif escape and not escape.isdigit() and escape not in "\r\u2028\u2029":
+                chars.append(escape)
+            else:
+                raise NotLiteralCodec("string escape")
+
+
+def parse_literal_codec(codec_code):
+    """Get discovery data from getHaDeviceInfo returning object literal, None if codec needs JavaScript engine."""
+    try:
+        return LiteralCodecParser(codec_code).parse()
+    except NotLiteralCodec:
+        return None
+
+
+def init_codec_worker(memory_limit):
+    """Limit codec evaluation worker process address space, limit in MB, 0 for no limit."""
+    if memory_limit:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit * 1024 * 1024, memory_limit * 1024 * 1024))
+
+
+def evaluate_codec(engine_name, codec_code):
+    """Evaluate getHaDeviceInfo codec in worker process engine, return discovery data json."""
+    global _worker_engine  # pylint: disable=global-statement
+    if not _worker_engine:
+        _worker_engine = JS_ENGINES[engine_name]()
+    return evaluate_ha_device_info(_worker_engine, codec_code)
+
+
+class CodecEvaluator:
+    """getHaDeviceInfo codec evaluation, inline or in worker processes with time and memory limits."""
+
+    def __init__(self, engine=DukpyEngine.name, workers=0, timeout=0, memory_limit=0, tasks_per_worker=None) -> None:
+        """Prepare engine for inline evaluation or worker process pool if workers are requested."""
+        self._engine_class = select_js_engine(engine)
+        self._workers = workers
+        self._timeout = timeout if timeout else None
+        self._memory_limit = memory_limit
+        self._tasks_per_worker = tasks_per_worker if tasks_per_worker else None
+        self._lock = threading.Lock()
+        self._pool = None
+        self._engine = None
+        if self._workers:
+            self._pool = self.start_pool()
+            _LOGGER.debug("Codec evaluation pool started with %s worker(s), engine %s", self._workers, self._engine_class.name)
+        else:
+            self._engine = self._engine_class()
+
+    def start_pool(self):
+        """Start worker process pool, spawned workers do not inherit grpc/mqtt client threads."""
+        return ProcessPoolExecutor(
+            max_workers=self._workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_codec_worker,
+            initargs=(self._memory_limit,),
+            max_tasks_per_child=self._tasks_per_worker,
+        )
+
+    def restart_pool(self, pool):
+        """Replace pool with new one if pool is still current, terminate its workers (runaway evaluations included)."""
+        with self._lock:
+            if self._pool is not pool:
+                return
+            self._pool = self.start_pool()
+        self.stop_pool(pool)
+
+    @staticmethod
+    def stop_pool(pool):
+        """Terminate pool workers without waiting for evaluations in progress."""
+        for process in list((getattr(pool, "_processes", None) or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def evaluate(self, codec_code):
+        """Evaluate getHaDeviceInfo codec, return discovery data json."""
+        if not self._pool:
+            with self._lock:
+                return evaluate_ha_device_info(self._engine, codec_code)
+        for attempt in range(2):    # evaluation is repeated once if pool is restarted by another evaluation
+            pool = self._pool
+            try:
+                return pool.submit(evaluate_codec, self._engine_class.name, codec_code).result(timeout=self._timeout)
+            except TimeoutError:
+                self.restart_pool(pool)
+                raise Exception(f"codec evaluation exceeded {self._timeout} s")   # pylint: disable=broad-exception-raised
+            except BrokenProcessPool:
+                self.restart_pool(pool)
+                if attempt:
+                    raise
+        return None
+
+    def close(self):
+        """Stop worker processes."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool:
+            self.stop_pool(pool)
+
+
+class CodecCache:
+    """Discovery data cache keyed by codec source hash, optionally persisted to file, unused codecs are pruned."""
+
+    def __init__(self, cache_file=None) -> None:
+        """Prepare empty cache, load persisted cache if file is specified."""
+        self._cache_file = cache_file
+        self._cache = {}
+        self._used = set()  # keys read or stored since previous prune
+        self._modified = False
+        self._lock = threading.Lock()
+        if self._cache_file:
+            self.load()
+
+    @staticmethod
+    def codec_key(codec_code):
+        """Get cache key for codec source."""
+        return hashlib.sha256(codec_code.encode("utf-8")).hexdigest()
+
+    def get(self, codec_code):
+        """Get copy of cached discovery data for codec source, None if codec is not evaluated yet."""
+        key = self.codec_key(codec_code)
+        with self._lock:
+            discovery = self._cache.get(key)
+            if discovery is not None:
+                self._used.add(key)
+        return copy.deepcopy(discovery) if discovery is not None else None
+
+    def put(self, codec_code, discovery):
+        """Store copy of discovery data evaluated from codec source."""
+        key = self.codec_key(codec_code)
+        with self._lock:
+            self._cache[key] = copy.deepcopy(discovery)
+            self._used.add(key)
+            self._modified = True
+
+    def load(self):
+        """Load persisted cache, start with empty cache if file is missing or damaged."""
+        try:
+            with open(self._cache_file, "r") as file:
+                cache = json.load(file)
+            if isinstance(cache, dict):
+                self._cache = cache
+            _LOGGER.debug("Codec cache loaded from %s, %s codec(s)", self._cache_file, len(self._cache))
+        except FileNotFoundError:
+            pass
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            _LOGGER.warning("Codec cache file %s not loaded: %s", self._cache_file, str(error))
+
+    def prune(self):
+        """Drop codecs not read or stored since previous prune, called after all device profiles are evaluated."""
+        with self._lock:
+            unused = self._cache.keys() - self._used
+            for key in unused:
+                del self._cache[key]
+            self._used = set()
+            if unused:
+                self._modified = True
+        if unused:
+            _LOGGER.debug("%s codec(s) not used by device profiles dropped from codec cache", len(unused))
+
+    def save(self):
+        """Persist cache if file is specified and cache is modified since load or previous save."""
+        if not self._cache_file or not self._modified:
+            return
+        with self._lock:
+            cache = json.dumps(self._cache)
+            self._modified = False
+        try:
+            temp_file = f"{self._cache_file}.tmp"
+            with open(temp_file, "w") as file:
+                file.write(cache)
+            os.replace(temp_file, self._cache_file)
+            _LOGGER.debug("Codec cache saved to %s", self._cache_file)
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            _LOGGER.warning("Codec cache file %s not saved: %s", self._cache_file, str(error))
@@ -27,10 +27,62 @@ CONF_OPTIONS_EXPIRE_AFTER = "options_add_expire_after"
 DEFAULT_OPTIONS_LOG_LEVEL = "info"
 DEFAULT_OPTIONS_EXPIRE_AFTER = False
 DEFAULT_OPTIONS_ONLINE_PER_DEVICE = 0
+CONF_OPTIONS_PAGE_SIZE = "options_grpc_page_size"
+DEFAULT_OPTIONS_PAGE_SIZE = 100
+CONF_OPTIONS_RELOAD_WORKERS = "options_reload_workers"
+DEFAULT_OPTIONS_RELOAD_WORKERS = 4
+CONF_OPTIONS_RELOAD_IN_FLIGHT = "options_reload_in_flight"
+DEFAULT_OPTIONS_RELOAD_IN_FLIGHT = 16
+CONF_OPTIONS_GRPC_ASYNC = "options_grpc_async"
+DEFAULT_OPTIONS_GRPC_ASYNC = False
+CONF_OPTIONS_CODEC_CACHE_PERSIST = "options_codec_cache_persist"
+DEFAULT_OPTIONS_CODEC_CACHE_PERSIST = False
+CODEC_CACHE_FILE = "/data/codec_cache.json"
+CONF_OPTIONS_CODEC_WORKERS = "options_codec_workers"
+DEFAULT_OPTIONS_CODEC_WORKERS = 0
+CONF_OPTIONS_CODEC_TIMEOUT = "options_codec_timeout"
+DEFAULT_OPTIONS_CODEC_TIMEOUT = 10
+CONF_OPTIONS_CODEC_MEMORY_LIMIT = "options_codec_memory_limit"
+DEFAULT_OPTIONS_CODEC_MEMORY_LIMIT = 256
+CONF_OPTIONS_CODEC_WORKER_TASKS = "options_codec_worker_tasks"
+DEFAULT_OPTIONS_CODEC_WORKER_TASKS = 100
+CONF_OPTIONS_JS_ENGINE = "options_js_engine"
+DEFAULT_OPTIONS_JS_ENGINE = "dukpy"
+CONF_OPTIONS_CODEC_FAST_PATH = "options_codec_fast_path"
+DEFAULT_OPTIONS_CODEC_FAST_PATH = True
+CONF_OPTIONS_VISIBILITY_TTL = "options_visibility_ttl"
+DEFAULT_OPTIONS_VISIBILITY_TTL = 0
+CONF_OPTIONS_RELOAD_INCREMENTAL = "options_reload_incremental"
+DEFAULT_OPTIONS_RELOAD_INCREMENTAL = False
+CONF_OPTIONS_DISCOVERY_SNAPSHOT = "options_discovery_snapshot"
+DEFAULT_OPTIONS_DISCOVERY_SNAPSHOT = False
+DISCOVERY_SNAPSHOT_FILE = "/data/discovery_snapshot.json"
+DISCOVERY_SNAPSHOT_VERSION = 1
+CONF_OPTIONS_ONBOARD_ON_JOIN = "options_onboard_on_join"
+DEFAULT_OPTIONS_ONBOARD_ON_JOIN = False
+CONF_OPTIONS_MESSAGE_QUEUE = "options_message_queue"
+DEFAULT_OPTIONS_MESSAGE_QUEUE = False
+CONF_OPTIONS_ASYNCIO_RUNTIME = "options_asyncio_runtime"
+DEFAULT_OPTIONS_ASYNCIO_RUNTIME = False
+CONF_OPTIONS_DEVICE_WORKERS = "options_device_workers"
+DEFAULT_OPTIONS_DEVICE_WORKERS = 1
+CONF_OPTIONS_DISCOVERY_NODE_ID = "options_discovery_node_id"
+DEFAULT_OPTIONS_DISCOVERY_NODE_ID = False
+DISCOVERY_NODE_ID_FILE = "/data/discovery_node_id.json"
+CONF_OPTIONS_CONFIG_HASH = "options_config_hash"
+DEFAULT_OPTIONS_CONFIG_HASH = False
+CONFIG_HASH_FILE = "/data/config_hashes.json"
+CONF_OPTIONS_DEVICE_DISCOVERY = "options_device_discovery"
+DEFAULT_OPTIONS_DEVICE_DISCOVERY = False
+CONF_OPTIONS_COMPACT_DISCOVERY = "options_compact_discovery"
+DEFAULT_OPTIONS_COMPACT_DISCOVERY = False
+CONF_OPTIONS_DISCOVERY_TEMPLATES = "options_discovery_templates"
+DEFAULT_OPTIONS_DISCOVERY_TEMPLATES = False
 
 CHIRPSTACK_TENANT = "HA owned"
 CHIRPSTACK_APPLICATION = "HA integration"
 CHIRPSTACK_API_KEY_NAME = "chirpha"
+API_KEY_CACHE_FILE = "/data/chirpha_api_key.json"
 
 MQTT_ORIGIN = "ChirpLora"
 BRIDGE_VENDOR = "Chirp2MQTT"
@@ -0,0 +1,73 @@
+"""Chirp2MQTT device class registry: HA device class to MQTT integration index built from classes.json."""
+from __future__ import annotations
+
+import json
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class DeviceClassRegistry:
+    """Device class to integration index, device class listed for several integrations resolves to first listed one."""
+
+    def __init__(self, classes) -> None:
+        """Validate classes.json structure and build device class index."""
+        if not isinstance(classes, dict) or not isinstance(classes.get("integrations"), list):
+            raise ValueError("Device classes must be a dictionary with 'integrations' list")
+        self._integrations = tuple(classes["integrations"])
+        self._index = {}
+        self._conflicts = {}
+        self._unknown = set()   # negative cache: device classes looked up and not found, index is not changed after build
+        for integration in self._integrations:
+            device_classes = classes.get(integration)
+            if not isinstance(device_classes, list) or not all(isinstance(device_class, str) for device_class in device_classes):
+                raise ValueError(f"Device classes of integration '{integration}' must be a list of names")
+            for device_class in device_classes:
+                if device_class in self._index:
+                    self._conflicts.setdefault(device_class, [self._index[device_class]]).append(integration)
+                else:
+                    self._index[device_class] = integration
+        if self._conflicts:
+            _LOGGER.debug(
+                "%s device class(es) listed for several integrations, first listed used: %s",
+                len(self._conflicts),
+                self._conflicts,
+            )
+
+    @classmethod
+    def from_file(cls, file_name):
+        """Load registry from classes.json file."""
+        with open(file_name, "r") as file:
+            return cls(json.load(file))
+
+    def __len__(self):
+        """Get number of device classes in registry."""
+        return len(self._index)
+
+    def __contains__(self, device_class):
+        """Check if device class is known."""
+        return device_class in self._index
+
+    @property
+    def integrations(self):
+        """Get integrations in lookup order."""
+        return self._integrations
+
+    @property
+    def conflicts(self):
+        """Get device classes listed for several integrations: device class/integrations dictionary."""
+        return self._conflicts
+
+    def get_integration(self, device_class):
+        """Get integration for device class, None for unknown device class, unknown device class is looked up once."""
+        if device_class in self._unknown:
+            return None
+        integration = self._index.get(device_class)
+        if integration is None:
+            self._unknown.add(device_class)
+            _LOGGER.debug("Device class %s not found in device class registry", device_class)
+        return integration
+
+    def is_unknown(self, device_class):
+        """Check if device class was looked up and not found."""
+        return device_class in self._unknown
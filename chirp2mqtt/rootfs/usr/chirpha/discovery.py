@@ -0,0 +1,204 @@
+"""Chirp2MQTT compact discovery payloads: HA discovery key abbreviations and '~' base topic substitution."""
+from __future__ import annotations
+
+TOPIC_BASE = "~"
+
+ABBREVIATIONS = {
+    "action_template": "act_tpl",
+    "action_topic": "act_t",
+    "automation_type": "atype",
+    "availability": "avty",
+    "availability_mode": "avty_mode",
+    "availability_template": "avty_tpl",
+    "availability_topic": "avty_t",
+    "brightness_command_template": "bri_cmd_tpl",
+    "brightness_command_topic": "bri_cmd_t",
+    "brightness_scale": "bri_scl",
+    "brightness_state_topic": "bri_stat_t",
+    "brightness_value_template": "bri_val_tpl",
+    "command_template": "cmd_tpl",
+    "command_topic": "cmd_t",
+    "components": "cmps",
+    "current_temperature_template": "curr_temp_tpl",
+    "current_temperature_topic": "curr_temp_t",
+    "device": "dev",
+    "device_class": "dev_cla",
+    "enabled_by_default": "en",
+    "entity_category": "ent_cat",
+    "entity_picture": "ent_pic",
+    "expire_after": "exp_aft",
+    "force_update": "frc_upd",
+    "icon": "ic",
+    "json_attributes_template": "json_attr_tpl",
+    "json_attributes_topic": "json_attr_t",
+    "max_humidity": "max_hum",
+    "min_humidity": "min_hum",
+    "mode_command_template": "mode_cmd_tpl",
+    "mode_command_topic": "mode_cmd_t",
+    "mode_state_template": "mode_stat_tpl",
+    "mode_state_topic": "mode_stat_t",
+    "object_id": "obj_id",
+    "off_delay": "off_dly",
+    "optimistic": "opt",
+    "options": "ops",
+    "origin": "o",
+    "payload_available": "pl_avail",
+    "payload_close": "pl_cls",
+    "payload_lock": "pl_lock",
+    "payload_not_available": "pl_not_avail",
+    "payload_off": "pl_off",
+    "payload_on": "pl_on",
+    "payload_open": "pl_open",
+    "payload_press": "pl_prs",
+    "payload_stop": "pl_stop",
+    "payload_unlock": "pl_unlk",
+    "platform": "p",
+    "position_closed": "pos_clsd",
+    "position_open": "pos_open",
+    "position_template": "pos_tpl",
+    "position_topic": "pos_t",
+    "retain": "ret",
+    "set_position_template": "set_pos_tpl",
+    "set_position_topic": "set_pos_t",
+    "state_class": "stat_cla",
+    "state_closed": "stat_clsd",
+    "state_closing": "stat_closing",
+    "state_locked": "stat_locked",
+    "state_off": "stat_off",
+    "state_on": "stat_on",
+    "state_open": "stat_open",
+    "state_opening": "stat_opening",
+    "state_template": "stat_tpl",
+    "state_topic": "stat_t",
+    "state_unlocked": "stat_unlocked",
+    "state_value_template": "stat_val_tpl",
+    "suggested_display_precision": "sug_dsp_prc",
+    "target_humidity_command_template": "hum_cmd_tpl",
+    "target_humidity_command_topic": "hum_cmd_t",
+    "target_humidity_state_template": "hum_stat_tpl",
+    "target_humidity_state_topic": "hum_stat_t",
+    "temperature_command_template": "temp_cmd_tpl",
+    "temperature_command_topic": "temp_cmd_t",
+    "temperature_state_template": "temp_stat_tpl",
+    "temperature_state_topic": "temp_stat_t",
+    "temperature_unit": "temp_unit",
+    "topic": "t",
+    "unique_id": "uniq_id",
+    "unit_of_measurement": "unit_of_meas",
+    "value_template": "val_tpl",
+}
+
+DEVICE_ABBREVIATIONS = {
+    "configuration_url": "cu",
+    "connections": "cns",
+    "hw_version": "hw",
+    "identifiers": "ids",
+    "manufacturer": "mf",
+    "model": "mdl",
+    "model_id": "mdl_id",
+    "name": "name",
+    "serial_number": "sn",
+    "suggested_area": "sa",
+    "sw_version": "sw",
+    "via_device": "via_device",
+}
+
+ORIGIN_ABBREVIATIONS = {
+    "name": "name",
+    "support_url": "url",
+    "sw_version": "sw",
+}
+
+EXPANSIONS = {abbreviation: key for key, abbreviation in ABBREVIATIONS.items()}
+DEVICE_EXPANSIONS = {abbreviation: key for key, abbreviation in DEVICE_ABBREVIATIONS.items()}
+ORIGIN_EXPANSIONS = {abbreviation: key for key, abbreviation in ORIGIN_ABBREVIATIONS.items()}
+
+
+def is_topic_key(key):
+    """Check if discovery option holds a topic, the only options '~' base topic is applied to."""
+    return key == "topic" or key.endswith("_topic")
+
+
+def replace_keys(config, replacements):
+    """Get copy of discovery config with keys replaced, keys without replacement are kept."""
+    return {replacements.get(key, key): value for key, value in config.items()}
+
+
+def compact_discovery_config(discovery_config, base_topic=None):
+    """Get discovery config with abbreviated keys, topics starting with base topic are shortened to '~' prefix."""
+    if base_topic and TOPIC_BASE not in discovery_config:
+        shortened = shorten_topics(discovery_config, base_topic)
+        if shortened != discovery_config:
+            discovery_config = {TOPIC_BASE: base_topic} | shortened
+    return abbreviate(discovery_config)
+
+
+def shorten_topics(discovery_config, base_topic):
+    """Get copy of discovery config with base topic replaced by '~' in topics, nested availability/components included."""
+    prefix = base_topic + "/"
+    shortened = {}
+    for key, value in discovery_config.items():
+        if is_topic_key(key) and isinstance(value, str) and value.startswith(prefix):
+            value = TOPIC_BASE + value[len(base_topic):]
+        elif key == "availability" and isinstance(value, list):
+            value = [shorten_topics(element, base_topic) if isinstance(element, dict) else element for element in value]
+        elif key == "components" and isinstance(value, dict):
+            value = {
+                component_id: component if TOPIC_BASE in component else shorten_topics(component, base_topic)
+                for component_id, component in value.items()
+            }
+        shortened[key] = value
+    return shortened
+
+
+def abbreviate(discovery_config):
+    """Get copy of discovery config with HA abbreviated keys, nested device/origin/availability/components included."""
+    compact = {}
+    for key, value in discovery_config.items():
+        if key == "device" and isinstance(value, dict):
+            value = replace_keys(value, DEVICE_ABBREVIATIONS)
+        elif key == "origin" and isinstance(value, dict):
+            value = replace_keys(value, ORIGIN_ABBREVIATIONS)
+        elif key == "availability" and isinstance(value, list):
+            value = [replace_keys(element, ABBREVIATIONS) if isinstance(element, dict) else element for element in value]
+        elif key == "components" and isinstance(value, dict):
+            value = {component_id: abbreviate(component) for component_id, component in value.items()}
+        compact[ABBREVIATIONS.get(key, key)] = value
+    return compact
+
+
+def expand_discovery_config(discovery_config):
+    """Get discovery config with full key names and '~' base topic resolved, as processed by HA."""
+    expanded = {}
+    for key, value in discovery_config.items():
+        key = EXPANSIONS.get(key, key)
+        if key == "device" and isinstance(value, dict):
+            value = replace_keys(value, DEVICE_EXPANSIONS)
+        elif key == "origin" and isinstance(value, dict):
+            value = replace_keys(value, ORIGIN_EXPANSIONS)
+        elif key == "availability" and isinstance(value, list):
+            value = [replace_keys(element, EXPANSIONS) if isinstance(element, dict) else element for element in value]
+        elif key == "components" and isinstance(value, dict):
+            value = {component_id: expand_discovery_config(component) for component_id, component in value.items()}
+        expanded[key] = value
+    base_topic = expanded.pop(TOPIC_BASE, None)
+    if base_topic:
+        expanded = resolve_topic_base(expanded, base_topic)
+    return expanded
+
+
+def resolve_topic_base(discovery_config, base_topic):
+    """Get copy of discovery config with '~' prefix/suffix of topics replaced by base topic."""
+    resolved = {}
+    for key, value in discovery_config.items():
+        if is_topic_key(key) and isinstance(value, str):
+            if value.startswith(TOPIC_BASE):
+                value = base_topic + value[len(TOPIC_BASE):]
+            elif value.endswith(TOPIC_BASE):
+                value = value[:-len(TOPIC_BASE)] + base_topic
+        elif key == "availability" and isinstance(value, list):
+            value = [resolve_topic_base(element, base_topic) if isinstance(element, dict) else element for element in value]
+        elif key == "components" and isinstance(value, dict):
+            value = {component_id: resolve_topic_base(component, base_topic) for component_id, component in value.items()}
+        resolved[key] = value
+    return resolved
@@ -1,17 +1,30 @@
 """The Chirpstack LoRaWan integration - grpc interface to ChirpStack server."""
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
+import os
 import subprocess
-import dukpy
-import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
 
 from chirpstack_api import api
 import grpc
 
 from .const import CONF_API_PORT, CONF_API_SERVER, CONF_APPLICATION_ID, CHIRPSTACK_TENANT, CHIRPSTACK_APPLICATION, ERRMSG_CODEC_ERROR
-from .const import ERRMSG_DEVICE_IGNORED, WARMSG_APPID_WRONG, CHIRPSTACK_API_KEY_NAME, CONF_API_KEY
+from .const import ERRMSG_DEVICE_IGNORED, WARMSG_APPID_WRONG, CHIRPSTACK_API_KEY_NAME, CONF_API_KEY, API_KEY_CACHE_FILE
+from .const import CONF_OPTIONS_PAGE_SIZE, DEFAULT_OPTIONS_PAGE_SIZE, CONF_OPTIONS_RELOAD_WORKERS, DEFAULT_OPTIONS_RELOAD_WORKERS
+from .const import CONF_OPTIONS_RELOAD_IN_FLIGHT, DEFAULT_OPTIONS_RELOAD_IN_FLIGHT
+from .const import CONF_OPTIONS_CODEC_CACHE_PERSIST, DEFAULT_OPTIONS_CODEC_CACHE_PERSIST, CODEC_CACHE_FILE
+from .const import CONF_OPTIONS_CODEC_WORKERS, DEFAULT_OPTIONS_CODEC_WORKERS, CONF_OPTIONS_CODEC_TIMEOUT, DEFAULT_OPTIONS_CODEC_TIMEOUT
+from .const import CONF_OPTIONS_CODEC_MEMORY_LIMIT, DEFAULT_OPTIONS_CODEC_MEMORY_LIMIT, CONF_OPTIONS_CODEC_WORKER_TASKS
+from .const import DEFAULT_OPTIONS_CODEC_WORKER_TASKS, CONF_OPTIONS_JS_ENGINE, DEFAULT_OPTIONS_JS_ENGINE
+from .const import CONF_OPTIONS_CODEC_FAST_PATH, DEFAULT_OPTIONS_CODEC_FAST_PATH, CONF_OPTIONS_VISIBILITY_TTL, DEFAULT_OPTIONS_VISIBILITY_TTL
+from .codec import CodecCache, CodecEvaluator, extract_codec, parse_literal_codec
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -23,15 +36,30 @@ class ChirpGrpc:
         self._config = config
         self._version = version
         self._application_id = self._config.get(CONF_APPLICATION_ID)
-        self._channel = grpc.insecure_channel(
+        self._tenant_id = None
+        self._profile_cache = {}
+        self._profiles_updated_at = {}
+        self._device_state_cache = {}
+        self._visibility_cache = {}
+        self._visibility_lock = threading.Lock()    # visibility cache is used by device event and executor threads
+        self._visibility_ttl = float(self._config.get(CONF_OPTIONS_VISIBILITY_TTL, DEFAULT_OPTIONS_VISIBILITY_TTL))
+        self._page_size = int(self._config.get(CONF_OPTIONS_PAGE_SIZE, DEFAULT_OPTIONS_PAGE_SIZE))
+        self._reload_workers = int(self._config.get(CONF_OPTIONS_RELOAD_WORKERS, DEFAULT_OPTIONS_RELOAD_WORKERS))
+        self._reload_in_flight = max(int(self._config.get(CONF_OPTIONS_RELOAD_IN_FLIGHT, DEFAULT_OPTIONS_RELOAD_IN_FLIGHT)), 1)
+        self._profile_lock = threading.Lock()
+        self._codec_fast_path = self._config.get(CONF_OPTIONS_CODEC_FAST_PATH, DEFAULT_OPTIONS_CODEC_FAST_PATH)
+        self._codec_cache = CodecCache(
+            CODEC_CACHE_FILE
+            if self._config.get(CONF_OPTIONS_CODEC_CACHE_PERSIST, DEFAULT_OPTIONS_CODEC_CACHE_PERSIST)
+            else None
+        )
+        self._channel = self.open_channel(
             f"{self._config.get(CONF_API_SERVER)}:{self._config.get(CONF_API_PORT)}"
         )
         bearer = self._config.get(CONF_API_KEY)
         self._token_id = "external"
         if not bearer:
-            token_message = subprocess.run(["chirpstack", "-c", "/etc/chirpstack", "create-api-key", "--name", CHIRPSTACK_API_KEY_NAME], capture_output=True, text=True).stdout
-            self._token_id = token_message.split("id: ")[-1].split("\n")[0]
-            bearer = token_message.split("token: ")[-1].rstrip("\n")
+            self._token_id, bearer = self.get_api_key()
         self._auth_token = [("authorization", f"Bearer {bearer}")]
         _LOGGER.info(
             "gRPC channel opened for %s:%s, token id %s",
@@ -39,6 +67,69 @@ class ChirpGrpc:
             self._config.get(CONF_API_PORT),
             self._token_id,
         )
+        self.setup_application()
+        self._codec_evaluator = CodecEvaluator(
+            self._config.get(CONF_OPTIONS_JS_ENGINE, DEFAULT_OPTIONS_JS_ENGINE),
+            int(self._config.get(CONF_OPTIONS_CODEC_WORKERS, DEFAULT_OPTIONS_CODEC_WORKERS)),
+            float(self._config.get(CONF_OPTIONS_CODEC_TIMEOUT, DEFAULT_OPTIONS_CODEC_TIMEOUT)),
+            int(self._config.get(CONF_OPTIONS_CODEC_MEMORY_LIMIT, DEFAULT_OPTIONS_CODEC_MEMORY_LIMIT)),
+            int(self._config.get(CONF_OPTIONS_CODEC_WORKER_TASKS, DEFAULT_OPTIONS_CODEC_WORKER_TASKS)),
+        )
+        _LOGGER.info("ChirpStack application ID %s", self._application_id)
+
+    def open_channel(self, target):
+        """Open grpc channel to api server."""
+        return grpc.insecure_channel(target)
+
+    def get_api_key(self):
+        """Get cached api key id/token if accepted by api server, otherwise create new key with ChirpStack and cache it."""
+        api_key = self.load_api_key()
+        if api_key and self.is_valid_api_key(api_key["token"]):
+            _LOGGER.info("Cached api key %s reused", api_key["id"])
+            return api_key["id"], api_key["token"]
+        token_message = subprocess.run(["chirpstack", "-c", "/etc/chirpstack", "create-api-key", "--name", CHIRPSTACK_API_KEY_NAME], capture_output=True, text=True).stdout
+        token_id = token_message.split("id: ")[-1].split("\n")[0]
+        bearer = token_message.split("token: ")[-1].rstrip("\n")
+        self.save_api_key(token_id, bearer)
+        return token_id, bearer
+
+    @staticmethod
+    def load_api_key():
+        """Load api key id/token from cache file, None if not cached."""
+        try:
+            with open(API_KEY_CACHE_FILE, "r") as file:
+                api_key = json.load(file)
+            return api_key if api_key.get("id") and api_key.get("token") else None
+        except FileNotFoundError:
+            return None
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            _LOGGER.info("Api key cache file %s not loaded: %s", API_KEY_CACHE_FILE, str(error))
+            return None
+
+    @staticmethod
+    def save_api_key(token_id, bearer):
+        """Save api key id/token to cache file readable by owner only."""
+        try:
+            temp_file = f"{API_KEY_CACHE_FILE}.tmp"
+            with os.fdopen(os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as file:
+                json.dump({"id": token_id, "token": bearer}, file)
+            os.replace(temp_file, API_KEY_CACHE_FILE)
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            _LOGGER.info("Api key not cached to %s: %s", API_KEY_CACHE_FILE, str(error))
+
+    def is_valid_api_key(self, bearer):
+        """Check api key validity with api server."""
+        tenants = api.TenantServiceStub(self._channel)
+        listTenantsReq = api.ListTenantsRequest()
+        listTenantsReq.limit = 1
+        try:
+            tenants.List(listTenantsReq, metadata=[("authorization", f"Bearer {bearer}")])
+        except Exception:
+            return False
+        return True
+
+    def setup_application(self):
+        """Check application id, select or create tenant/application on api server if application id is not valid."""
         if not self.is_valid_app_id( self._application_id):
             tenants_on_chirp = self.get_chirp_tenants()
             if len(tenants_on_chirp) == 0:
@@ -67,32 +158,37 @@ class ChirpGrpc:
                 break
             _LOGGER.warning(WARMSG_APPID_WRONG, self._application_id, application_id, tenant, application)
             self._application_id = application_id
-        self.js_interpreter = dukpy.JSInterpreter()
-        _LOGGER.info("ChirpStack application ID %s", self._application_id)
+            self._tenant_id = tenant_id
+
+    def list_pages(self, list_call, list_request):
+        """Iterate over api server list call results page by page, page size limited by configuration."""
+        list_request.limit = self._page_size
+        list_request.offset = 0
+        while True:
+            listResp = list_call(list_request, metadata=self._auth_token)
+            yield listResp.result
+            list_request.offset += len(listResp.result)
+            if len(listResp.result) < list_request.limit or list_request.offset >= listResp.total_count:
+                break
+
+    def list_items(self, list_call, list_request):
+        """Iterate over api server list call results item by item, items are requested page by page."""
+        for page in self.list_pages(list_call, list_request):
+            yield from page
 
     def get_chirp_tenants(self):
         """Get tenant list from api server, build name/id dictionary and return."""
         tenants = api.TenantServiceStub(self._channel)
         listTenantsReq = api.ListTenantsRequest()
-        tenantsResp = tenants.List(listTenantsReq, metadata=self._auth_token)
-        listTenantsReq.limit = tenantsResp.total_count
-        tenantsResp = tenants.List(listTenantsReq, metadata=self._auth_token)
-        return {tenant.name: tenant.id for tenant in tenantsResp.result}
+        return {tenant.name: tenant.id for tenant in self.list_items(tenants.List, listTenantsReq)}
 
     def get_tenant_applications(self, tenant_id):
         """Get applications list from api server, build name/id dictionary and return."""
         applications = api.ApplicationServiceStub(self._channel)
         listApplicationsReq = api.ListApplicationsRequest()
         listApplicationsReq.tenant_id = tenant_id
-        applicationsResp = applications.List(
-            listApplicationsReq, metadata=self._auth_token
-        )
-        listApplicationsReq.limit = applicationsResp.total_count
-        applicationsResp = applications.List(
-            listApplicationsReq, metadata=self._auth_token
-        )
         return {
-            application.name: application.id for application in applicationsResp.result
+            application.name: application.id for application in self.list_items(applications.List, listApplicationsReq)
         }
 
     def is_valid_app_id(self, application_id):
@@ -101,20 +197,23 @@ class ChirpGrpc:
         applicationReq = api.GetApplicationRequest()
         applicationReq.id = application_id
         try:
-            application.Get( applicationReq, metadata=self._auth_token )
+            applicationResp = application.Get( applicationReq, metadata=self._auth_token )
         except Exception:
             return False
+        self._tenant_id = applicationResp.application.tenant_id
         return True
 
-    def get_chirp_app_devices(self):
-        """Get application's devices from api server."""
+    def get_chirp_app_device_pages(self):
+        """Iterate over application's devices pages from api server."""
         devices = api.DeviceServiceStub(self._channel)
         listDevicesReq = api.ListDevicesRequest()
         listDevicesReq.application_id = self._application_id
-        devicesResp = devices.List(listDevicesReq, metadata=self._auth_token)
-        listDevicesReq.limit = devicesResp.total_count
-        devicesResp = devices.List(listDevicesReq, metadata=self._auth_token)
-        return devicesResp.result
+        return self.list_pages(devices.List, listDevicesReq)
+
+    def get_chirp_app_devices(self):
+        """Iterate over application's devices from api server."""
+        for page in self.get_chirp_app_device_pages():
+            yield from page
 
     #   [desc.name for desc, val in deviceReq.ListFields()]
     def get_chirp_device(self, dev_eui):
@@ -125,105 +224,521 @@ class ChirpGrpc:
         device_details = device.Get(deviceReq, metadata=self._auth_token)
         return device_details
 
+    def get_chirp_device_profiles(self):
+        """Get tenant's device profiles list from api server, build id/updated_at dictionary and return."""
+        profiles = api.DeviceProfileServiceStub(self._channel)
+        listProfilesReq = api.ListDeviceProfilesRequest()
+        listProfilesReq.tenant_id = self._tenant_id
+        return {profile.id: profile.updated_at for profile in self.list_items(profiles.List, listProfilesReq)}
+
     def get_chirp_device_profile(self, device_profile_id):
-        """Get device profile details by id from api server."""
-        profile = api.DeviceProfileServiceStub(self._channel)
-        listDevicesReq = api.GetDeviceProfileRequest()
-        listDevicesReq.id = device_profile_id
-        return profile.Get(listDevicesReq, metadata=self._auth_token)
-
-    def isDeviceDisbled(self, dev_eui):
-        """Check if device with dev_eui is enabled by reading device details from api server."""
-        device = self.get_chirp_device(dev_eui)
-        return device.device.is_disabled
+        """Get device profile details by id from profile cache or api server."""
+        profile_details = self._profile_cache.get(device_profile_id)
+        if profile_details:
+            return profile_details
+        with self._profile_lock:    # concurrent reload workers wait for single profile read, cache not changed meanwhile
+            profile_details = self._profile_cache.get(device_profile_id)
+            if not profile_details:
+                profile = api.DeviceProfileServiceStub(self._channel)
+                getProfileReq = api.GetDeviceProfileRequest()
+                getProfileReq.id = device_profile_id
+                profile_details = profile.Get(getProfileReq, metadata=self._auth_token)
+                self._profile_cache[device_profile_id] = profile_details
+        return profile_details
+
+    def refresh_device_profile_cache(self):
+        """Drop cached device profiles that are removed or updated on api server since cached."""
+        self.drop_updated_profiles(self.get_chirp_device_profiles())
+
+    def drop_updated_profiles(self, profiles_updated_at):
+        """Drop cached device profiles missing in id/updated_at dictionary or with different updated_at, keep dictionary."""
+        self._profiles_updated_at = profiles_updated_at
+        with self._profile_lock:
+            for device_profile_id in list(self._profile_cache):
+                if self._profile_cache[device_profile_id].updated_at != profiles_updated_at.get(device_profile_id):
+                    del self._profile_cache[device_profile_id]
+        _LOGGER.debug("%s device profile(s) cached, %s profile(s) on server", len(self._profile_cache), len(profiles_updated_at))
+
+    def get_disabled_devices(self, devices):
+        """Get disabled devices set, details are read in one concurrent sweep for devices updated since previous check."""
+        device = api.DeviceServiceStub(self._channel)
+        device_futures = {}
+        for device_item in self.get_updated_devices(devices):
+            deviceReq = api.GetDeviceRequest()
+            deviceReq.dev_eui = device_item.dev_eui
+            device_futures[device_item.dev_eui] = (
+                device_item.updated_at,
+                device.Get.future(deviceReq, metadata=self._auth_token),
+            )
+        for dev_eui, (updated_at, device_future) in device_futures.items():
+            self._device_state_cache[dev_eui] = (updated_at, device_future.result().device.is_disabled)
+        _LOGGER.debug("Device state read for %s of %s device(s)", len(device_futures), len(devices))
+        return {device_item.dev_eui for device_item in devices if self._device_state_cache[device_item.dev_eui][1]}
+
+    def get_updated_devices(self, devices):
+        """Get devices with unknown state or updated on api server since state is cached."""
+        updated_devices = []
+        for device_item in devices:
+            device_state = self._device_state_cache.get(device_item.dev_eui)
+            if not device_state or device_state[0] != device_item.updated_at:
+                updated_devices.append(device_item)
+        return updated_devices
+
+    def drop_device_states(self, listed_devices):
+        """Drop cached device states for devices no longer listed on api server."""
+        for dev_eui in list(self._device_state_cache):
+            if dev_eui not in listed_devices:
+                del self._device_state_cache[dev_eui]
+
+    def get_enabled_app_devices(self):
+        """Iterate over application's enabled devices, disabled state is resolved page by page."""
+        listed_devices = set()
+        for devices in self.get_chirp_app_device_pages():
+            disabled_devices = self.get_disabled_devices(devices)
+            for device in devices:
+                listed_devices.add(device.dev_eui)
+                if device.dev_eui not in disabled_devices:
+                    yield device
+        self.drop_device_states(listed_devices)
 
     def close(self):
-        """Close grpc channel."""
+        """Close grpc channel, stop codec evaluation workers."""
         self._channel.close()
+        self._codec_evaluator.close()
 
-    def get_current_device_entities(self):
-        """Get enabled device list from api server."""
+    def get_current_device_entities(self, known_devices=None):
+        """Get enabled device list from api server, devices are processed concurrently keeping list order.
+
+        Devices with fingerprint matching known_devices (dev_eui/fingerprint dictionary) are not re-evaluated,
+        only their dev_eui and fingerprint are returned.
+        """
         devices_list = []
-        devices = self.get_chirp_app_devices()
-        for device in devices:
-            if self.isDeviceDisbled(device.dev_eui):
-                continue
-            profile = self.get_chirp_device_profile(device.device_profile_id)
+        self.refresh_device_profile_cache()
+        with ThreadPoolExecutor(max_workers=self._reload_workers, thread_name_prefix="chirp-reload") as executor:
+            in_flight = deque()
+            for device in self.get_enabled_app_devices():
+                if len(in_flight) >= self._reload_in_flight:
+                    devices_list.append(in_flight.popleft().result())
+                in_flight.append(executor.submit(self.get_device_discovery, device, known_devices))
+            while in_flight:
+                devices_list.append(in_flight.popleft().result())
+        if not known_devices:   # codecs of all device profiles evaluated or read from cache
+            self._codec_cache.prune()
+        self._codec_cache.save()
+        return [discovery for discovery in devices_list if discovery]
+
+    def get_device_discovery(self, device, known_devices=None):
+        """Get device discovery data from device profile codec, None for missing or faulty codec."""
+        fingerprint = self.get_device_fingerprint(device)
+        if known_devices and known_devices.get(device.dev_eui) == fingerprint:
+            return self.unchanged_device_discovery(device, fingerprint)
+        profile = self.get_chirp_device_profile(device.device_profile_id)
+        return self.add_device_fingerprint(self.build_device_discovery(device, profile), fingerprint)
+
+    def get_single_device_discovery(self, dev_eui):
+        """Get discovery data for device read by dev_eui, None for unknown, disabled, other application's device or faulty codec."""
+        try:
+            device_details = self.get_chirp_device(dev_eui)
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            _LOGGER.debug("Device %s not read from api server: %s", dev_eui, str(error))
+            return None
+        if device_details.device.application_id != self._application_id or device_details.device.is_disabled:
+            return None
+        device = SimpleNamespace(   # device list item attributes used to build discovery data
+            dev_eui=device_details.device.dev_eui,
+            name=device_details.device.name,
+            device_profile_id=device_details.device.device_profile_id,
+            updated_at=device_details.updated_at,
+            last_seen_at=device_details.last_seen_at,
+            device_status=device_details.device_status,
+        )
+        return self.get_device_discovery(device)
+
+    def get_device_fingerprint(self, device):
+        """Get device fingerprint changing with device or its profile update on api server."""
+        return f"{device.updated_at}/{device.device_profile_id}/{self._profiles_updated_at.get(device.device_profile_id)}"
+
+    @staticmethod
+    def unchanged_device_discovery(device, fingerprint):
+        """Get discovery data for device not changed since known fingerprint, previous values to restore included."""
+        return {"dev_conf": {"dev_eui": device.dev_eui, "fingerprint": fingerprint, "prev_value": ChirpGrpc.get_previous_values(device)}}
+
+    @staticmethod
+    def get_previous_values(device):
+        """Get device values known by api server to restore after bridge start: battery level of battery powered device."""
+        if device.device_status.external_power_source:
+            return {}
+        return {"batteryLevel": device.device_status.battery_level}
+
+    @staticmethod
+    def add_device_fingerprint(discovery, fingerprint):
+        """Add device fingerprint to discovery data."""
+        if discovery:
+            discovery["dev_conf"]["fingerprint"] = fingerprint
+        return discovery
+
+    def build_device_discovery(self, device, profile):
+        """Build device discovery data from device details and profile codec, None for missing or faulty codec."""
+        discovery = None
+        codec_code = None
+        codec_json = None
+        try:
+            codec_code = extract_codec(profile.device_profile.payload_codec_script)
+            if codec_code:
+                discovery = self._codec_cache.get(codec_code)
+                if discovery is None and self._codec_fast_path:
+                    discovery = parse_literal_codec(codec_code)
+                    if discovery is not None:
+                        self._codec_cache.put(codec_code, discovery)
+                if discovery is None:
+                    codec_json = self._codec_evaluator.evaluate(codec_code)
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            _LOGGER.error(
+                ERRMSG_CODEC_ERROR,
+                profile.device_profile.name,
+                str(error),
+                codec_code,
+                codec_json,
+            )
             discovery = None
-            codec_code = None
-            codec_json = None
+        if codec_json:
             try:
-                mi_start = re.search(r"function\s+getHaDeviceInfo", profile.device_profile.payload_codec_script)
-                if mi_start:
-                    i_start = mi_start.start()
-                    codec_code = profile.device_profile.payload_codec_script[i_start:]
-                    discovery = self.js_interpreter.evaljs(codec_code+"; JSON.stringify(getHaDeviceInfo())")
-                    codec_json = discovery
+                discovery = json.loads(codec_json)
+                self._codec_cache.put(codec_code, discovery)
             except Exception as error:  # pylint: disable=broad-exception-caught
-                _LOGGER.error(
-                    ERRMSG_CODEC_ERROR,
+                _LOGGER.debug(
+                    "Profile %s discovery codec script error '%s', source code '%s' converted to json '%s'",
                     profile.device_profile.name,
                     str(error),
                     codec_code,
                     codec_json,
                 )
                 discovery = None
-            if discovery:
-                try:
-                    discovery = json.loads(discovery)
-                except Exception as error:  # pylint: disable=broad-exception-caught
-                    _LOGGER.debug(
-                        "Profile %s discovery codec script error '%s', source code '%s' converted to json '%s'",
-                        profile.device_profile.name,
-                        str(error),
-                        codec_code,
-                        discovery,
-                    )
-                    discovery = None
-            if not discovery:
-                _LOGGER.error(
-                    ERRMSG_DEVICE_IGNORED,
-                    codec_code, codec_json,
-                    device.name,
-                    profile.device_profile.name,
-                )
-                continue
-            for entity, config in discovery["entities"].items():
-                discovery_config = config["entity_conf"]
-                if not discovery_config.get("value_template"):
-                    discovery_config[
-                        "value_template"
-                    ] = f"{{{{ value_json.object.{entity} }}}}"
-                discovery_config["uplink_interval"] = profile.device_profile.uplink_interval
-
-            mac_version = (
-                profile.device_profile.DESCRIPTOR.fields_by_name["mac_version"]
-                .enum_type.values_by_number[profile.device_profile.mac_version]
-                .name
+        if not discovery:
+            _LOGGER.error(
+                ERRMSG_DEVICE_IGNORED,
+                codec_code, codec_json,
+                device.name,
+                profile.device_profile.name,
             )
-            mac_version = (mac_version.replace("_", " ", 1)).replace("_", ".")
-            discovery["dev_conf"] = {
-                "last_seen": device.last_seen_at if str(device.last_seen_at) else None,
-                "sw_version": mac_version,
-                "dev_eui": device.dev_eui,
-                "dev_name": device.name,
-                "measurement_names": {
-                    entity: profile.device_profile.measurements[entity].name
-                    for entity in discovery["entities"]
-                },
-                "prev_value": {"batteryLevel": device.device_status.battery_level}
-                if not device.device_status.external_power_source
-                else {},
-            }
-            devices_list.append(discovery)
-        return devices_list
+            return None
+        for entity, config in discovery["entities"].items():
+            discovery_config = config["entity_conf"]
+            if not discovery_config.get("value_template"):
+                discovery_config[
+                    "value_template"
+                ] = f"{{{{ value_json.object.{entity} }}}}"
+            discovery_config["uplink_interval"] = profile.device_profile.uplink_interval
+
+        mac_version = (
+            profile.device_profile.DESCRIPTOR.fields_by_name["mac_version"]
+            .enum_type.values_by_number[profile.device_profile.mac_version]
+            .name
+        )
+        mac_version = (mac_version.replace("_", " ", 1)).replace("_", ".")
+        discovery["dev_conf"] = {
+            "codec_hash": CodecCache.codec_key(codec_code),
+            "last_seen": device.last_seen_at if str(device.last_seen_at) else None,
+            "sw_version": mac_version,
+            "dev_eui": device.dev_eui,
+            "dev_name": device.name,
+            "measurement_names": {
+                entity: profile.device_profile.measurements[entity].name
+                if entity in profile.device_profile.measurements
+                else ""
+                for entity in discovery["entities"]
+            },
+            "prev_value": self.get_previous_values(device),
+        }
+        return discovery
 
     def get_device_visibility_info(self, dev_eui):
+        """Get device visibility data: device last seen time stamp and expected uplink interval, cached for configured time."""
+        with self._visibility_lock:
+            cached = self._visibility_cache.get(dev_eui)
+        if cached and time.monotonic() - cached[0] < self._visibility_ttl:
+            return cached[1].copy()
+        try:
+            visibility = self.read_device_visibility_info(dev_eui)
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            if not cached:
+                raise
+            _LOGGER.warning("Device %s visibility data not refreshed, cached data used: %s", dev_eui, str(error))
+            return cached[1].copy()
+        if self._visibility_ttl:
+            with self._visibility_lock:
+                self._visibility_cache[dev_eui] = (time.monotonic(), visibility.copy())
+        return visibility
+
+    def is_device_visibility_cached(self, dev_eui):
+        """Check if device visibility data is served from cache without api server call."""
+        with self._visibility_lock:
+            cached = self._visibility_cache.get(dev_eui)
+        return bool(cached) and time.monotonic() - cached[0] < self._visibility_ttl
+
+    def update_device_last_seen(self, dev_eui, last_seen):
+        """Update cached device last seen time stamp from device uplink seen by bridge."""
+        with self._visibility_lock:
+            cached = self._visibility_cache.get(dev_eui)
+            if cached and last_seen > cached[1]["last_seen"]:
+                visibility = cached[1].copy()
+                visibility["last_seen"] = last_seen
+                self._visibility_cache[dev_eui] = (cached[0], visibility)
+
+    def read_device_visibility_info(self, dev_eui):
         """Get device visibility data from api server: device last seen time stamp and expected uplink interval."""
         device = self.get_chirp_device(dev_eui)
         profile = self.get_chirp_device_profile(device.device.device_profile_id)
+        return self.build_device_visibility(device, profile)
+
+    def build_device_visibility(self, device, profile):
+        """Build device visibility data from device details and profile."""
         visibility = {}
         visibility["uplink_interval"] = profile.device_profile.uplink_interval
         visibility["device_status_req_interval"] = profile.device_profile.device_status_req_interval
         visibility["last_seen"] = device.last_seen_at.seconds+device.last_seen_at.nanos*1e-9 if str(device.last_seen_at) else 0
         return visibility
+
+
+class AsyncChirpGrpc(ChirpGrpc):
+    """Chirp2MQTT grpc interface support built on grpc.aio, api calls run on client's own event loop thread."""
+
+    def __init__(self, config, version) -> None:
+        """Start event loop thread and open connection to ChirpStack api server."""
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, name="chirp-grpc-aio", daemon=True)
+        self._loop_thread.start()
+        self._async_profile_lock = asyncio.Lock()
+        try:
+            super().__init__(config, version)
+        except Exception:
+            self.stop_loop()
+            raise
+
+    def run(self, coroutine):
+        """Run coroutine on client's event loop and wait for result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def stop_loop(self):
+        """Stop client's event loop and wait for loop thread to finish."""
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join()
+        self._loop.close()
+
+    def open_channel(self, target):
+        """Open grpc.aio channel to api server within client's event loop."""
+        async def open_aio_channel():
+            return grpc.aio.insecure_channel(target)
+        return self.run(open_aio_channel())
+
+    def is_valid_api_key(self, bearer):
+        """Check api key validity with api server."""
+        return self.run(self.async_is_valid_api_key(bearer))
+
+    def setup_application(self):
+        """Check application id, select or create tenant/application on api server if application id is not valid."""
+        return self.run(self.async_setup_application())
+
+    def get_chirp_tenants(self):
+        """Get tenant list from api server, build name/id dictionary and return."""
+        return self.run(self.async_get_chirp_tenants())
+
+    def get_tenant_applications(self, tenant_id):
+        """Get applications list from api server, build name/id dictionary and return."""
+        return self.run(self.async_get_tenant_applications(tenant_id))
+
+    def is_valid_app_id(self, application_id):
+        """Check application id validity with api server."""
+        return self.run(self.async_is_valid_app_id(application_id))
+
+    def get_chirp_device(self, dev_eui):
+        """Get device details by dev_eui from api server."""
+        return self.run(self.async_get_chirp_device(dev_eui))
+
+    def get_chirp_device_profiles(self):
+        """Get tenant's device profiles list from api server, build id/updated_at dictionary and return."""
+        return self.run(self.async_get_chirp_device_profiles())
+
+    def get_chirp_device_profile(self, device_profile_id):
+        """Get device profile details by id from profile cache or api server."""
+        return self.run(self.async_get_chirp_device_profile(device_profile_id))
+
+    def get_current_device_entities(self, known_devices=None):
+        """Get enabled device list from api server, known devices with unchanged fingerprint are not re-evaluated."""
+        return self.run(self.async_get_current_device_entities(known_devices))
+
+    def read_device_visibility_info(self, dev_eui):
+        """Get device visibility data from api server: device last seen time stamp and expected uplink interval."""
+        return self.run(self.async_get_device_visibility_info(dev_eui))
+
+    def close(self):
+        """Close grpc channel and stop event loop, stop codec evaluation workers."""
+        self.run(self._channel.close())
+        self.stop_loop()
+        self._codec_evaluator.close()
+
+    async def async_setup_application(self):
+        """Check application id, select or create tenant/application on api server if application id is not valid."""
+        if not await self.async_is_valid_app_id(self._application_id):
+            tenants_on_chirp = await self.async_get_chirp_tenants()
+            if len(tenants_on_chirp) == 0:
+                tenant = api.TenantServiceStub(self._channel)
+                createTenantReq = api.CreateTenantRequest()
+                createTenantReq.tenant.name = CHIRPSTACK_TENANT
+                createTenantReq.tenant.can_have_gateways = True
+                createTenantReq.tenant.max_gateway_count = 1
+                tenantResp = await tenant.Create(createTenantReq, metadata=self._auth_token)
+                _LOGGER.info("Tenant '%s' (id %s) created", createTenantReq.tenant.name, tenantResp.id)
+                tenants_on_chirp = await self.async_get_chirp_tenants()
+            for tenant, id in tenants_on_chirp.items():
+                tenant_id = id
+                break
+            applications_on_chirp = await self.async_get_tenant_applications(tenant_id)
+            if len(applications_on_chirp) == 0:
+                application = api.ApplicationServiceStub(self._channel)
+                createApplicationReq = api.CreateApplicationRequest()
+                createApplicationReq.application.name = CHIRPSTACK_APPLICATION
+                createApplicationReq.application.tenant_id = tenant_id
+                applicationResp = await application.Create(createApplicationReq, metadata=self._auth_token)
+                _LOGGER.info("Application '%s' (id %s, tenant %s) created", createApplicationReq.application.name, tenant, applicationResp.id)
+                applications_on_chirp = await self.async_get_tenant_applications(tenant_id)
+            for application, id in applications_on_chirp.items():
+                application_id = id
+                break
+            _LOGGER.warning(WARMSG_APPID_WRONG, self._application_id, application_id, tenant, application)
+            self._application_id = application_id
+            self._tenant_id = tenant_id
+
+    async def async_list_pages(self, list_call, list_request):
+        """Iterate over api server list call results page by page, page size limited by configuration."""
+        list_request.limit = self._page_size
+        list_request.offset = 0
+        while True:
+            listResp = await list_call(list_request, metadata=self._auth_token)
+            yield listResp.result
+            list_request.offset += len(listResp.result)
+            if len(listResp.result) < list_request.limit or list_request.offset >= listResp.total_count:
+                break
+
+    async def async_list_items(self, list_call, list_request):
+        """Iterate over api server list call results item by item, items are requested page by page."""
+        async for page in self.async_list_pages(list_call, list_request):
+            for item in page:
+                yield item
+
+    async def async_is_valid_api_key(self, bearer):
+        """Check api key validity with api server."""
+        tenants = api.TenantServiceStub(self._channel)
+        listTenantsReq = api.ListTenantsRequest()
+        listTenantsReq.limit = 1
+        try:
+            await tenants.List(listTenantsReq, metadata=[("authorization", f"Bearer {bearer}")])
+        except Exception:
+            return False
+        return True
+
+    async def async_get_chirp_tenants(self):
+        """Get tenant list from api server, build name/id dictionary and return."""
+        tenants = api.TenantServiceStub(self._channel)
+        listTenantsReq = api.ListTenantsRequest()
+        return {tenant.name: tenant.id async for tenant in self.async_list_items(tenants.List, listTenantsReq)}
+
+    async def async_get_tenant_applications(self, tenant_id):
+        """Get applications list from api server, build name/id dictionary and return."""
+        applications = api.ApplicationServiceStub(self._channel)
+        listApplicationsReq = api.ListApplicationsRequest()
+        listApplicationsReq.tenant_id = tenant_id
+        return {
+            application.name: application.id async for application in self.async_list_items(applications.List, listApplicationsReq)
+        }
+
+    async def async_is_valid_app_id(self, application_id):
+        """Check application id validity with api server."""
+        application = api.ApplicationServiceStub(self._channel)
+        applicationReq = api.GetApplicationRequest()
+        applicationReq.id = application_id
+        try:
+            applicationResp = await application.Get( applicationReq, metadata=self._auth_token )
+        except Exception:
+            return False
+        self._tenant_id = applicationResp.application.tenant_id
+        return True
+
+    async def async_get_chirp_device(self, dev_eui):
+        """Get device details by dev_eui from api server."""
+        device = api.DeviceServiceStub(self._channel)
+        deviceReq = api.GetDeviceRequest()
+        deviceReq.dev_eui = dev_eui
+        return await device.Get(deviceReq, metadata=self._auth_token)
+
+    async def async_get_chirp_device_profiles(self):
+        """Get tenant's device profiles list from api server, build id/updated_at dictionary and return."""
+        profiles = api.DeviceProfileServiceStub(self._channel)
+        listProfilesReq = api.ListDeviceProfilesRequest()
+        listProfilesReq.tenant_id = self._tenant_id
+        return {profile.id: profile.updated_at async for profile in self.async_list_items(profiles.List, listProfilesReq)}
+
+    async def async_get_chirp_device_profile(self, device_profile_id):
+        """Get device profile details by id from profile cache or api server."""
+        profile_details = self._profile_cache.get(device_profile_id)
+        if profile_details:
+            return profile_details
+        async with self._async_profile_lock:    # concurrent requests wait for single profile read
+            profile_details = self._profile_cache.get(device_profile_id)
+            if not profile_details:
+                profile = api.DeviceProfileServiceStub(self._channel)
+                getProfileReq = api.GetDeviceProfileRequest()
+                getProfileReq.id = device_profile_id
+                profile_details = await profile.Get(getProfileReq, metadata=self._auth_token)
+                self._profile_cache[device_profile_id] = profile_details
+        return profile_details
+
+    async def async_get_disabled_devices(self, devices, in_flight):
+        """Get disabled devices set, details are read concurrently for devices updated since previous check."""
+        async def get_device_state(device_item):
+            async with in_flight:
+                device_details = await self.async_get_chirp_device(device_item.dev_eui)
+            self._device_state_cache[device_item.dev_eui] = (device_item.updated_at, device_details.device.is_disabled)
+        updated_devices = self.get_updated_devices(devices)
+        await asyncio.gather(*[get_device_state(device_item) for device_item in updated_devices])
+        _LOGGER.debug("Device state read for %s of %s device(s)", len(updated_devices), len(devices))
+        return {device_item.dev_eui for device_item in devices if self._device_state_cache[device_item.dev_eui][1]}
+
+    async def async_get_current_device_entities(self, known_devices=None):
+        """Get enabled device list from api server, devices are processed concurrently keeping list order."""
+        self.drop_updated_profiles(await self.async_get_chirp_device_profiles())
+        in_flight = asyncio.Semaphore(self._reload_in_flight)
+
+        async def get_device_discovery(device):
+            fingerprint = self.get_device_fingerprint(device)
+            if known_devices and known_devices.get(device.dev_eui) == fingerprint:
+                return self.unchanged_device_discovery(device, fingerprint)
+            async with in_flight:
+                profile = await self.async_get_chirp_device_profile(device.device_profile_id)
+            discovery = await asyncio.get_running_loop().run_in_executor(   # codec evaluation blocks, kept off event loop
+                None, self.build_device_discovery, device, profile
+            )
+            return self.add_device_fingerprint(discovery, fingerprint)
+
+        devices = api.DeviceServiceStub(self._channel)
+        listDevicesReq = api.ListDevicesRequest()
+        listDevicesReq.application_id = self._application_id
+        listed_devices = set()
+        devices_list = []
+        async for page in self.async_list_pages(devices.List, listDevicesReq):
+            disabled_devices = await self.async_get_disabled_devices(page, in_flight)
+            listed_devices.update(device.dev_eui for device in page)
+            devices_list.extend(
+                await asyncio.gather(*[get_device_discovery(device) for device in page if device.dev_eui not in disabled_devices])
+            )
+        self.drop_device_states(listed_devices)
+        if not known_devices:   # codecs of all device profiles evaluated or read from cache
+            self._codec_cache.prune()
+        self._codec_cache.save()
+        return [discovery for discovery in devices_list if discovery]
+
+    async def async_get_device_visibility_info(self, dev_eui):
+        """Get device visibility data from api server: device last seen time stamp and expected uplink interval."""
+        device = await self.async_get_chirp_device(dev_eui)
+        profile = await self.async_get_chirp_device_profile(device.device.device_profile_id)
+        return self.build_device_visibility(device, profile)
@@ -1,17 +1,26 @@
 """The Chirpstack LoRaWan integration - mqtt interface."""
 from __future__ import annotations
 
+import asyncio
 import datetime
 import json
 import logging
+import os
 import re
 import hashlib
 import threading
 import time
+import zlib
+from queue import SimpleQueue
 from zoneinfo import ZoneInfo
 
 import paho.mqtt.client as mqtt
 
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 from .const import (
     BRIDGE,
     BRIDGE_ENTITY_NAME,
@@ -45,18 +54,86 @@ from .const import (
     DEFAULT_OPTIONS_ONLINE_PER_DEVICE,
     DEFAULT_OPTIONS_START_DELAY,
     DEFAULT_OPTIONS_RESTORE_AGE,
+    CONF_OPTIONS_RELOAD_INCREMENTAL,
+    DEFAULT_OPTIONS_RELOAD_INCREMENTAL,
+    CONF_OPTIONS_DISCOVERY_SNAPSHOT,
+    DEFAULT_OPTIONS_DISCOVERY_SNAPSHOT,
+    DISCOVERY_SNAPSHOT_FILE,
+    DISCOVERY_SNAPSHOT_VERSION,
+    CONF_OPTIONS_ONBOARD_ON_JOIN,
+    DEFAULT_OPTIONS_ONBOARD_ON_JOIN,
+    CONF_OPTIONS_MESSAGE_QUEUE,
+    DEFAULT_OPTIONS_MESSAGE_QUEUE,
+    CONF_OPTIONS_DEVICE_WORKERS,
+    DEFAULT_OPTIONS_DEVICE_WORKERS,
+    CONF_OPTIONS_DISCOVERY_NODE_ID,
+    DEFAULT_OPTIONS_DISCOVERY_NODE_ID,
+    DISCOVERY_NODE_ID_FILE,
+    CONF_OPTIONS_CONFIG_HASH,
+    DEFAULT_OPTIONS_CONFIG_HASH,
+    CONFIG_HASH_FILE,
+    CONF_OPTIONS_DEVICE_DISCOVERY,
+    DEFAULT_OPTIONS_DEVICE_DISCOVERY,
+    CONF_OPTIONS_COMPACT_DISCOVERY,
+    DEFAULT_OPTIONS_COMPACT_DISCOVERY,
+    CONF_OPTIONS_DISCOVERY_TEMPLATES,
+    DEFAULT_OPTIONS_DISCOVERY_TEMPLATES,
 )
+from .device_classes import DeviceClassRegistry
+from .discovery import compact_discovery_config, expand_discovery_config
 from .grpc import ChirpGrpc
 
 _LOGGER = logging.getLogger(__name__)
 
 UTC_TIMEZONE = ZoneInfo("UTC")
+DEVICE_EVENTS = ("up", "cur", "join")   # device topics processed by device message worker
+DEVICE_SHARED_OPTIONS = ("availability", "state_topic")   # moved to device level if same for all components
+MIGRATE_DISCOVERY_PAYLOAD = '{"migrate_discovery": true}'
+TEMPLATE_SLOT_MARK = "\x00"
+TEMPLATE_DEV_EUI = "\x00DEV_EUI\x00"      # discovery template slot tokens, lower case tokens are
+TEMPLATE_DEV_NAME = "\x00DEV_NAME\x00"    # filled with lower case/no blanks values
 
 
 def to_lower_case_no_blanks(e_name):
     """Change string to lower case and replace blanks with _ ."""
     return e_name.lower().replace(" ", "_")
 
+def get_template_slots(value):
+    """Get discovery template slots tree: True for string with slot token, keys/indexes of nested slots, None for no slots."""
+    if isinstance(value, str):
+        return True if TEMPLATE_SLOT_MARK in value else None
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        items = enumerate(value)
+    else:
+        return None
+    slots = {key: item_slots for key, item in items if (item_slots := get_template_slots(item)) is not None}
+    return slots or None
+
+def fill_template_slots(value, slots, fields):
+    """Get copy of discovery template value with slot tokens replaced by field values, values without slots are shared."""
+    if slots is True:
+        for token, field in fields:
+            value = value.replace(token, field)
+        return value
+    value = value.copy()
+    for key, item_slots in slots.items():
+        value[key] = fill_template_slots(value[key], item_slots, fields)
+    return value
+
+def parse_event_time(event_time):
+    """Get time stamp of ChirpStack event time (RFC 3339, nanoseconds allowed), None for missing or malformed time."""
+    match = re.fullmatch(r"(.+T\d\d:\d\d:\d\d)(\.\d+)?(Z|[+-]\d\d:\d\d)", event_time) if isinstance(event_time, str) else None
+    if not match:
+        return None
+    try:    # fraction is cut to microseconds
+        return datetime.datetime.fromisoformat(
+            match[1] + (match[2] or "")[:7] + ("+00:00" if match[3] == "Z" else match[3])
+        ).timestamp()
+    except ValueError:
+        return None
+
 def generate_unique_id(configuration):
     """Create untegration unique id based on api/mqtt servers configurations."""
     u_id = "".join(
@@ -90,7 +167,7 @@ class ChirpToHA:
     """Chirpstack LoRaWan MQTT interface."""
 
     def __init__(
-        self, config, version, classes, grpc_client: ChirpGrpc, connectivity_check_only=False
+        self, config, version, classes: DeviceClassRegistry, grpc_client: ChirpGrpc, connectivity_check_only=False
     ) -> None:
         """Open connection to HA MQTT server and initialize internal variables."""
         self._config = config
@@ -102,7 +179,7 @@ class ChirpToHA:
         self._port = self._config.get(CONF_MQTT_PORT)
         self._user = self._config.get(CONF_MQTT_USER)
         self._pwd = self._config.get(CONF_MQTT_PWD)
-        self._classes = classes
+        self._classes: DeviceClassRegistry = classes
         self._dev_sensor_count = 0
         self._dev_count = 0
         self._last_update = None
@@ -119,9 +196,14 @@ class ChirpToHA:
         self._bridge_indentifier = to_lower_case_no_blanks(
             f"{BRIDGE_VENDOR} {BRIDGE} {self._unique_id}"
         )
+        self._discovery_node_id = to_lower_case_no_blanks(
+            f"{BRIDGE_VENDOR} {self._unique_id}"
+        ) if self._config.get(CONF_OPTIONS_DISCOVERY_NODE_ID, DEFAULT_OPTIONS_DISCOVERY_NODE_ID) else None
         self._ha_online_event = threading.Event()
         self._cur_delay_event = threading.Event()
         self._dev_check_event = threading.Event()
+        self._cur_lock = threading.Lock()
+        self._bridge_on_timer = None
         self._bridge_init_time = None
         self._cur_open_time = None
         self._live_on = False
@@ -137,6 +219,31 @@ class ChirpToHA:
         self._messages_to_restore_values = []
         self._top_level_msg_names = None
         self._values_cache = {}
+        self._values_lock = threading.Lock()    # values cache, device topics are updated in place while device events are routed
+        self._incremental_reload = self._config.get(CONF_OPTIONS_RELOAD_INCREMENTAL, DEFAULT_OPTIONS_RELOAD_INCREMENTAL)
+        self._device_snapshot = {}
+        self._discovery_snapshot = self._config.get(CONF_OPTIONS_DISCOVERY_SNAPSHOT, DEFAULT_OPTIONS_DISCOVERY_SNAPSHOT)
+        self._reconcile_stop_event = threading.Event()
+        self._bridge_lock = threading.Lock()    # serializes bridge tasks of other threads with message processing
+        self._onboard_on_join = self._config.get(CONF_OPTIONS_ONBOARD_ON_JOIN, DEFAULT_OPTIONS_ONBOARD_ON_JOIN)
+        self._onboard_ignored = set()
+        self._device_workers = max(1, int(self._config.get(CONF_OPTIONS_DEVICE_WORKERS, DEFAULT_OPTIONS_DEVICE_WORKERS)))
+        self._message_queue = (
+            self._config.get(CONF_OPTIONS_MESSAGE_QUEUE, DEFAULT_OPTIONS_MESSAGE_QUEUE) or self._device_workers > 1
+        ) and not connectivity_check_only
+        self._bridge_messages = SimpleQueue()
+        self._device_messages = [SimpleQueue() for _ in range(self._device_workers)]
+        self._config_hash = self._config.get(CONF_OPTIONS_CONFIG_HASH, DEFAULT_OPTIONS_CONFIG_HASH)
+        self._config_hashes = self.load_config_hashes()    # retained registrations seen on mqtt server, previous runs included
+        self._old_devices_config_topics.update(self._config_hashes)     # registrations of disappeared devices removed by first reload
+        self._pending_config_hashes = {}    # registrations published, not received back yet
+        self._device_discovery = self._config.get(CONF_OPTIONS_DEVICE_DISCOVERY, DEFAULT_OPTIONS_DEVICE_DISCOVERY)
+        self._component_device_configs = {}  # component unique_id: (device or node id discovery topic, payload)
+        self._migrated_config_topics = {}    # per entity registration topic: unique_id
+        self._compact_discovery = self._config.get(CONF_OPTIONS_COMPACT_DISCOVERY, DEFAULT_OPTIONS_COMPACT_DISCOVERY)
+        self._discovery_templates_on = self._config.get(CONF_OPTIONS_DISCOVERY_TEMPLATES, DEFAULT_OPTIONS_DISCOVERY_TEMPLATES)
+        self._discovery_templates = {}
+        self._config_topics_expected = 0
         self._config_topics_published = 0
         self._bridge_config_topics_published = -1
         self._initialize_topic = f"application/{self._application_id}/status"
@@ -147,13 +254,42 @@ class ChirpToHA:
         )
         self._ha_status = f"{self._discovery_prefix}/status"
         self._sub_cur_topic = f"application/{self._application_id}/device/+/event/cur"
+        self._topic_handlers = {
+            self._bridge_state_topic: self.process_bridge_state,
+            self._bridge_restart_topic: self.process_restart,
+            self._bridge_live_topic: self.process_live,
+            self._ha_status: self.process_ha_status,
+            self._initialize_topic: self.process_initialize,
+        }
+        self._device_event_handlers = {"up": self.process_up, "cur": self.process_cur, "join": self.process_join}
+        self._device_event_re = re.compile(
+            rf"application/{re.escape(self._application_id)}/device/([^/]+)/event/({'|'.join(DEVICE_EVENTS)})"
+        )
+        self._config_topics = [f"{self._discovery_prefix}/+/+/+/config"]
+        if self._device_discovery:
+            self._config_topics.append(f"{self._discovery_prefix}/device/+/config")
+        self._legacy_config_topics = []     # subscribed till registrations published without node id are removed
+        self._node_id_migrated = False
+        if self._discovery_node_id:    # only registrations published by bridge are received
+            self._node_id_migrated = self.is_node_id_migrated()
+            if not self._node_id_migrated:
+                self._legacy_config_topics = self._config_topics
+            self._config_topics = [f"{self._discovery_prefix}/+/{self._discovery_node_id}/+/config"]
+        else:   # registrations published without node id are to be migrated again once node id is set
+            self.drop_node_id_migration()
+        self._config_topic_re = re.compile(
+            "|".join(
+                re.escape(config_topic).replace(r"\+", "[^/]+")
+                for config_topic in self._config_topics + self._legacy_config_topics
+            )
+        )
         _LOGGER.info(
             "Connected to MQTT at %s:%s as %s",
             self._config.get(CONF_MQTT_SERVER),
             self._config.get(CONF_MQTT_PORT),
             self._config.get(CONF_MQTT_USER),
         )
-        self._client.on_message = self.on_message
+        self.start_message_processing()
 
         self.subscribe(self._initialize_topic)
         self.subscribe(self._ha_status)
@@ -177,6 +313,43 @@ class ChirpToHA:
         else:
             rc = self._client.loop_read(1)
 
+    def start_message_processing(self):
+        """Set MQTT message callback, start bridge and device message workers if message queue is requested."""
+        if self._message_queue:
+            self._client.on_message = self.queue_message
+            threading.Thread(target=self.message_worker, args=(self._bridge_messages,), name="chirp-bridge-messages", daemon=True).start()
+            for shard, message_queue in enumerate(self._device_messages):
+                threading.Thread(target=self.message_worker, args=(message_queue,), name=f"chirp-device-messages-{shard}", daemon=True).start()
+            _LOGGER.debug("Message workers started, %s device worker(s)", self._device_workers)
+        else:
+            self._client.on_message = self.on_message
+
+    def loop_forever(self):
+        """Run MQTT network loop till connection is closed."""
+        self._client.loop_forever()
+
+    def queue_message(self, client, userdata, message):
+        """MQTT network thread callback: queue device event for its device worker, any other message for bridge worker."""
+        route = self.route_topic(message.topic)
+        if route is None:
+            _LOGGER.detail("MQTT message rejected: topic %s", message.topic)
+        elif route[1]:  # device events are routed with device EUI
+            self._device_messages[self.device_shard(route[1][0])].put((self.process_message, (message, route)))
+        else:
+            self._bridge_messages.put((self.on_message, (client, userdata, message)))
+
+    def device_shard(self, dev_eui):
+        """Get device worker index for device, all events of device are processed by the same worker in arrival order."""
+        return zlib.crc32(dev_eui.encode("utf-8")) % self._device_workers
+
+    def message_worker(self, message_queue):
+        """Thread app to process queued messages/tasks in arrival order till stop request."""
+        while True:
+            task = message_queue.get()
+            if task is None:
+                break
+            task[0](*task[1])
+
     def on_connect(self, client, userdata, connect_flags, reason_code, properties):
         """MQTT api connection callback: throws error for failure cases."""
         self._client.on_connect = None
@@ -219,6 +392,11 @@ class ChirpToHA:
     def ha_online_waiter(self): # to start bridge if homeassistant/status message is not received within discovery timeout
         """Thread app to send HA online message after specified time."""
         if not self._ha_online_event.wait(self._discovery_delay+0.1):
+            self.ha_online_timeout()
+
+    def ha_online_timeout(self):
+        """Continue bridge configuration if HA online message is not received."""
+        if not self._ha_online_event.is_set():
             self._ha_online_event.set()
             self.publish( self._initialize_topic, "configure" )
             _LOGGER.debug("%ss timeout expired, but no HA online message received, bridge setup 'configure' message published",
@@ -237,8 +415,32 @@ class ChirpToHA:
             while time_delta > 0 and not self._cur_delay_event.wait(time_delta):
                 time_delta = self._cur_open_time + self._cur_age - time.time()
             _LOGGER.debug("Time to stop cur message watch")
-            self.disable_cur()
-            self._wait_for_cur = threading.Thread(target=self.cur_waiter)
+            with self._cur_lock:    # window can't be reopened before waiter thread is replaced
+                self.disable_cur()
+                self._wait_for_cur = threading.Thread(target=self.cur_waiter)
+
+    def start_ha_online_waiter(self):
+        """Start waiting for HA online message."""
+        self._wait_for_ha_online.start()
+
+    def start_dev_check_waiter(self):
+        """Start periodic device live status update."""
+        self._wait_for_dev_check.start()
+
+    def start_cur_waiter(self):
+        """Start waiting for cur window close time."""
+        self._wait_for_cur.start()
+        time.sleep(0)
+
+    def schedule_bridge_on(self, restore_messages):
+        """Turn bridge on after start delay, message processing continues meanwhile."""
+        self._bridge_on_timer = threading.Timer(self._discovery_delay, self.run_bridge_task, args=(self.turn_bridge_on, restore_messages))
+        self._bridge_on_timer.daemon = True
+        self._bridge_on_timer.start()
+
+    def start_reconciliation(self):
+        """Start discovery snapshot reconciliation with api server."""
+        threading.Thread(target=self.reconcile_devices, name="chirp-reconcile", daemon=True).start()
 
     def start_bridge(self):
         """Start Lora bridge registration within HA MQTT."""
@@ -369,68 +571,187 @@ class ChirpToHA:
             self._bridge_config_topics_published,
         )
 
-    def reload_devices(self):
+    def reload_devices(self, full_reload=True, device_sensors=None):
+        """Publish discovery messages for devices from api server or device list, not full reload publishes only changed devices."""
+        self.update_bridge_init_time()
+        if device_sensors is None:
+            known_devices = self.get_reload_known_devices(full_reload)
+            self.publish_devices(
+                self._grpc_client.get_current_device_entities(known_devices), known_devices is not None, True
+            )
+        else:
+            self.publish_devices(device_sensors, not full_reload and bool(self._device_snapshot), False)
+
+    def update_bridge_init_time(self):
+        """Set bridge initialization time stamp used to recognize registration messages of current reload."""
         self._bridge_init_time = time.time()
         _LOGGER.info(
             "Bridge initialization time stamp %s",
             self._bridge_init_time,
         )
 
-        device_sensors = self._grpc_client.get_current_device_entities()
+    def get_reload_known_devices(self, full_reload):
+        """Get dev_eui/fingerprint dictionary for incremental reload from api server, None for full reload."""
+        if self._incremental_reload and not full_reload and self._device_snapshot:
+            return self.get_known_devices()
+        return None
 
+    def publish_devices(self, device_sensors, incremental, from_server):
+        """Publish discovery messages for device list, devices without entities are not changed since previous reload."""
         self._dev_sensor_count = 0
         self._dev_count = 0
 
-        self._devices_config_topics = set()
         devices_config_topics = set()
+        published_config_topics = set()
         self._config_topics_published = 0
-        self._values_cache = {}
+        self._pending_config_hashes = {}
+        self._discovery_templates = {}     # compiled with current bridge time stamp
+        published_devices = set()   # values cache is reset for republished devices at the end
         self._messages_to_restore_values = []
         value_templates = []
+        device_snapshot = {}
+        component_configs = {}
 
         for device in device_sensors:
-            previous_values = device["dev_conf"].get("prev_value")
             dev_eui = device["dev_conf"]["dev_eui"]
-            self._values_cache[dev_eui] = {}
-            for sensor in device["entities"]:
-                sensor_entity_conf_data = self.get_conf_data(
-                    sensor,
-                    device["entities"][sensor],
-                    device["device"],
-                    device["dev_conf"],
-                )
-                for conf_key in sensor_entity_conf_data["discovery_config_struct"].keys():
-                    if conf_key.endswith("_template"):
-                        value_templates.append(sensor_entity_conf_data["discovery_config_struct"][conf_key])
-                devices_config_topics.add(sensor_entity_conf_data["discovery_topic"])
-                self.publish(
-                    sensor_entity_conf_data["discovery_topic"],
-                    sensor_entity_conf_data["discovery_config"],
-                    retain=True,
-                )
+            if "entities" not in device:    # not changed since previous reload, not published again
+                snapshot = self._device_snapshot[dev_eui]
+                device_snapshot[dev_eui] = snapshot
+                devices_config_topics.update(snapshot["config_topics"])
+                value_templates.extend(snapshot["value_templates"])
+                component_configs.update(snapshot.get("component_configs", {}))
+                self.queue_value_restore(snapshot["discovery"], device["dev_conf"].get("prev_value", {}))
+                self._dev_sensor_count += len(snapshot["config_topics"])
+                self._dev_count += 1
+                continue
+            published_devices.add(dev_eui)
+            device_snapshot[dev_eui] = self.publish_device_discovery(device)
+            self._dev_sensor_count += len(device_snapshot[dev_eui]["config_topics"])
+            self._dev_count += 1
+            devices_config_topics.update(device_snapshot[dev_eui]["config_topics"])
+            published_config_topics.update(device_snapshot[dev_eui]["config_topics"])
+            value_templates.extend(device_snapshot[dev_eui]["value_templates"])
+            component_configs.update(device_snapshot[dev_eui].get("component_configs", {}))
+
+        self._component_device_configs = component_configs
+        if self._config_hash:   # unchanged registrations are not published again
+            published_config_topics &= self._pending_config_hashes.keys()
+        self._config_topics_expected = len(published_config_topics)
+        self._device_snapshot = device_snapshot if self._incremental_reload or self._discovery_snapshot else {}
+        if from_server:
+            self.save_discovery_snapshot()
+
+        self._top_level_msg_names = self.add_top_level_msg_names({}, value_templates)
+        with self._values_lock:     # values of unchanged devices might be cached meanwhile by device workers
+            self._devices_config_topics.clear()
+            self._devices_config_topics.update(devices_config_topics)
+            self._onboard_ignored.clear()
+            for dev_eui in self._values_cache.keys() - device_snapshot.keys():
+                del self._values_cache[dev_eui]
+            for dev_eui in device_snapshot:
+                if dev_eui in published_devices or dev_eui not in self._values_cache:
+                    self._values_cache[dev_eui] = {}
+
+        _LOGGER.info(
+            "%s value(s) restore request(s) queued", len(self._messages_to_restore_values)
+        )
+        _LOGGER.info(
+            "Devices reloaded, %s device{s) and %s sensor(s) found",
+            self._dev_count,
+            self._dev_sensor_count,
+        )
+        if incremental or self._config_hash:
+            _LOGGER.info(
+                "%s reload, %s of %s discovery message(s) published",
+                "Incremental" if incremental else "Device",
+                self._config_topics_expected,
+                len(self._devices_config_topics),
+            )
+            if not self._config_topics_expected:    # no registration messages to wait for
+                self.clean_up_disappeared()
+
+    def publish_device_discovery(self, device):
+        """Publish discovery messages for device sensors, queue value restore requests, return device snapshot."""
+        dev_eui = device["dev_conf"]["dev_eui"]
+        previous_values = device["dev_conf"].get("prev_value")
+        device_config_topics = []
+        device_value_templates = []
+        device_components = {}
+        entity_configs = {}
+        for sensor in device["entities"]:
+            sensor_entity_conf_data = self.get_sensor_conf_data(
+                sensor,
+                device["entities"][sensor],
+                device["device"],
+                device["dev_conf"],
+            )
+            for conf_key in sensor_entity_conf_data["discovery_config_struct"].keys():
+                if conf_key.endswith("_template"):
+                    device_value_templates.append(sensor_entity_conf_data["discovery_config_struct"][conf_key])
+            if self._device_discovery:   # published as component of device discovery message
+                device_components[sensor] = sensor_entity_conf_data
+            elif self.publish_discovery_config(
+                sensor_entity_conf_data["discovery_topic"],
+                sensor_entity_conf_data["discovery_config"],
+            ):
                 _LOGGER.info(
                     f"Discovery message published: device {dev_eui} sensor '{sensor_entity_conf_data["discovery_topic"].split("/")[1]}'"
                 )
-                for sens_id in previous_values:
-                    if (
-                        sens_id
-                        in device["entities"][sensor]["entity_conf"]["value_template"]
-                    ):
-                        topic_for_value = sensor_entity_conf_data["status_topic"]
-                        payload_for_value = f'{{"{sens_id}":{str(previous_values[sens_id])},"time_stamp":{time.time()}}}'
-                        self._messages_to_restore_values.append(
-                            (topic_for_value, payload_for_value)
-                        )
-                self._dev_sensor_count += 1
-            self._dev_count += 1
+            if not self._device_discovery:
+                device_config_topics.append(sensor_entity_conf_data["discovery_topic"])
+                if self._legacy_config_topics:  # used to migrate registrations published without node id
+                    entity_configs[sensor_entity_conf_data["discovery_config_struct"]["unique_id"]] = (
+                        sensor_entity_conf_data["discovery_topic"], sensor_entity_conf_data["discovery_config"]
+                    )
+        self.queue_value_restore(device, previous_values)
+        device_snapshot = {
+            "fingerprint": device["dev_conf"].get("fingerprint"),
+            "config_topics": device_config_topics,
+            "value_templates": device_value_templates,
+            "discovery": device,
+        }
+        if entity_configs:
+            device_snapshot["component_configs"] = entity_configs
+        if device_components:
+            device_conf_data = self.get_device_conf_data(device["dev_conf"], device_components)
+            device_config_topics.append(device_conf_data["discovery_topic"])
+            if self.publish_discovery_config(device_conf_data["discovery_topic"], device_conf_data["discovery_config"]):
+                _LOGGER.info(
+                    "Device discovery message published: device %s, %s component(s)", dev_eui, len(device_components)
+                )
+            device_snapshot["component_configs"] = dict.fromkeys(   # used to migrate per entity registrations
+                device_conf_data["unique_ids"], (device_conf_data["discovery_topic"], device_conf_data["discovery_config"])
+            )
+        return device_snapshot
 
-        self._devices_config_topics = devices_config_topics
+    def queue_value_restore(self, device, previous_values):
+        """Queue restore requests of previous values for device sensors with value in their value template."""
+        for sensor in device["entities"].values():
+            for sens_id in previous_values:
+                if sens_id in sensor["entity_conf"]["value_template"]:
+                    payload_for_value = f'{{"{sens_id}":{str(previous_values[sens_id])},"time_stamp":{time.time()}}}'
+                    self._messages_to_restore_values.append(
+                        (self.get_status_topic(sensor, device["dev_conf"]), payload_for_value)
+                    )
+
+    def publish_discovery_config(self, discovery_topic, discovery_config):
+        """Publish retained discovery message, with config hash registration not changed since published is skipped."""
+        if self._config_hash:
+            config_hash = hashlib.md5(discovery_config.encode("utf-8")).hexdigest()
+            if self._config_hashes.get(discovery_topic) == config_hash:
+                _LOGGER.detail("Discovery message not changed, not published: topic %s", discovery_topic)
+                return False
+            self._pending_config_hashes[discovery_topic] = config_hash
+        self.publish(discovery_topic, discovery_config, retain=True)
+        return True
 
-        self._top_level_msg_names = {}
+    @staticmethod
+    def add_top_level_msg_names(top_level_msg_names, value_templates):
+        """Add message element names used in value templates to top level names tree, return tree."""
         for value_template in value_templates:
             for msg_name in re.findall(r"(value_json\..{1,}?)\ ", value_template):
                 names = re.split(r"\.", msg_name[11:])
-                level = self._top_level_msg_names
+                level = top_level_msg_names
                 for name in names:
                     name_t = re.split(r"\[", name)
                     if len(name_t) == 1:
@@ -441,30 +762,137 @@ class ChirpToHA:
                         if name_t[0] not in level:
                             level[name_t[0]] = [{}]
                         level = level[name_t[0]][0]
-        _LOGGER.debug("Top level names %s", self._top_level_msg_names)
+        _LOGGER.debug("Top level names %s", top_level_msg_names)
+        return top_level_msg_names
 
-        _LOGGER.info(
-            "%s value(s) restore request(s) queued", len(self._messages_to_restore_values)
-        )
-        _LOGGER.info(
-            "Devices reloaded, %s device{s) and %s sensor(s) found",
-            self._dev_count,
-            self._dev_sensor_count,
-        )
+    def request_onboarding(self, dev_eui):
+        """Onboard device not published yet, with message queue onboarding is queued for bridge worker."""
+        if self.is_device_known(dev_eui):
+            return
+        if self._message_queue:
+            self._bridge_messages.put((self.onboard_device, (dev_eui,)))
+        else:
+            self.onboard_device(dev_eui)
+
+    def is_device_known(self, dev_eui):
+        """Check if device is published or not onboarded till next reload."""
+        with self._values_lock:
+            return dev_eui in self._values_cache or dev_eui in self._onboard_ignored
+
+    def onboard_device(self, dev_eui):
+        """Publish discovery messages for device not published yet, device not onboarded is skipped till next reload."""
+        if self.is_device_known(dev_eui):
+            return
+        self.publish_onboarded_device(dev_eui, self._grpc_client.get_single_device_discovery(dev_eui))
+
+    def publish_onboarded_device(self, dev_eui, device):
+        """Publish discovery messages for onboarded device discovery data, remember device if it is not onboarded."""
+        if not device:
+            with self._values_lock:
+                self._onboard_ignored.add(dev_eui)
+            _LOGGER.info("Device %s not onboarded, skipped till next device reload", dev_eui)
+            return
+        device["dev_conf"]["prev_value"] = {}   # no values to restore for new device
+        device_snapshot = self.publish_device_discovery(device)
+        with self._values_lock:
+            self._values_cache[dev_eui] = {}
+            self._devices_config_topics.update(device_snapshot["config_topics"])
+        self._component_device_configs.update(device_snapshot.get("component_configs", {}))
+        self.add_top_level_msg_names(self._top_level_msg_names, device_snapshot["value_templates"])
+        self._dev_sensor_count += len(device_snapshot["config_topics"])
+        self._dev_count += 1
+        if self._incremental_reload or self._discovery_snapshot:
+            self._device_snapshot[dev_eui] = device_snapshot
+            self.save_discovery_snapshot()
+        _LOGGER.info("Device %s onboarded, %s sensor(s) published", dev_eui, len(device_snapshot["config_topics"]))
+
+    def get_known_devices(self):
+        """Get dev_eui/fingerprint dictionary of devices published by previous reload."""
+        return {dev_eui: snapshot["fingerprint"] for dev_eui, snapshot in self._device_snapshot.items()}
+
+    def reload_devices_from_snapshot(self):
+        """Publish discovery messages from discovery snapshot file and start reconciliation with api server."""
+        if not self._discovery_snapshot:
+            return False
+        try:
+            with open(DISCOVERY_SNAPSHOT_FILE, "r") as file:
+                snapshot = json.load(file)
+            if snapshot.get("version") != DISCOVERY_SNAPSHOT_VERSION or snapshot.get("application_id") != self._grpc_client._application_id:
+                _LOGGER.info("Discovery snapshot version or application id differs, snapshot ignored")
+                return False
+            device_sensors = snapshot["devices"]
+            for device in device_sensors:
+                device["dev_conf"]["prev_value"] = {}   # values are restored from api server data only
+        except FileNotFoundError:
+            return False
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            _LOGGER.warning("Discovery snapshot file %s not loaded: %s", DISCOVERY_SNAPSHOT_FILE, str(error))
+            return False
+        _LOGGER.info("Publishing %s device(s) from discovery snapshot saved at %s", len(device_sensors), snapshot.get("time_stamp"))
+        self.reload_devices(device_sensors=device_sensors)
+        self.start_reconciliation()
+        return True
+
+    def reconcile_devices(self):
+        """Thread app to read devices from api server and request reload for devices changed since snapshot."""
+        try:
+            device_sensors = self._grpc_client.get_current_device_entities(self.get_known_devices())
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            _LOGGER.error("Discovery snapshot reconciliation failed: %s", str(error))
+            return
+        if not self._reconcile_stop_event.is_set():
+            self.run_bridge_task(self.apply_reconciled_devices, device_sensors)
+            _LOGGER.info("Discovery snapshot reconciliation requested")
+
+    def run_bridge_task(self, callback, *args):
+        """Run bridge task requested by other thread: queued for bridge worker or serialized with message processing."""
+        if self._message_queue:
+            self._bridge_messages.put((callback, args))
+        else:
+            with self._bridge_lock:
+                callback(*args)
+
+    def apply_reconciled_devices(self, device_sensors):
+        """Publish devices changed since discovery snapshot, restore values of all devices, continue bridge configuration."""
+        if self._bridge_config_topics_published < 0:    # bridge start completed, enables value restoration
+            self._bridge_config_topics_published = 0
+        self.reload_devices(full_reload=False, device_sensors=device_sensors)
+        self.save_discovery_snapshot()
+        self.continue_configuration()
+
+    def save_discovery_snapshot(self):
+        """Save discovery data of published devices to discovery snapshot file."""
+        if not self._discovery_snapshot:
+            return
+        snapshot = {
+            "version": DISCOVERY_SNAPSHOT_VERSION,
+            "bridge_version": self._version,
+            "application_id": self._grpc_client._application_id,
+            "time_stamp": time.time(),
+            "devices": [device_snapshot["discovery"] for device_snapshot in self._device_snapshot.values()],
+        }
+        try:
+            temp_file = f"{DISCOVERY_SNAPSHOT_FILE}.tmp"
+            with open(temp_file, "w") as file:
+                json.dump(snapshot, file, default=str)
+            os.replace(temp_file, DISCOVERY_SNAPSHOT_FILE)
+            _LOGGER.debug("Discovery snapshot saved, %s device(s)", len(snapshot["devices"]))
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            _LOGGER.warning("Discovery snapshot file %s not saved: %s", DISCOVERY_SNAPSHOT_FILE, str(error))
 
     def enable_cur(self):
         """Enable cur window for restoring previous device values or updating live status."""
-        self._cur_open_time = time.time()
-        if not self._cur_opened_count:
-            ret_val = self.subscribe(self._sub_cur_topic)
-            _LOGGER.info(
-                "Subscribed to retained values topic%s at %s",
-                convert_ret_val(ret_val),
-                self._cur_open_time,
-            )
-            self._wait_for_cur.start()
-            time.sleep(0)
-        self._cur_opened_count += 1
+        with self._cur_lock:
+            self._cur_open_time = time.time()
+            if not self._cur_opened_count:
+                ret_val = self.subscribe(self._sub_cur_topic)
+                _LOGGER.info(
+                    "Subscribed to retained values topic%s at %s",
+                    convert_ret_val(ret_val),
+                    self._cur_open_time,
+                )
+                self.start_cur_waiter()
+            self._cur_opened_count += 1
 
     def disable_cur(self):
         """Disable cur window."""
@@ -475,15 +903,17 @@ class ChirpToHA:
             _LOGGER.info(
                 "Unsubscribed from retained values topic"
             )
+            with self._values_lock:
+                not_processed = len([dev_id for dev_id, val in self._values_cache.items() if val == {}])
             _LOGGER.debug(
                 "Not processed retained devices %s, processing age %s(s)",
-                len([dev_id for dev_id, val in self._values_cache.items() if val == {}]),
+                not_processed,
                 time.time() - self._cur_open_time,
             )
 
     def get_device_status(self, dev_eui):
         """Check device live status based on ChirpStack server information via gRPC interface."""
-        visibility = self._grpc_client.get_device_visibility_info(dev_eui)
+        visibility = self.get_device_visibility_info(dev_eui)
         if visibility["last_seen"] and visibility["uplink_interval"]:
             status = "online" if time.time()-visibility["last_seen"]<=visibility["uplink_interval"] else "offline"
         else:
@@ -493,187 +923,360 @@ class ChirpToHA:
         )
         return status
 
+    def get_device_visibility_info(self, dev_eui):
+        """Get device visibility data via gRPC interface."""
+        return self._grpc_client.get_device_visibility_info(dev_eui)
+
     def clean_up_disappeared(self):
         """Remove retained config messages from mqtt server if not in recent device list."""
         if self._old_devices_config_topics:
+            migrated_device_configs = {}
             for config_topic in (
                 self._old_devices_config_topics - self._devices_config_topics
             ):
+                device_config = self._component_device_configs.get(self._migrated_config_topics.get(config_topic))
+                if device_config:   # entity moved to device or node id discovery message, kept by HA when removed after migrate request
+                    self.publish(config_topic, MIGRATE_DISCOVERY_PAYLOAD, retain=True)
+                    migrated_device_configs[device_config[0]] = device_config[1]
                 self.publish(config_topic, None, retain=True)
                 _LOGGER.info(
                     "Removing retained topic %s", config_topic
                 )
-        self._old_devices_config_topics = self._devices_config_topics
+            for discovery_topic, discovery_config in migrated_device_configs.items():
+                self.publish(discovery_topic, discovery_config, retain=True)
+                _LOGGER.info("Discovery message %s published again after migration", discovery_topic)
+        self._old_devices_config_topics = set(self._devices_config_topics)
+        self._migrated_config_topics = {}
         self._config_topics_published = 0
+        if self._legacy_config_topics and not self._node_id_migrated:
+            self.save_node_id_migration()
+        if self._config_hash:
+            self.save_config_hashes()
+
+    def load_config_hashes(self):
+        """Load hashes of registrations seen on mqtt server by previous run, unchanged registrations are not published on start."""
+        if not self._config_hash:
+            return {}
+        try:
+            with open(CONFIG_HASH_FILE, "r") as file:
+                saved_hashes = json.load(file)
+            _LOGGER.info("%s registration hash(es) loaded, saved at %s", len(saved_hashes["config_hashes"]), saved_hashes.get("time_stamp"))
+            return saved_hashes["config_hashes"]
+        except FileNotFoundError:
+            return {}
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            _LOGGER.warning("Registration hash file %s not loaded: %s", CONFIG_HASH_FILE, str(error))
+            return {}
+
+    def save_config_hashes(self):
+        """Save hashes of registrations seen on mqtt server for next start."""
+        try:
+            temp_file = f"{CONFIG_HASH_FILE}.tmp"
+            with open(temp_file, "w") as file:
+                json.dump({"time_stamp": time.time(), "config_hashes": self._config_hashes}, file)
+            os.replace(temp_file, CONFIG_HASH_FILE)
+            _LOGGER.debug("Registration hashes saved, %s registration(s)", len(self._config_hashes))
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            _LOGGER.warning("Registration hash file %s not saved: %s", CONFIG_HASH_FILE, str(error))
+
+    def is_node_id_migrated(self):
+        """Check if registrations published without node id are removed by previous start with the same node id."""
+        try:
+            with open(DISCOVERY_NODE_ID_FILE, "r") as file:
+                return json.load(file).get("node_id") == self._discovery_node_id
+        except FileNotFoundError:
+            return False
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            _LOGGER.warning("Discovery node id file %s not loaded: %s", DISCOVERY_NODE_ID_FILE, str(error))
+            return False
+
+    def save_node_id_migration(self):
+        """Remember registrations published without node id are removed, next starts subscribe to node id topics only.
+
+        Discovery topics without node id stay subscribed till restart, retained node id registrations are not received again.
+        """
+        self._node_id_migrated = True
+        try:
+            temp_file = f"{DISCOVERY_NODE_ID_FILE}.tmp"
+            with open(temp_file, "w") as file:
+                json.dump({"node_id": self._discovery_node_id, "time_stamp": time.time()}, file)
+            os.replace(temp_file, DISCOVERY_NODE_ID_FILE)
+            _LOGGER.info("Registrations published without node id removed, node id discovery topics subscribed only from next start")
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            _LOGGER.warning("Discovery node id file %s not saved: %s", DISCOVERY_NODE_ID_FILE, str(error))
+
+    def drop_node_id_migration(self):
+        """Forget node id migration, registrations published without node id are removed again when node id is set."""
+        try:
+            os.remove(DISCOVERY_NODE_ID_FILE)
+        except FileNotFoundError:
+            pass
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            _LOGGER.warning("Discovery node id file %s not removed: %s", DISCOVERY_NODE_ID_FILE, str(error))
 
     def on_message(self, client, userdata, message):
-        """Process subscribed messages."""
+        """Process subscribed messages, continue bridge configuration."""
+        with self._bridge_lock:
+            self.process_message(message)
+            self.continue_configuration()
+
+    def route_topic(self, topic):
+        """Get message handler and its arguments for topic, None for device events not to be processed."""
+        handler = self._topic_handlers.get(topic)
+        if handler:
+            return handler, ()
+        match = self._device_event_re.fullmatch(topic)
+        if match:
+            dev_eui, event = match.groups()
+            with self._values_lock:     # devices might be reloaded or onboarded by bridge worker meanwhile
+                published = dev_eui in self._values_cache
+                ignored = dev_eui in self._onboard_ignored
+            if event == "up" and not published and not (self._onboard_on_join and not ignored):
+                return None
+            if event == "join" and (published or ignored):
+                return None
+            return self._device_event_handlers[event], (dev_eui,)
+        if self._config_topic_re.fullmatch(topic):
+            return self.process_config, ()
+        return None
+
+    def process_message(self, message, route=None):
+        """Process subscribed message, message is routed by topic if route is not given."""
         self._last_update = datetime.datetime.now(UTC_TIMEZONE)
+        route = route or self.route_topic(message.topic)
+        if route is None:
+            _LOGGER.detail("MQTT message rejected: topic %s", message.topic)
+            return
         payload = message.payload.decode("utf-8")
         _LOGGER.detail("MQTT message received: topic %s, payload %s, retain=%s", message.topic, payload, message.retain)
-        if message.topic == self._bridge_state_topic:
-            self._bridge_state_received = True
-            _LOGGER.info("Bridge state message received")
-            try:
-                logging.getLogger().setLevel(json.loads(payload).get("log_level").upper())
-            except Exception as error:
-                _LOGGER.error("Bridge state message processing failed: %s", str(error))
-        elif message.topic == self._bridge_restart_topic:
+        handler, args = route
+        handler(message, payload, *args)
+
+    def load_payload(self, message, payload):
+        """Get json payload of device/registration message, None for empty payload."""
+        payload_struct = json.loads(payload) if len(payload) > 2 else None
+        if not payload_struct:
             _LOGGER.info(
-                "Bridge restart requested"
+                "Ignoring topic %s with payload %s",
+                message.topic,
+                message.payload,
             )
-            self._bridge_config_topics_published = 0    # enables value restoration
-            self.reload_devices()
-        elif message.topic == self._bridge_live_topic:
-            _LOGGER.debug("Bridge device live status update requested")
-            if payload == "start":
-                self._live_on = True
-                self.enable_cur()
-        elif message.topic == self._ha_status:
-            if payload == "online":
-                self._ha_online_event.set()
-                self.publish( self._initialize_topic, "configure" )
-                _LOGGER.info(
-                    "HA online, continuing configuration"
-                )
-            elif payload == "offline":
-                _LOGGER.info(
-                    "HA offline message received",
-                )
+        return payload_struct
+
+    def process_bridge_state(self, message, payload):
+        """Process bridge state message: apply log level."""
+        self._bridge_state_received = True
+        _LOGGER.info("Bridge state message received")
+        try:
+            logging.getLogger().setLevel(json.loads(payload).get("log_level").upper())
+        except Exception as error:
+            _LOGGER.error("Bridge state message processing failed: %s", str(error))
 
-        elif message.topic == self._initialize_topic:
+    def process_restart(self, message, payload):
+        """Process bridge restart message: reload devices."""
+        _LOGGER.info(
+            "Bridge restart requested"
+        )
+        self._bridge_config_topics_published = 0    # enables value restoration
+        if payload == "full":
+            self._config_hashes = {}    # all registrations published again
+        self.reload_devices(full_reload=payload == "full")
+
+    def process_live(self, message, payload):
+        """Process device live status update request."""
+        _LOGGER.debug("Bridge device live status update requested")
+        if payload == "start":
+            self._live_on = True
+            self.enable_cur()
+
+    def process_ha_status(self, message, payload):
+        """Process HA status message, continue configuration when HA is online."""
+        if payload == "online":
+            self._ha_online_event.set()
+            self.publish( self._initialize_topic, "configure" )
             _LOGGER.info(
-                "Bridge setup '%s' message received",
-                payload
+                "HA online, continuing configuration"
             )
-            if payload == "initialize":
-                self._wait_for_ha_online.start()
-                if self._per_device_online:
-                    self._wait_for_dev_check.start()
-                    _LOGGER.info("Periodic device check task started for %s minute(s) interval", self._per_device_chk_interval)
-            else: # configure
-                self.subscribe(self._bridge_state_topic)
-                self.subscribe(self._bridge_restart_topic)
+        elif payload == "offline":
+            _LOGGER.info(
+                "HA offline message received",
+            )
+
+    def process_initialize(self, message, payload):
+        """Process bridge setup message: wait for HA online on 'initialize', subscribe and load devices on 'configure'."""
+        _LOGGER.info(
+            "Bridge setup '%s' message received",
+            payload
+        )
+        if payload == "initialize":
+            self.start_ha_online_waiter()
+            if self._per_device_online:
+                self.start_dev_check_waiter()
+                _LOGGER.info("Periodic device check task started for %s minute(s) interval", self._per_device_chk_interval)
+        else: # configure
+            self.subscribe(self._bridge_state_topic)
+            self.subscribe(self._bridge_restart_topic)
+            self.subscribe(
+                f"application/{self._application_id}/device/+/event/up"
+            )
+            for config_topic in self._legacy_config_topics or self._config_topics:  # node id topics matched by legacy ones
+                self.subscribe(config_topic)
+            if self._onboard_on_join:
                 self.subscribe(
-                    f"application/{self._application_id}/device/+/event/up"
+                    f"application/{self._application_id}/device/+/event/join"
                 )
-                self.subscribe(f"{self._discovery_prefix}/+/+/+/config")
-                self.start_bridge()
+            self.start_bridge()
+            if not self.reload_devices_from_snapshot():
                 self.reload_devices()
+
+    def process_config(self, message, payload):
+        """Process registration message: count registrations published by bridge."""
+        payload_struct = self.load_payload(message, payload)
+        if not payload_struct:
+            self._config_hashes.pop(message.topic, None)    # registration removed
+            return
+        payload_struct = expand_discovery_config(payload_struct)    # compact registrations use abbreviated keys
+        if payload_struct.get("migrate_discovery"):  # migration request published by bridge
+            return
+        subtopics = message.topic.split("/")
+        time_stamp = payload_struct.get("time_stamp")
+        if (
+            "via_device" in payload_struct["device"]
+            and payload_struct["device"]["via_device"]
+            == self._bridge_indentifier
+        ):
+            _LOGGER.info(f"Registration message with time stamp {time_stamp} received for device {subtopics[-2] if subtopics[2] == self._discovery_node_id else subtopics[2]} sensor {subtopics[1]}")
+            self._old_devices_config_topics.add(message.topic)
+            unique_id = payload_struct.get("unique_id") or next(
+                iter(payload_struct.get("components", {}).values()), {}
+            ).get("unique_id")
+            if (self._device_discovery or self._legacy_config_topics) and unique_id:   # registration to migrate
+                self._migrated_config_topics[message.topic] = unique_id
+            if self._config_hash:
+                config_hash = hashlib.md5(payload.encode("utf-8")).hexdigest()
+                self._config_hashes[message.topic] = config_hash
+                if self._pending_config_hashes.get(message.topic) == config_hash:
+                    del self._pending_config_hashes[message.topic]
+                    self._config_topics_published += 1
+            elif (
+                time_stamp and float(time_stamp) >= self._bridge_init_time
+            ):
+                self._config_topics_published += 1
         else:
-            subtopics = message.topic.split("/")
-            payload_struct = json.loads(payload) if len(payload) > 2 else None
-            if payload_struct:
-                time_stamp = payload_struct.get("time_stamp")
-                if subtopics[-1] == "config":
-                    if (
-                        "via_device" in payload_struct["device"]
-                        and payload_struct["device"]["via_device"]
-                        == self._bridge_indentifier
-                    ):
-                        _LOGGER.info(f"Registration message with time stamp {time_stamp} received for device {subtopics[2]} sensor {subtopics[1]}")
-                        self._old_devices_config_topics.add(message.topic)
-                        if (
-                            time_stamp and float(time_stamp) >= self._bridge_init_time
-                        ):
-                            self._config_topics_published += 1
-                    else:
-                        self._bridge_config_topics_published -= 1
-                elif subtopics[-1] == "cur":
-                    dev_eui = subtopics[-3]
-                    _LOGGER.info("Cached values received for device %s", dev_eui)
-                    _LOGGER.debug(
-                        "Cached values payload time %s, bridge time %s, cached object %s, value cache %s",
-                        time_stamp,
-                        self._bridge_init_time,
-                        payload_struct.get("object"),
-                        self._values_cache,
-                    )
-                    if (
-                        time_stamp and float(time_stamp) < self._bridge_init_time
-                    ):
-                        if dev_eui not in self._values_cache:
-                            self.publish(message.topic, None, retain=True)
-                            _LOGGER.debug(
-                                "Value cache removal topic %s published",
-                                message.topic,
-                            )
-                        elif self._values_cache[dev_eui] == {} and time_stamp < self._cur_open_time:
-                            ret_val = self.publish_value_cache_record(
-                                subtopics, "up", dev_eui, payload_struct
-                            )
-                    if self._live_on and time_stamp < self._cur_open_time:
-                        self.publish_value_cache_record(
-                                subtopics, "cur", dev_eui, payload_struct
-                            )
-                    cache_not_retrieved = len(
-                        [dev_id for dev_id, val in self._values_cache.items() if val == {}]
-                    )
-                    _LOGGER.debug("%s device(s) cached values not processed", cache_not_retrieved)
-                elif subtopics[-1] == "up":
-                    dev_eui = subtopics[-3]
-                    if (
-                        not time_stamp
-                        and dev_eui in self._values_cache
-                    ):
-                        self._values_cache[dev_eui] = self.join_filtered_messages(
-                            self._values_cache[dev_eui],
-                            payload_struct,
-                            self._top_level_msg_names,
-                        )
-                        self.publish_value_cache_record(
-                            subtopics, "cur", dev_eui, payload_struct, retain=True
-                        )
-            else:
-                _LOGGER.info(
-                    "Ignoring topic %s with payload %s",
+            self._bridge_config_topics_published -= 1
+
+    def process_cur(self, message, payload, dev_eui):
+        """Process retained device values: restore values or remove values of disappeared device."""
+        payload_struct = self.load_payload(message, payload)
+        if not payload_struct:
+            return
+        subtopics = message.topic.split("/")
+        time_stamp = payload_struct.get("time_stamp")
+        _LOGGER.info("Cached values received for device %s", dev_eui)
+        with self._values_lock:
+            cached_values = self._values_cache.get(dev_eui)
+            _LOGGER.debug(
+                "Cached values payload time %s, bridge time %s, cached object %s, value cache %s",
+                time_stamp,
+                self._bridge_init_time,
+                payload_struct.get("object"),
+                self._values_cache,
+            )
+        if (
+            time_stamp and float(time_stamp) < self._bridge_init_time
+        ):
+            if cached_values is None:
+                self.publish(message.topic, None, retain=True)
+                _LOGGER.debug(
+                    "Value cache removal topic %s published",
                     message.topic,
-                    message.payload,
                 )
+            elif cached_values == {} and time_stamp < self._cur_open_time:
+                ret_val = self.publish_value_cache_record(
+                    subtopics, "up", dev_eui, payload_struct
+                )
+        if self._live_on and time_stamp < self._cur_open_time:
+            self.publish_value_cache_record(
+                    subtopics, "cur", dev_eui, payload_struct
+                )
+        with self._values_lock:
+            cache_not_retrieved = len(
+                [dev_id for dev_id, val in self._values_cache.items() if val == {}]
+            )
+        _LOGGER.debug("%s device(s) cached values not processed", cache_not_retrieved)
+
+    def process_join(self, message, payload, dev_eui):
+        """Process device join event: onboard device not published yet."""
+        if self.load_payload(message, payload):
+            self.request_onboarding(dev_eui)
+
+    def process_up(self, message, payload, dev_eui):
+        """Process device uplink: update device last seen time, cache and publish values of known device."""
+        payload_struct = self.load_payload(message, payload)
+        if not payload_struct:
+            return
+        time_stamp = payload_struct.get("time_stamp")
+        if not time_stamp:
+            self._grpc_client.update_device_last_seen(dev_eui, parse_event_time(payload_struct.get("time")) or time.time())
+            if self._onboard_on_join:
+                self.request_onboarding(dev_eui)
+        if (
+            not time_stamp
+            and self.cache_device_values(dev_eui, payload_struct) is not None
+        ):
+            self.publish_value_cache_record(
+                message.topic.split("/"), "cur", dev_eui, payload_struct, retain=True
+            )
+
+    def continue_configuration(self):
+        """Remove disappeared devices when all registrations are received, turn bridge on when bridge registration is received."""
         if (
-            len(self._devices_config_topics) > 0
+            self._config_topics_expected > 0
             and self._config_topics_published > 0
-            and self._config_topics_published >= len(self._devices_config_topics)
+            and self._config_topics_published >= self._config_topics_expected
         ):
             _LOGGER.info(
                 "%s of %s configuration messages received, %s disappeared devices",
                 self._config_topics_published,
-                len(self._devices_config_topics),
+                self._config_topics_expected,
                 len(self._old_devices_config_topics - self._devices_config_topics),
             )
             self.clean_up_disappeared()
         if self._bridge_config_topics_published == 0:
             self._bridge_config_topics_published = -1
-            time.sleep(self._discovery_delay)
-            if not self._bridge_state_received:
-                self.publish(
-                    self._bridge_state_topic, f'{{"state": "online", "log_level": "{self._config.get(CONF_OPTIONS_LOG_LEVEL, DEFAULT_OPTIONS_LOG_LEVEL)}"}}', retain=True
-                )
-                _LOGGER.info(
-                    "Bridge state turned on, log level %s",
-                    self._config.get(CONF_OPTIONS_LOG_LEVEL, DEFAULT_OPTIONS_LOG_LEVEL),
-                )
-            self.enable_cur()
-            for restore_message in self._messages_to_restore_values:
-                self.publish(*restore_message)
-                _LOGGER.info(
-                    f"Previous sensor values restored for device {restore_message[0].split('/')[3]}",
-                )
+            restore_messages = self._messages_to_restore_values
             self._messages_to_restore_values = []
+            if self._discovery_delay:   # give HA time to process registrations
+                self.schedule_bridge_on(restore_messages)
+            else:
+                self.turn_bridge_on(restore_messages)
+
+    def turn_bridge_on(self, restore_messages):
+        """Publish bridge state if not received, open cur window and restore previous sensor values."""
+        if not self._bridge_state_received:
+            self.publish(
+                self._bridge_state_topic, f'{{"state": "online", "log_level": "{self._config.get(CONF_OPTIONS_LOG_LEVEL, DEFAULT_OPTIONS_LOG_LEVEL)}"}}', retain=True
+            )
+            self._bridge_state_received = True  # not published again if reload is requested before state message is received
+            _LOGGER.info(
+                "Bridge state turned on, log level %s",
+                self._config.get(CONF_OPTIONS_LOG_LEVEL, DEFAULT_OPTIONS_LOG_LEVEL),
+            )
+        self.enable_cur()
+        for restore_message in restore_messages:
+            self.publish(*restore_message)
+            _LOGGER.info(
+                f"Previous sensor values restored for device {restore_message[0].split('/')[3]}",
+            )
 
     def publish_value_cache_record(
         self, topic_array, topic_suffix, dev_eui, payload_struct, retain=False
     ):
         """Publish sensor value to values cache message."""
 
-        self._values_cache[dev_eui] = self.join_filtered_messages(
-            self._values_cache[dev_eui],
-            payload_struct,
-            self._top_level_msg_names,
-        )
-        payload_struct = self._values_cache[dev_eui]
+        payload_struct = self.cache_device_values(dev_eui, payload_struct)
 
-        if len(payload_struct) or topic_suffix == "cur":
+        if payload_struct is not None and (len(payload_struct) or topic_suffix == "cur"):
             topic_int = topic_array.copy()
             topic_int[-1] = topic_suffix
             payload_struct["time_stamp"] = time.time()
@@ -692,6 +1295,18 @@ class ChirpToHA:
             ret_val = (0,0)
         return ret_val
 
+    def cache_device_values(self, dev_eui, payload_struct):
+        """Join payload into values cache of device, None if device is not cached."""
+        with self._values_lock:
+            if dev_eui not in self._values_cache:
+                return None
+            self._values_cache[dev_eui] = self.join_filtered_messages(
+                self._values_cache[dev_eui],
+                payload_struct,
+                self._top_level_msg_names,
+            )
+            return self._values_cache[dev_eui]
+
     def join_filtered_messages(self, message_o, message_n, levels_filter):
         """Join 2 payloads keeping all level data and recent values from message_n."""
         if isinstance(levels_filter, list):
@@ -718,48 +1333,53 @@ class ChirpToHA:
                 )
         return filtered
 
+    def get_integration(self, dev_id, sensor, dev_conf):
+        """Get sensor integration type from sensor configuration or its device class."""
+        if sensor.get("integration"):
+            return sensor.get("integration")
+        device_class = sensor["entity_conf"].get("device_class")
+        if device_class and self._classes:
+            integration = self._classes.get_integration(device_class)
+            if integration:
+                return integration
+            _LOGGER.warning(
+                WARMSG_DEVCLS_REMOVED,
+                device_class,
+                dev_conf["dev_eui"],
+            )
+            del sensor["entity_conf"]["device_class"]
+        else:
+            _LOGGER.info(
+                "No device class set for dev_eui %s/%s and no integration specified, set to 'sensor'",
+                dev_conf["dev_eui"],
+                dev_id,
+            )
+        return "sensor"
+
     def get_discovery_topic(self, dev_id, sensor, device, dev_conf):
         """Prepare sensor discovery topic based on integration type/device class."""
-        if not sensor.get("integration"):
-            mqtt_integration = None
-            device_class = sensor["entity_conf"].get("device_class")
-            if device_class and self._classes:
-                for integration in self._classes["integrations"]:
-                    if device_class in self._classes.get(integration):
-                        mqtt_integration = integration
-                        break
-                if not mqtt_integration:
-                    mqtt_integration = "sensor"
-                    _LOGGER.warning(
-                        WARMSG_DEVCLS_REMOVED,
-                        device_class,
-                        dev_conf["dev_eui"],
-                    )
-                    del sensor["entity_conf"]["device_class"]
-            else:
-                mqtt_integration = "sensor"
-                _LOGGER.info(
-                    "No device class set for dev_eui %s/%s and no integration specified, set to 'sensor'",
-                    dev_conf["dev_eui"],
-                    dev_id,
-                )
-        else:
-            mqtt_integration = sensor.get("integration")
+        mqtt_integration = self.get_integration(dev_id, sensor, dev_conf)
+        if self._discovery_node_id:
+            return f"{self._discovery_prefix}/{mqtt_integration}/{self._discovery_node_id}/{dev_conf['dev_eui']}_{dev_id}/config"
         return f"{self._discovery_prefix}/{mqtt_integration}/{dev_conf['dev_eui']}/{dev_id}/config"
 
     def get_availability_element(self, dev_id, sensor, device, dev_conf):
         if self._per_device_online:
-            availability_elements = self._availability_element.copy()
-            for availability_element in availability_elements:
-                availability_element["topic"] = f"application/{self._application_id}/device/{dev_conf['dev_eui']}/event/cur"
-            return availability_elements
+            return [
+                availability_element | {"topic": f"application/{self._application_id}/device/{dev_conf['dev_eui']}/event/cur"}
+                for availability_element in self._availability_element
+            ]
         else:
             return self._availability_element
 
+    def get_status_topic(self, sensor, dev_conf):
+        """Prepare sensor value topic."""
+        return f"application/{self._application_id}/device/{dev_conf['dev_eui']}/event/{sensor.get('data_event') if sensor.get('data_event') else 'up'}"
+
     def get_conf_data(self, dev_id, sensor, device, dev_conf):
         """Prepare discovery payload."""
         discovery_topic = self.get_discovery_topic(dev_id, sensor, device, dev_conf)
-        status_topic = f"application/{self._application_id}/device/{dev_conf['dev_eui']}/event/{sensor.get('data_event') if sensor.get('data_event') else 'up'}"
+        status_topic = self.get_status_topic(sensor, dev_conf)
         comand_topic = f"application/{self._application_id}/device/{dev_conf['dev_eui']}/command/down"
         discovery_config = sensor["entity_conf"].copy()
         discovery_config["device"] = device.copy()
@@ -819,20 +1439,338 @@ class ChirpToHA:
                 discovery_config[key] = value.replace( "{dev_eui}", dev_conf["dev_eui"] )
         if not discovery_config.get("enabled_by_default"):
             discovery_config["enabled_by_default"] = True
-        if self._bridge_init_time:
+        if self._bridge_init_time and not self._config_hash:
             discovery_config["time_stamp"] = self._bridge_init_time
         return {
             "discovery_config_struct": discovery_config,
-            "discovery_config": json.dumps(discovery_config),
+            "discovery_config": self.dump_discovery_config(discovery_config, dev_conf),
             "discovery_topic": discovery_topic,
             "status_topic": status_topic,
             "comand_topic": comand_topic,
         }
 
+    def get_sensor_conf_data(self, dev_id, sensor, device, dev_conf):
+        """Prepare discovery payload from template compiled for profile entity, devices with own settings are prepared one by one."""
+        dev_settings = f"dev_eui{dev_conf['dev_eui']}"
+        if (
+            not self._discovery_templates_on
+            or not dev_conf.get("codec_hash")
+            or dev_settings in sensor["entity_conf"]
+            or dev_settings in device
+        ):
+            return self.get_conf_data(dev_id, sensor, device, dev_conf)
+        template_key = (
+            dev_conf["codec_hash"],
+            dev_id,
+            sensor["entity_conf"].get("uplink_interval"),
+            dev_conf["measurement_names"].get(dev_id),
+            bool(dev_conf["dev_name"]),
+        )
+        template = self._discovery_templates.get(template_key)
+        if template is None:
+            template = self.compile_discovery_template(dev_id, sensor, device, dev_conf)
+            self._discovery_templates[template_key] = template
+        return self.fill_discovery_template(template, dev_conf)
+
+    def compile_discovery_template(self, dev_id, sensor, device, dev_conf):
+        """Compile discovery template: discovery payload prepared with slot tokens in device specific fields."""
+        sensor = sensor | {"integration": self.get_integration(dev_id, sensor, dev_conf)}   # resolved once per template
+        template_dev_conf = dev_conf | {"dev_eui": TEMPLATE_DEV_EUI, "dev_name": TEMPLATE_DEV_NAME if dev_conf["dev_name"] else ""}
+        conf_data = self.get_conf_data(dev_id, sensor, device, template_dev_conf)
+        discovery_config = conf_data.pop("discovery_config")
+        _LOGGER.debug("Discovery template compiled for profile %s entity %s", dev_conf["codec_hash"], dev_id)
+        return {
+            "conf_data": conf_data,
+            "slots": get_template_slots(conf_data),
+            "discovery_config": discovery_config,
+        }
+
+    @staticmethod
+    def fill_discovery_template(template, dev_conf):
+        """Prepare discovery payload for device from compiled discovery template."""
+        fields = (
+            (TEMPLATE_DEV_EUI, dev_conf["dev_eui"]),
+            (TEMPLATE_DEV_EUI.lower(), to_lower_case_no_blanks(dev_conf["dev_eui"])),
+            (TEMPLATE_DEV_NAME, dev_conf["dev_name"]),
+            (TEMPLATE_DEV_NAME.lower(), to_lower_case_no_blanks(dev_conf["dev_name"])),
+        )
+        conf_data = fill_template_slots(template["conf_data"], template["slots"], fields)
+        conf_data["discovery_config"] = fill_template_slots(   # slot tokens and fields escaped as in json payload
+            template["discovery_config"], True, [(json.dumps(token)[1:-1], json.dumps(field)[1:-1]) for token, field in fields]
+        )
+        return conf_data
+
+    def dump_discovery_config(self, discovery_config, dev_conf):
+        """Get discovery payload, compact payload has abbreviated keys and device topics based on '~' topic."""
+        if self._compact_discovery:
+            discovery_config = compact_discovery_config(
+                discovery_config, f"application/{self._application_id}/device/{dev_conf['dev_eui']}"
+            )
+        return json.dumps(discovery_config)
+
+    def get_device_discovery_topic(self, dev_conf):
+        """Prepare device based discovery topic."""
+        if self._discovery_node_id:
+            return f"{self._discovery_prefix}/device/{self._discovery_node_id}/{dev_conf['dev_eui']}/config"
+        return f"{self._discovery_prefix}/device/{dev_conf['dev_eui']}/config"
+
+    def get_device_conf_data(self, dev_conf, sensors_conf_data):
+        """Prepare device based discovery payload from sensor discovery payloads, options shared by all components are set on device level."""
+        components = {}
+        for dev_id, sensor_conf_data in sensors_conf_data.items():
+            component = sensor_conf_data["discovery_config_struct"].copy()
+            component["platform"] = sensor_conf_data["discovery_topic"].split("/")[1]
+            components[dev_id] = component
+        first_component = next(iter(components.values()))
+        discovery_config = {"device": first_component["device"], "origin": first_component["origin"]}
+        time_stamp = first_component.get("time_stamp")
+        for key in DEVICE_SHARED_OPTIONS:
+            value = first_component.get(key)
+            if value is not None and all(component.get(key) == value for component in components.values()):
+                discovery_config[key] = value
+        for component in components.values():
+            for key in ("time_stamp", *discovery_config):
+                component.pop(key, None)
+        discovery_config["components"] = components
+        if time_stamp:
+            discovery_config["time_stamp"] = time_stamp
+        return {
+            "discovery_config": self.dump_discovery_config(discovery_config, dev_conf),
+            "discovery_topic": self.get_device_discovery_topic(dev_conf),
+            "unique_ids": [component["unique_id"] for component in components.values()],
+        }
+
     def close(self):
         """Close recent session."""
         self._ha_online_event.set()
         self._cur_delay_event.set()
         self._dev_check_event.set()
+        self._reconcile_stop_event.set()
+        if self._bridge_on_timer:
+            self._bridge_on_timer.cancel()
+        self._bridge_messages.put(None)
+        for message_queue in self._device_messages:
+            message_queue.put(None)
+
+        self._client.disconnect()
+
+
+class AsyncChirpToHA(ChirpToHA):
+    """Chirpstack LoRaWan MQTT interface with asyncio runtime, messages and timers are handled on single event loop thread.
 
+    Runtime is hybrid: MQTT network I/O stays threaded, paho network loop runs in executor and only passes received
+    messages to event loop. Device events are processed on arrival, other messages in arrival order by bridge task; api
+    server calls, device visibility reads included, are awaited in executor, with AsyncChirpGrpc executor threads wait
+    for grpc.aio calls running on client's own loop thread. Bridge state is changed on event loop only, gRPC client
+    caches used by several threads are guarded by client locks.
+    """
+
+    def __init__(
+        self, config, version, classes: DeviceClassRegistry, grpc_client: ChirpGrpc, connectivity_check_only=False
+    ) -> None:
+        """Create event loop, uvloop if installed, open connection to HA MQTT server."""
+        self._loop = uvloop.new_event_loop() if uvloop else asyncio.new_event_loop()
+        self._loop.set_exception_handler(self.loop_failed)
+        self._bridge_tasks = None
+        self._pending_reload = None
+        self._timers = set()
+        self._pending_device_events = {}    # device EUI: events waiting for device visibility read
+        self._device_visibility = {}    # device EUI: visibility data read in executor for pending events
+        super().__init__(config, version, classes, grpc_client, connectivity_check_only)
+
+    def start_message_processing(self):
+        """Set MQTT message callback passing messages to event loop."""
+        self._client.on_message = self.schedule_message
+
+    def loop_forever(self):
+        """Run event loop till MQTT network loop is finished, close event loop."""
+        try:
+            self._loop.run_until_complete(self.async_loop_forever())
+        finally:
+            self._loop.run_until_complete(self._loop.shutdown_default_executor())
+            self._loop.close()
+
+    async def async_loop_forever(self):
+        """Process bridge tasks while MQTT network loop is running in executor."""
+        self._bridge_tasks = asyncio.Queue()
+        bridge_task = self._loop.create_task(self.process_bridge_tasks())
+        bridge_task.add_done_callback(self.bridge_task_done)
+        try:
+            await self._loop.run_in_executor(None, self._client.loop_forever)
+        finally:
+            self.stop_runtime()
+            await bridge_task
+
+    async def process_bridge_tasks(self):
+        """Run queued bridge tasks one by one till stop request."""
+        while True:
+            task = await self._bridge_tasks.get()
+            if task is None:
+                break
+            await task[0](*task[1])
+
+    def bridge_task_done(self, task):
+        """Stop MQTT network loop if bridge task failed, exception is raised by loop_forever."""
+        if not task.cancelled() and task.exception():
+            self._client.disconnect()
+
+    def loop_failed(self, loop, context):
+        """Event loop exception handler: log error and stop MQTT network loop."""
+        _LOGGER.error("Chirp failed: %s", context.get("exception", context["message"]))
         self._client.disconnect()
+
+    def stop_runtime(self):
+        """Cancel timers and stop bridge task, runs on event loop."""
+        for timer in self._timers:
+            timer.cancel()
+        self._timers.clear()
+        if self._bridge_tasks:
+            self._bridge_tasks.put_nowait(None)
+
+    def call_later(self, delay, callback, *args):
+        """Schedule callback on event loop after delay."""
+        timer = self._loop.call_later(delay, self.run_timer, callback, args)
+        self._timers.add(timer)
+        return timer
+
+    def run_timer(self, callback, args):
+        """Run scheduled callback, drop expired timers."""
+        self._timers = {timer for timer in self._timers if not timer.cancelled() and timer.when() > self._loop.time()}
+        callback(*args)
+
+    def schedule_message(self, client, userdata, message):
+        """MQTT network thread callback: pass message to event loop."""
+        self._loop.call_soon_threadsafe(self.dispatch_message, message)
+
+    def dispatch_message(self, message):
+        """Process device event at once, queue any other message for bridge task."""
+        route = self.route_topic(message.topic)
+        if route is None:
+            _LOGGER.detail("MQTT message rejected: topic %s", message.topic)
+        elif route[1]:  # device events are routed with device EUI
+            self.dispatch_device_event(message, route)
+        else:
+            self._bridge_tasks.put_nowait((self.async_on_message, (message,)))
+
+    def dispatch_device_event(self, message, route):
+        """Process device event at once if no api server call is needed, else queue it till visibility is read."""
+        dev_eui = route[1][0]
+        pending_events = self._pending_device_events.get(dev_eui)
+        if pending_events is not None:  # keeps device events order
+            pending_events.append((message, route))
+        elif self._per_device_online and not self._grpc_client.is_device_visibility_cached(dev_eui):
+            self._pending_device_events[dev_eui] = [(message, route)]
+            task = self._loop.create_task(self.async_process_device_events(dev_eui))
+            task.add_done_callback(self.device_task_done)
+        else:
+            self.process_message(message, route)
+
+    async def async_process_device_events(self, dev_eui):
+        """Read device visibility data in executor, process device events queued meanwhile in arrival order."""
+        try:
+            self._device_visibility[dev_eui] = await self._loop.run_in_executor(
+                None, self._grpc_client.get_device_visibility_info, dev_eui
+            )
+            while self._pending_device_events[dev_eui]:
+                self.process_message(*self._pending_device_events[dev_eui].pop(0))
+        finally:
+            self._pending_device_events.pop(dev_eui, None)
+            self._device_visibility.pop(dev_eui, None)
+
+    def device_task_done(self, task):
+        """Pass device event processing failure to event loop exception handler."""
+        if not task.cancelled() and task.exception():
+            self._loop.call_exception_handler({"message": "Device event processing failed", "exception": task.exception()})
+
+    def get_device_visibility_info(self, dev_eui):
+        """Get device visibility data, read in executor for pending device events if not cached by gRPC client."""
+        visibility = self._device_visibility.get(dev_eui)
+        if visibility is None or self._grpc_client.is_device_visibility_cached(dev_eui):   # cache has uplink last seen
+            return super().get_device_visibility_info(dev_eui)
+        return visibility.copy()
+
+    async def async_on_message(self, message):
+        """Process subscribed message, run requested device reload, continue bridge configuration."""
+        self.process_message(message)
+        if self._pending_reload is not None:
+            full_reload = self._pending_reload
+            self._pending_reload = None
+            await self.async_reload_devices(full_reload)
+        self.continue_configuration()
+
+    def reload_devices(self, full_reload=True, device_sensors=None):
+        """Publish discovery messages for device list, reload from api server is run by bridge task."""
+        if device_sensors is None:
+            self._pending_reload = full_reload
+        else:
+            super().reload_devices(full_reload, device_sensors)
+
+    async def async_reload_devices(self, full_reload=True):
+        """Publish discovery messages for devices read from api server in executor."""
+        self.update_bridge_init_time()
+        known_devices = self.get_reload_known_devices(full_reload)
+        device_sensors = await self._loop.run_in_executor(
+            None, self._grpc_client.get_current_device_entities, known_devices
+        )
+        self.publish_devices(device_sensors, known_devices is not None, True)
+
+    def request_onboarding(self, dev_eui):
+        """Queue device onboarding for bridge task."""
+        if self.is_device_known(dev_eui):
+            return
+        self._bridge_tasks.put_nowait((self.async_onboard_device, (dev_eui,)))
+
+    async def async_onboard_device(self, dev_eui):
+        """Publish discovery messages for device read from api server in executor."""
+        if self.is_device_known(dev_eui):
+            return
+        device = await self._loop.run_in_executor(None, self._grpc_client.get_single_device_discovery, dev_eui)
+        self.publish_onboarded_device(dev_eui, device)
+
+    def start_ha_online_waiter(self):
+        """Schedule bridge configuration if HA online message is not received."""
+        self.call_later(self._discovery_delay+0.1, self.ha_online_timeout)
+
+    def start_dev_check_waiter(self):
+        """Schedule periodic device live status update."""
+        self.call_later(self._per_device_chk_interval*60+0.1, self.dev_check_timeout)
+
+    def dev_check_timeout(self):
+        """Request device live status update, schedule next one."""
+        self.publish( self._bridge_live_topic, "start" )
+        self.start_dev_check_waiter()
+
+    def start_cur_waiter(self):
+        """Schedule cur window close."""
+        self.call_later(self._cur_age+0.1, self.cur_timeout)
+
+    def cur_timeout(self):
+        """Close cur window if it is not extended since opened."""
+        time_delta = self._cur_open_time + self._cur_age - time.time()
+        if time_delta > 0:
+            self.call_later(time_delta, self.cur_timeout)
+        else:
+            _LOGGER.debug("Time to stop cur message watch")
+            self.disable_cur()
+
+    def schedule_bridge_on(self, restore_messages):
+        """Turn bridge on after start delay, message processing continues meanwhile."""
+        self.call_later(self._discovery_delay, self.turn_bridge_on, restore_messages)
+
+    def start_reconciliation(self):
+        """Run discovery snapshot reconciliation with api server in executor."""
+        self._loop.run_in_executor(None, self.reconcile_devices)
+
+    def run_bridge_task(self, callback, *args):
+        """Queue bridge task requested by executor thread for bridge task."""
+        self._loop.call_soon_threadsafe(self._bridge_tasks.put_nowait, (self.async_run_bridge_task, (callback, args)))
+
+    async def async_run_bridge_task(self, callback, args):
+        """Run bridge task on event loop."""
+        callback(*args)
+
+    def close(self):
+        """Close recent session, stop timers and bridge task."""
+        if not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self.stop_runtime)
+        super().close()
@@ -13,10 +13,12 @@ from typing import Final
 import threading
 import traceback
 
-from .grpc import ChirpGrpc
-from .mqtt import ChirpToHA
+from .grpc import ChirpGrpc, AsyncChirpGrpc
+from .mqtt import ChirpToHA, AsyncChirpToHA
+from .device_classes import DeviceClassRegistry
 from .const import CONF_API_SERVER, CONF_API_PORT, CONF_MQTT_SERVER, CONF_MQTT_PORT, CONF_OPTIONS_LOG_LEVEL
 from .const import CONF_APPLICATION_ID, DEFAULT_API_SERVER, DEFAULT_API_PORT, DEFAULT_MQTT_PORT, DEFAULT_MQTT_SERVER
+from .const import CONF_OPTIONS_GRPC_ASYNC, DEFAULT_OPTIONS_GRPC_ASYNC, CONF_OPTIONS_ASYNCIO_RUNTIME, DEFAULT_OPTIONS_ASYNCIO_RUNTIME
 
 # https://stackoverflow.com/questions/2183233/how-to-add-a-custom-loglevel-to-pythons-logging-facility/13638084#13638084
 DETAILED_LEVEL_NUM = 5
@@ -77,8 +79,6 @@ class run_chirp_ha:
                 config = json.load(file)
             config = INTERNAL_CONFIG | config
             self._config = config
-            with open(str(module_dir)+'/classes.json', 'r') as file:
-                classes = json.load(file)
             _LOGGER.info("ChirpHA started")
             try:
                 logging.getLogger().setLevel(config[CONF_OPTIONS_LOG_LEVEL].upper())
@@ -89,9 +89,20 @@ class run_chirp_ha:
             _LOGGER.debug("Current directory %s, module directory %s", os.getcwd(), module_dir)
             _LOGGER.debug("Configuration file %s", self._configuration_file)
             _LOGGER.info("Version %s", __version__)
-            self._grpc_client = ChirpGrpc(config, __version__)
-            self._mqtt_client = ChirpToHA(config, __version__, classes, self._grpc_client)
-            self._mqtt_client._client.loop_forever()
+            classes = DeviceClassRegistry.from_file(str(module_dir)+'/classes.json')
+            _LOGGER.debug("Device class registry loaded, %s device class(es) for %s integration(s)", len(classes), len(classes.integrations))
+            asyncio_runtime = config.get(CONF_OPTIONS_ASYNCIO_RUNTIME, DEFAULT_OPTIONS_ASYNCIO_RUNTIME)
+            if asyncio_runtime or config.get(CONF_OPTIONS_GRPC_ASYNC, DEFAULT_OPTIONS_GRPC_ASYNC):
+                _LOGGER.info("Using asyncio gRPC client")
+                self._grpc_client = AsyncChirpGrpc(config, __version__)
+            else:
+                self._grpc_client = ChirpGrpc(config, __version__)
+            if asyncio_runtime:
+                _LOGGER.info("Using asyncio runtime")
+                self._mqtt_client = AsyncChirpToHA(config, __version__, classes, self._grpc_client)
+            else:
+                self._mqtt_client = ChirpToHA(config, __version__, classes, self._grpc_client)
+            self._mqtt_client.loop_forever()
         except Exception as error:
             if logging.getLogger().getEffectiveLevel() == logging.DEBUG:
                 _LOGGER.exception("Chirp failed: %s", str(error))
@@ -31,6 +31,28 @@ REGULAR_CONFIGURATION_FILE_DEBUG_NO_MQTT ="test_configuration_debug_log_no_mqtt.
 REGULAR_CONFIGURATION_PER_DEVICE ="test_configuration_per_device.json"
 REGULAR_CONFIGURATION_NONZERO_DELAYS ="test_configuration_nonzero_delays.json"
 REGULAR_CONFIGURATION_EXPIRE_AFTER ="test_configuration_expire_after.json"
+PAGING_CONFIGURATION_FILE ="test_configuration_paging.json"
+RELOAD_WORKERS_CONFIGURATION_FILE ="test_configuration_reload_workers.json"
+GRPC_ASYNC_CONFIGURATION_FILE ="test_configuration_grpc_async.json"
+CODEC_CACHE_CONFIGURATION_FILE ="test_configuration_codec_cache.json"
+CODEC_WORKERS_CONFIGURATION_FILE ="test_configuration_codec_workers.json"
+QUICKJS_CONFIGURATION_FILE ="test_configuration_quickjs.json"
+NO_FAST_PATH_CONFIGURATION_FILE ="test_configuration_no_fast_path.json"
+VISIBILITY_TTL_CONFIGURATION_FILE ="test_configuration_visibility_ttl.json"
+INCREMENTAL_CONFIGURATION_FILE ="test_configuration_incremental.json"
+DISCOVERY_SNAPSHOT_CONFIGURATION_FILE ="test_configuration_discovery_snapshot.json"
+ONBOARD_CONFIGURATION_FILE ="test_configuration_onboard.json"
+MESSAGE_QUEUE_CONFIGURATION_FILE ="test_configuration_message_queue.json"
+MESSAGE_QUEUE_DELAY_CONFIGURATION_FILE ="test_configuration_message_queue_delay.json"
+MESSAGE_QUEUE_INCREMENTAL_CONFIGURATION_FILE ="test_configuration_message_queue_incremental.json"
+ASYNCIO_RUNTIME_CONFIGURATION_FILE ="test_configuration_asyncio_runtime.json"
+ASYNCIO_PER_DEVICE_CONFIGURATION_FILE ="test_configuration_asyncio_per_device.json"
+DEVICE_WORKERS_CONFIGURATION_FILE ="test_configuration_device_workers.json"
+DISCOVERY_NODE_ID_CONFIGURATION_FILE ="test_configuration_discovery_node_id.json"
+CONFIG_HASH_CONFIGURATION_FILE ="test_configuration_config_hash.json"
+DEVICE_DISCOVERY_CONFIGURATION_FILE ="test_configuration_device_discovery.json"
+COMPACT_DISCOVERY_CONFIGURATION_FILE ="test_configuration_compact_discovery.json"
+DISCOVERY_TEMPLATES_CONFIGURATION_FILE ="test_configuration_discovery_templates.json"
 MIN_SLEEP = 0.1
 
 # pytest tests/components/chirp/
@@ -80,6 +102,9 @@ def chirp_setup_and_run_test(caplog, run_test_case, conf_file=REGULAR_CONFIGURAT
     with run_chirp_ha(full_path_to_conf_file) as ch:
         caplog.set_level(log_level)
         time.sleep(0.01)
+        for i in range(0, 100):     # HA online is published once bridge is connected and subscribed, connect drops earlier messages
+            if count_messages(r'/status$', r'^initialize$', keep_history=True) or not ch.ch_tread.is_alive(): break
+            time.sleep(0.01)
         if ch.ch_tread.is_alive():
             mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).wait_empty_queue()
             if ch.ch_tread.is_alive():
@@ -87,7 +112,7 @@ def chirp_setup_and_run_test(caplog, run_test_case, conf_file=REGULAR_CONFIGURAT
                     mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).publish(f"{config.get(CONF_MQTT_DISC)}/status", "online")
                 mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).wait_empty_queue()
                 if check_msg_queue:
-                    for i in range(0,10):
+                    for i in range(0,30):   # bridge is turned on after start delay
                         ha_online = count_messages(r'homeassistant/status', r'online', keep_history=True)
                         bridge_online = count_messages(r'.*/bridge/status', r'online', keep_history=True)
                         bridge_config = count_messages(r'.*', r'"name"\: "Chirp2MQTT Bridge"', keep_history=True)
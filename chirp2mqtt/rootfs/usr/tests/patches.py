@@ -1,5 +1,6 @@
 """Mocks for ChirpStack grpc api, paho mqtt, dukpy."""
 import json
+import re
 import time
 import threading
 import enum
@@ -23,6 +24,7 @@ MODEL_SIZES = [
 ]
 
 getdevcount = [0]
+getprofilecount = [0]
 
 CODEC = [   # array of (no_of_sensors, "codec_code")
     (   #0
@@ -154,6 +156,7 @@ CODEC = [   # array of (no_of_sensors, "codec_code")
         1,  #
         'function getHaDeviceInfo() {return {device: {manufacturer: "vendor0",model: "model1",dev_euidev_eui0:{model:"model1a"}},entities: {counter:{entity_conf: {dev_euidev_eui0:{device_class:"water"}, expire_after: "{None}",device_class: "gas"}}}};}',
     ),
+    (0, "function getHaDeviceInfo() {while (true) {}}"),   #22
 
 ]
 
@@ -168,6 +171,11 @@ def get_size(type_name):
     return MODEL_SIZES[0][type_name]
 
 
+def get_profile_updated_at():
+    """Get device profile update time stamp mock, codec change is treated as profile update."""
+    return f"updated_at_codec{get_size('codec')}"
+
+
 def set_size(
     tenants=2,
     applications=1,
@@ -193,6 +201,64 @@ def set_size(
     MODEL_SIZES[0]["subscribe"] = subscribe
     MODEL_SIZES[0]["unsubscribe"] = unsubscribe
     getdevcount[0] = 0
+    getprofilecount[0] = 0
+
+def list_page(items, list_request):
+    """Select page of list items by list request offset/limit."""
+    offset = list_request.offset if list_request.offset else 0
+    return items[offset:offset + list_request.limit]
+
+
+class future:
+    """Mock grpc call future."""
+
+    def __init__(self, method, *args, **kwargs):
+        """Execute call immediately, keep result or exception for result()."""
+        self._result = None
+        self._exception = None
+        try:
+            self._result = method(*args, **kwargs)
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            self._exception = error
+
+    def result(self, timeout=None):
+        """Return call result or raise call exception."""
+        if self._exception:
+            raise self._exception
+        return self._result
+
+
+class unary_unary:
+    """Mock grpc unary-unary multi-callable supporting direct and future calls, awaitable calls on grpc.aio channel."""
+
+    def __init__(self, method, aio=False):
+        self._method = method
+        self._aio = aio
+
+    def __call__(self, *args, **kwargs):
+        if self._aio:
+            return self._async_call(*args, **kwargs)
+        return self._method(*args, **kwargs)
+
+    async def _async_call(self, *args, **kwargs):
+        return self._method(*args, **kwargs)
+
+    def future(self, *args, **kwargs):
+        return future(self._method, *args, **kwargs)
+
+
+class stub(object):
+    """Mock grpc service stub, wraps service calls into multi-callables bound to channel type."""
+
+    calls = ("List", "Get", "Create")
+
+    def __init__(self, channel):
+        aio = getattr(channel, "aio", False)
+        for call in self.calls:
+            if hasattr(self, call):
+                setattr(self, call, unary_unary(getattr(self, call), aio))
+
+
 class message:
     """Class to represent mqtt message."""
 
@@ -318,15 +384,20 @@ class mqtt:
                     self.reset_stats()
                 if self.on_message and msg[1] != None and sub_topics[-1] in self._subscribed:
                     self.on_message(self, None, message(msg[0], msg[1], msg[2], msg[3]))
-                if sub_topics[-1] == "config" and len(sub_topics[2]) < 32:
+                dev_eui = sub_topics[2] if len(sub_topics) > 2 else ""
+                device_match = re.match(r"(dev_eui\d+)(_|$)", sub_topics[3]) if dev_eui.startswith("chirp2mqtt_") else None
+                if device_match:    # bridge node id topic level, device EUI is in object id
+                    dev_eui = device_match[1]
+                if sub_topics[-1] == "config" and len(dev_eui) < 32:
                     payload_struct = json.loads(msg[1]) if msg[1] and len(msg[1]) > 0 else None
-                    if payload_struct:
-                        if self._stat_start_time != payload_struct["time_stamp"]:
+                    if payload_struct and not payload_struct.get("migrate_discovery"):
+                        if self._stat_start_time != payload_struct.get("time_stamp"):  # no time stamp with config hash
                             self.reset_stats()
-                            self._stat_start_time = payload_struct["time_stamp"]
-                        self.stat_sensors += 1
-                        if self._stat_dev_eui != sub_topics[2]:
-                            self._stat_dev_eui = sub_topics[2]
+                            self._stat_start_time = payload_struct.get("time_stamp")
+                        components = payload_struct.get("components", payload_struct.get("cmps"))
+                        self.stat_sensors += len(components) if components else 1
+                        if self._stat_dev_eui != dev_eui:
+                            self._stat_dev_eui = dev_eui
                             self.stat_devices += 1
                 self._processing_done.set()
             return 0
@@ -386,9 +457,7 @@ class mqtt:
 class api:
     """ChirpStack api mock implementation."""
 
-    class TenantServiceStub(object):
-        def __init__(self, channel):
-            pass
+    class TenantServiceStub(stub):
 
         def List(self, listTenantsReq, metadata):
             """Get mocked list tenants request response."""
@@ -401,6 +470,7 @@ class api:
                     tenant.name = f"TenantName{i}"
                     tenant.id = f"TenantId{i}"
                     request.result.append(tenant)
+                request.result = list_page(request.result, listTenantsReq)
             request.total_count = no_of_tenants
             return request
 
@@ -416,6 +486,7 @@ class api:
         """Prepare list tenants request object, initialize only used in test fields."""
         request = lambda: None
         request.limit = None
+        request.offset = None
         return request
 
     def CreateTenantRequest():
@@ -427,9 +498,7 @@ class api:
         request.tenant.max_gateway_count = None
         return request
 
-    class ApplicationServiceStub(object):
-        def __init__(self, channel):
-            pass
+    class ApplicationServiceStub(stub):
 
         def List(self, listApplicationsReq, metadata):
             """Get mocked applications list request response."""
@@ -442,6 +511,7 @@ class api:
                     appl.name = f"ApplicationName{i}"
                     appl.id = f"ApplicationId{i}"
                     request.result.append(appl)
+                request.result = list_page(request.result, listApplicationsReq)
             request.total_count = no_of_applications
             return request
 
@@ -452,6 +522,8 @@ class api:
                 if getApplicationsReq.id == f"ApplicationId{i}":
                     request = lambda: None
                     request.application_id = getApplicationsReq.application_id
+                    request.application = lambda: None
+                    request.application.tenant_id = "TenantId0"
                     return request
             raise Exception("Application does not exist") # pylint: disable=broad-exception-raised
 
@@ -469,6 +541,7 @@ class api:
         """List applications request object."""
         request = lambda: None
         request.limit = None
+        request.offset = None
         return request
 
     def GetApplicationRequest():
@@ -485,9 +558,7 @@ class api:
         request.application.tenant_id = None
         return request
 
-    class DeviceServiceStub(object):
-        def __init__(self, channel):
-            pass
+    class DeviceServiceStub(stub):
 
         def List(self, listDevicesReq, metadata=None):
             """Get mocked list devices request response."""
@@ -500,23 +571,32 @@ class api:
                     device.dev_eui = f"dev_eui{i}"
                     device.name = f"device_name{i}"
                     device.device_profile_id = f"device_profile_id{i}"
+                    device.updated_at = f"updated_at_disabled{get_size('disabled')}"
                     device.device_status = lambda: None
                     device.device_status.battery_level = 95
                     device.device_status.external_power_source = (i % 2) == 1
                     device.last_seen_at = ""
                     request.result.append(device)
+                request.result = list_page(request.result, listDevicesReq)
             request.total_count = no_of_devices
             return request
 
         def Get(self, deviceReq, metadata):
             """Get mocked device request response."""
+            if not get_size("grpc"):
+                raise Exception("Could not connect to grpc server") # pylint: disable=broad-exception-raised
             dev_no = int(deviceReq.dev_eui[7:])
             request = lambda: None
             request.device = lambda: None
             request.device.dev_eui = deviceReq.dev_eui
             request.device.name = f"device_name{dev_no}"
             request.device.device_profile_id = f"device_profile_id{dev_no}"
+            request.device.application_id = "ApplicationId0"
             request.device.is_disabled = get_size("disabled")
+            request.updated_at = f"updated_at_disabled{get_size('disabled')}"
+            request.device_status = lambda: None
+            request.device_status.battery_level = 95
+            request.device_status.external_power_source = (dev_no % 2) == 1
             if getdevcount[0] <= 1:
                 request.last_seen_at = ""
             else:
@@ -535,6 +615,7 @@ class api:
         """Get list devices request object, only properties used in test are initialized."""
         request = lambda: None
         request.limit = None
+        request.offset = None
         request.application_id = None
         return request
 
@@ -544,9 +625,7 @@ class api:
         request.dev_eui = None
         return request
 
-    class DeviceProfileServiceStub(object):
-        def __init__(self, channel):
-            pass
+    class DeviceProfileServiceStub(stub):
 
         def List(self, listDeviceProfileReq, metadata):
             """Get response list object for device profile request."""
@@ -555,21 +634,21 @@ class api:
             if listDeviceProfileReq.limit is not None:
                 request.result = []
                 for i in range(0, no_of_devices):
-                    device = lambda: None
-                    device.dev_eui = f"dev_eui{i}"
-                    device.name = f"profile_name{i}"
-                    device.device_profile_id = f"device_profile_id{i}"
-                    device.device_status = lambda: None
-                    device.device_status.battery_level = 95
-                    device.device_status.external_power_source = (i % 2) == 0
-                    request.result.append(device)
+                    profile = lambda: None
+                    profile.id = f"device_profile_id{i}"
+                    profile.name = f"profile_name{i}"
+                    profile.updated_at = get_profile_updated_at()
+                    request.result.append(profile)
+                request.result = list_page(request.result, listDeviceProfileReq)
             request.total_count = no_of_devices
             return request
 
         def Get(self, deviceProfileReq, metadata):
             """Get response object for device profile request."""
             dev_no = int(deviceProfileReq.id[17:])
+            getprofilecount[0] += 1
             request = lambda: None
+            request.updated_at = get_profile_updated_at()
             request.device_profile = lambda: None
             request.device_profile.id = deviceProfileReq.id
             request.device_profile.uplink_interval = 1
@@ -625,6 +704,14 @@ class api:
         request.limit = None
         return request
 
+    def ListDeviceProfilesRequest():
+        """Prepare list device profiles request object, only properties needed for test created."""
+        request = lambda: None
+        request.limit = None
+        request.offset = None
+        request.tenant_id = None
+        return request
+
     class InternalServiceStub(object):
         def __init__(self, channel):
             pass
@@ -690,6 +777,32 @@ class grpc:
             """Close channel - dummy for mock."""
             pass
 
+
+class grpc_aio:
+    """grpc.aio interface mock."""
+
+    def insecure_channel(self):
+        """Return aio Channel mock."""
+        return grpc_aio.Channel()
+
+    class Channel:
+        """aio Channel mock."""
+
+        aio = True
+
+        def __init__(self):
+            """Prepare channel for test, raise exception if requested."""
+            if not get_size("grpc"):
+                raise Exception("Could not connect to grpc server") # pylint: disable=broad-exception-raised
+
+        async def close(self):
+            """Close channel - dummy for mock."""
+            pass
+
+
+grpc.aio = grpc_aio
+
+
 class dukpy:
     def __init__(self):
         pass
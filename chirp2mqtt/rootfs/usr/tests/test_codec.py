@@ -0,0 +1,81 @@
+"""Test JavaScript engine backends conformance for getHaDeviceInfo codecs."""
+import json
+from pathlib import Path
+import pytest
+
+from chirpha.codec import JS_ENGINES, DukpyEngine, extract_codec, evaluate_ha_device_info, parse_literal_codec
+
+from .patches import CODEC
+
+DEVICE_INFO_SCRIPTS = sorted((Path(__file__).absolute().parents[3] / "getHaDeviceInfo").glob("*.js"))
+FIXTURE_CODECS = [codec_no for codec_no, codec in enumerate(CODEC) if "while (true)" not in codec[1]]  # runaway codecs never return
+
+
+def evaluate(engine_class, codec_script):
+    """Evaluate codec with engine and return discovery data, None for faulty codec."""
+    codec_code = extract_codec(codec_script)
+    if not codec_code:
+        return None
+    try:
+        return json.loads(evaluate_ha_device_info(engine_class(), codec_code))
+    except Exception:  # pylint: disable=broad-exception-caught
+        return None
+
+
+@pytest.fixture(params=list(JS_ENGINES))
+def engine_class(request):
+    """Engine class under test, engines not installed are skipped."""
+    engine_class = JS_ENGINES[request.param]
+    if not engine_class.available():
+        pytest.skip(f"JavaScript engine '{request.param}' is not installed")
+    return engine_class
+
+
+@pytest.mark.parametrize("script", DEVICE_INFO_SCRIPTS, ids=[script.name for script in DEVICE_INFO_SCRIPTS])
+def test_device_info_scripts(engine_class, script):
+    """Test getHaDeviceInfo sample scripts evaluate to the same discovery data as with default engine."""
+    codec_script = script.read_text(encoding="utf-8")
+    discovery = evaluate(engine_class, codec_script)
+    assert discovery and discovery["entities"]
+    assert discovery == evaluate(DukpyEngine, codec_script)
+
+
+@pytest.mark.parametrize("codec_no", FIXTURE_CODECS)
+def test_codec_fixtures(engine_class, codec_no):
+    """Test codec fixtures evaluate to the same discovery data (or fail) as with default engine."""
+    codec_script = CODEC[codec_no][1].replace("{dev_no}", "0")
+    assert evaluate(engine_class, codec_script) == evaluate(DukpyEngine, codec_script)
+
+
+@pytest.mark.parametrize("script", DEVICE_INFO_SCRIPTS, ids=[script.name for script in DEVICE_INFO_SCRIPTS])
+def test_device_info_scripts_fast_path(script):
+    """Test getHaDeviceInfo sample scripts are parsed without engine to the same discovery data."""
+    codec_script = script.read_text(encoding="utf-8")
+    assert parse_literal_codec(extract_codec(codec_script)) == evaluate(DukpyEngine, codec_script)
+
+
+@pytest.mark.parametrize("codec_no", range(len(CODEC)))
+def test_codec_fixtures_fast_path(codec_no):
+    """Test codec fixtures are parsed to the same discovery data as evaluated or left to engine."""
+    codec_script = CODEC[codec_no][1].replace("{dev_no}", "0")
+    codec_code = extract_codec(codec_script)
+    discovery = parse_literal_codec(codec_code) if codec_code else None
+    if discovery is not None:
+        assert discovery == evaluate(DukpyEngine, codec_script)
+
+
+@pytest.mark.parametrize(
+    "codec_code",
+    [
+        "function getHaDeviceInfo() {var info = {entities: {}}; return info;}",
+        "function getHaDeviceInfo() {return {entities: {}}} getHaDeviceInfo = null;",
+        "function getHaDeviceInfo() {return {entities: {a: 1 + 1}}}",
+        "function getHaDeviceInfo() {return {entities: {a: `template`}}}",
+        "function getHaDeviceInfo() {return {entities: {1: 'index'}}}",
+        "function getHaDeviceInfo() {return {entities: {a: undefined}}}",
+        "function getHaDeviceInfo() {return [{entities: {}}]}",
+    ],
+)
+def test_fast_path_fallback(codec_code):
+    """Test codecs with logic, code after function or JavaScript specific values are left to engine."""
+    assert parse_literal_codec(codec_code) is None
@@ -0,0 +1,70 @@
+"""Test device class registry built from classes.json."""
+import json
+from pathlib import Path
+from unittest import mock
+import pytest
+
+from chirpha.device_classes import DeviceClassRegistry
+
+CLASSES_FILE = Path(__file__).absolute().parents[1] / "chirpha" / "classes.json"
+
+
+def linear_lookup(classes, device_class):
+    """Resolve integration by walking integrations in listed order."""
+    for integration in classes["integrations"]:
+        if device_class in classes[integration]:
+            return integration
+    return None
+
+
+def test_classes_file():
+    """Test registry resolves all device classes of classes.json as listed order walk does."""
+    with open(CLASSES_FILE, "r") as file:
+        classes = json.load(file)
+    registry = DeviceClassRegistry.from_file(CLASSES_FILE)
+    all_classes = {device_class for integration in classes if integration != "integrations" for device_class in classes[integration]}
+    for device_class in all_classes | {"gas001"}:
+        assert registry.get_integration(device_class) == linear_lookup(classes, device_class)
+    assert registry.get_integration("gas") == "sensor"
+    assert registry.get_integration("door") == "binary_sensor"
+    assert registry.integrations == tuple(classes["integrations"])
+
+
+def test_conflicts():
+    """Test device class listed for several integrations resolves to first listed integration, conflicts are kept."""
+    registry = DeviceClassRegistry({"integrations": ["cover", "binary_sensor"], "binary_sensor": ["door", "motion"], "cover": ["door"]})
+    assert registry.get_integration("door") == "cover"
+    assert registry.get_integration("motion") == "binary_sensor"
+    assert registry.conflicts == {"door": ["cover", "binary_sensor"]}
+    assert len(registry) == 2 and "door" in registry
+
+
+def test_unknown_device_class(caplog):
+    """Test unknown device class lookup result is cached, index is not searched again and miss is logged once."""
+    registry = DeviceClassRegistry({"integrations": ["sensor"], "sensor": ["gas"]})
+    caplog.set_level("DEBUG")
+    assert not registry.is_unknown("gas001")
+    assert registry.get_integration("gas001") is None
+    with mock.patch.object(registry, "_index", new=mock.MagicMock(wraps=registry._index)) as index:
+        assert registry.get_integration("gas001") is None
+        assert registry.get_integration("gas") == "sensor"
+    assert [call.args for call in index.get.call_args_list] == [("gas",)]
+    assert registry.is_unknown("gas001") and "gas001" not in registry
+    assert len([record for record in caplog.records if "not found in device class registry" in record.getMessage()]) == 1
+
+
+@pytest.mark.parametrize(
+    "classes",
+    [
+        [],
+        {"sensor": ["gas"]},
+        {"integrations": "sensor", "sensor": ["gas"]},
+        {"integrations": ["sensor"]},
+        {"integrations": ["sensor"], "sensor": "gas"},
+        {"integrations": ["sensor"], "sensor": [1]},
+    ],
+)
+def test_invalid_classes(classes):
+    """Test malformed device classes are rejected."""
+    with pytest.raises(ValueError):
+        DeviceClassRegistry(classes)
@@ -0,0 +1,197 @@
+"""Test compact discovery payload encoding."""
+import pytest
+
+from chirpha.discovery import ABBREVIATIONS, DEVICE_ABBREVIATIONS, ORIGIN_ABBREVIATIONS, compact_discovery_config, expand_discovery_config
+
+BASE_TOPIC = "application/ApplicationId0/device/dev_eui0"
+# abbreviation: key tables published by HA (homeassistant/components/mqtt/abbreviations.py), excerpt of keys used by bridge table
+HA_ABBREVIATIONS = {
+    "act_t": "action_topic",
+    "act_tpl": "action_template",
+    "atype": "automation_type",
+    "avty": "availability",
+    "avty_mode": "availability_mode",
+    "avty_t": "availability_topic",
+    "avty_tpl": "availability_template",
+    "bri_cmd_t": "brightness_command_topic",
+    "bri_cmd_tpl": "brightness_command_template",
+    "bri_scl": "brightness_scale",
+    "bri_stat_t": "brightness_state_topic",
+    "bri_val_tpl": "brightness_value_template",
+    "cmd_t": "command_topic",
+    "cmd_tpl": "command_template",
+    "cmps": "components",
+    "curr_temp_t": "current_temperature_topic",
+    "curr_temp_tpl": "current_temperature_template",
+    "dev": "device",
+    "dev_cla": "device_class",
+    "en": "enabled_by_default",
+    "ent_cat": "entity_category",
+    "ent_pic": "entity_picture",
+    "exp_aft": "expire_after",
+    "frc_upd": "force_update",
+    "hum_cmd_t": "target_humidity_command_topic",
+    "hum_cmd_tpl": "target_humidity_command_template",
+    "hum_stat_t": "target_humidity_state_topic",
+    "hum_stat_tpl": "target_humidity_state_template",
+    "ic": "icon",
+    "json_attr_t": "json_attributes_topic",
+    "json_attr_tpl": "json_attributes_template",
+    "max_hum": "max_humidity",
+    "min_hum": "min_humidity",
+    "mode_cmd_t": "mode_command_topic",
+    "mode_cmd_tpl": "mode_command_template",
+    "mode_stat_t": "mode_state_topic",
+    "mode_stat_tpl": "mode_state_template",
+    "o": "origin",
+    "obj_id": "object_id",
+    "off_dly": "off_delay",
+    "opt": "optimistic",
+    "ops": "options",
+    "p": "platform",
+    "pl_avail": "payload_available",
+    "pl_cls": "payload_close",
+    "pl_lock": "payload_lock",
+    "pl_not_avail": "payload_not_available",
+    "pl_off": "payload_off",
+    "pl_on": "payload_on",
+    "pl_open": "payload_open",
+    "pl_prs": "payload_press",
+    "pl_stop": "payload_stop",
+    "pl_unlk": "payload_unlock",
+    "pos_clsd": "position_closed",
+    "pos_open": "position_open",
+    "pos_t": "position_topic",
+    "pos_tpl": "position_template",
+    "ret": "retain",
+    "set_pos_t": "set_position_topic",
+    "set_pos_tpl": "set_position_template",
+    "stat_cla": "state_class",
+    "stat_closing": "state_closing",
+    "stat_clsd": "state_closed",
+    "stat_locked": "state_locked",
+    "stat_off": "state_off",
+    "stat_on": "state_on",
+    "stat_open": "state_open",
+    "stat_opening": "state_opening",
+    "stat_t": "state_topic",
+    "stat_tpl": "state_template",
+    "stat_unlocked": "state_unlocked",
+    "stat_val_tpl": "state_value_template",
+    "sug_dsp_prc": "suggested_display_precision",
+    "t": "topic",
+    "temp_cmd_t": "temperature_command_topic",
+    "temp_cmd_tpl": "temperature_command_template",
+    "temp_stat_t": "temperature_state_topic",
+    "temp_stat_tpl": "temperature_state_template",
+    "temp_unit": "temperature_unit",
+    "uniq_id": "unique_id",
+    "unit_of_meas": "unit_of_measurement",
+    "val_tpl": "value_template",
+}
+HA_DEVICE_ABBREVIATIONS = {
+    "cns": "connections",
+    "cu": "configuration_url",
+    "hw": "hw_version",
+    "ids": "identifiers",
+    "mdl": "model",
+    "mdl_id": "model_id",
+    "mf": "manufacturer",
+    "name": "name",
+    "sa": "suggested_area",
+    "sn": "serial_number",
+    "sw": "sw_version",
+    "via_device": "via_device",
+}
+HA_ORIGIN_ABBREVIATIONS = {
+    "name": "name",
+    "sw": "sw_version",
+    "url": "support_url",
+}
+DEVICE = {
+    "manufacturer": "vendor0",
+    "model": "model1",
+    "name": "device_name0",
+    "identifiers": ["chirp2mqtt_dev_eui0"],
+    "via_device": "chirp2mqtt_bridge_cae147e6da8f23baf1392e8fa9bdc6dd",
+}
+ORIGIN = {"name": "Chirp2MQTT", "sw_version": "1.1.50", "support_url": "https://github.com/modrisb/chirpha"}
+SENSOR = {
+    "device_class": "gas",
+    "value_template": "{{ value_json.object.counter }}",
+    "state_topic": f"{BASE_TOPIC}/event/up",
+    "command_topic": f"{BASE_TOPIC}/command/down",
+    "json_attributes_topic": "application/ApplicationId0/device/dev_eui00/event/up",
+    "availability": [{"topic": f"{BASE_TOPIC}/event/cur", "value_template": "{{ value_json.state }}"}],
+    "unique_id": "chirp2mqtt_dev_eui0_counter",
+    "object_id": "dev_eui0_counter",
+    "enabled_by_default": True,
+    "device": DEVICE,
+    "origin": ORIGIN,
+    "time_stamp": 1792290578.1988487,
+}
+DEVICE_CONFIG = {
+    "device": DEVICE,
+    "origin": ORIGIN,
+    "availability": [{"topic": "application/ApplicationId0/bridge/status", "value_template": "{{ value_json.state }}"}],
+    "state_topic": f"{BASE_TOPIC}/event/up",
+    "components": {
+        "counter": {"platform": "sensor", "device_class": "gas", "unique_id": "chirp2mqtt_dev_eui0_counter"},
+        "valve": {"platform": "switch", "command_topic": f"{BASE_TOPIC}/command/down", "unique_id": "chirp2mqtt_dev_eui0_valve"},
+    },
+}
+
+
+@pytest.mark.parametrize("discovery_config", [SENSOR, DEVICE_CONFIG, {"name": "no topics", "device": DEVICE}], ids=["sensor", "device", "no_topics"])
+def test_round_trip(discovery_config):
+    """Test compact discovery config expands to the original config."""
+    assert expand_discovery_config(compact_discovery_config(discovery_config, BASE_TOPIC)) == discovery_config
+    assert expand_discovery_config(compact_discovery_config(discovery_config)) == discovery_config
+
+
+def test_compact_sensor():
+    """Test keys are abbreviated and device topics are based on '~' topic."""
+    compact = compact_discovery_config(SENSOR, BASE_TOPIC)
+    assert compact["~"] == BASE_TOPIC
+    assert compact["stat_t"] == "~/event/up"
+    assert compact["cmd_t"] == "~/command/down"
+    assert compact["json_attr_t"] == SENSOR["json_attributes_topic"]   # other device topic
+    assert compact["avty"] == [{"t": "~/event/cur", "val_tpl": "{{ value_json.state }}"}]
+    assert compact["dev"]["ids"] == DEVICE["identifiers"] and compact["dev"]["mf"] == DEVICE["manufacturer"]
+    assert compact["o"] == {"name": "Chirp2MQTT", "sw": "1.1.50", "url": ORIGIN["support_url"]}
+    assert compact["time_stamp"] == SENSOR["time_stamp"]
+    assert not set(compact) & set(ABBREVIATIONS)
+
+
+def test_compact_device():
+    """Test device based config components are abbreviated and share '~' topic of device level."""
+    compact = compact_discovery_config(DEVICE_CONFIG, BASE_TOPIC)
+    assert compact["~"] == BASE_TOPIC and compact["stat_t"] == "~/event/up"
+    assert compact["avty"][0]["t"] == "application/ApplicationId0/bridge/status"
+    assert compact["cmps"]["valve"] == {"p": "switch", "cmd_t": "~/command/down", "uniq_id": "chirp2mqtt_dev_eui0_valve"}
+
+
+def test_compact_no_topic_base():
+    """Test '~' topic is not added without topics to shorten and own '~' topic is kept."""
+    assert "~" not in compact_discovery_config({"name": "no topics", "device": DEVICE}, BASE_TOPIC)
+    own_base = {"~": "custom/base", "state_topic": "~/state", "command_topic": f"{BASE_TOPIC}/command/down"}
+    assert compact_discovery_config(own_base, BASE_TOPIC) == {"~": "custom/base", "stat_t": "~/state", "cmd_t": f"{BASE_TOPIC}/command/down"}
+    assert expand_discovery_config(compact_discovery_config(own_base, BASE_TOPIC)) == {
+        "state_topic": "custom/base/state", "command_topic": f"{BASE_TOPIC}/command/down"
+    }
+
+
+@pytest.mark.parametrize(
+    "abbreviations, ha_abbreviations",
+    [(ABBREVIATIONS, HA_ABBREVIATIONS), (DEVICE_ABBREVIATIONS, HA_DEVICE_ABBREVIATIONS), (ORIGIN_ABBREVIATIONS, HA_ORIGIN_ABBREVIATIONS)],
+    ids=["entity", "device", "origin"],
+)
+def test_abbreviations_match_ha(abbreviations, ha_abbreviations):
+    """Test abbreviation tables equal HA published abbreviations, each abbreviation is expanded by HA to the same key."""
+    assert abbreviations == {key: abbreviation for abbreviation, key in ha_abbreviations.items()}
+
+
+def test_abbreviations_unique():
+    """Test abbreviations map back to a single key."""
+    for abbreviations in (ABBREVIATIONS, DEVICE_ABBREVIATIONS, ORIGIN_ABBREVIATIONS):
+        assert len(set(abbreviations.values())) == len(abbreviations)
@@ -2,10 +2,19 @@
 
 from tests import common
 import logging
+import os
+import json
+import subprocess
+import threading
 from unittest import mock
 
-from .patches import get_size, mqtt, set_size, dukpy
+from .patches import get_size, mqtt, set_size, dukpy, getprofilecount, getdevcount, api
 from chirpha.const import ERRMSG_CODEC_ERROR, ERRMSG_DEVICE_IGNORED
+from tests.common import PAGING_CONFIGURATION_FILE, RELOAD_WORKERS_CONFIGURATION_FILE, GRPC_ASYNC_CONFIGURATION_FILE
+from tests.common import CODEC_CACHE_CONFIGURATION_FILE, CODEC_WORKERS_CONFIGURATION_FILE, QUICKJS_CONFIGURATION_FILE
+from tests.common import NO_FAST_PATH_CONFIGURATION_FILE
+import chirpha.codec
+import chirpha.grpc
 
 def test_faulty_codec(caplog):
     """Test faulty codec - devices are not installed."""
@@ -18,10 +27,10 @@ def test_faulty_codec(caplog):
         if record.msg == ERRMSG_DEVICE_IGNORED: i_sensor_err2 += 1
     assert i_sensor_err1 == 1 and i_sensor_err2 == 1
 
-@mock.patch("chirpha.grpc.dukpy", new=dukpy)
+@mock.patch("chirpha.codec.dukpy", new=dukpy)
 def test_faulty_json(caplog):
     """Test faulty codec json: conversion to json mocked false making descriptor ignored """
-    common.chirp_setup_and_run_test(caplog, common.check_for_no_registration, test_params=dict(devices=1, codec=19), allowed_msg_level=logging.ERROR)
+    common.chirp_setup_and_run_test(caplog, common.check_for_no_registration, conf_file=NO_FAST_PATH_CONFIGURATION_FILE, test_params=dict(devices=1, codec=19), allowed_msg_level=logging.ERROR)
     i_sensor_err = 0
     for record in caplog.records:
         if record.msg == ERRMSG_DEVICE_IGNORED: i_sensor_err += 1
@@ -85,3 +94,237 @@ def test_codec_with_comment(caplog):
     for record in caplog.records:
         if record.msg == ERRMSG_CODEC_ERROR: i_sensor_err += 1
     assert i_sensor_err == 1
+
+def test_device_profile_cache(caplog):
+    """Test device profiles are read once and re-read only after profile update on server."""
+
+    def run_test_device_profile_cache(config):
+        assert getprofilecount[0] == get_size("devices")
+        common.reload_devices(config)
+        assert getprofilecount[0] == get_size("devices")    # all profiles served from cache
+        assert get_size("idevices") == mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_devices
+        set_size(devices=2, codec=2)    # profile update on server
+        common.reload_devices(config)
+        assert getprofilecount[0] == get_size("devices")
+        assert get_size("sensors") * get_size("idevices") == mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_sensors
+
+    common.chirp_setup_and_run_test(caplog, run_test_device_profile_cache, test_params=dict(devices=2, codec=1))
+
+def test_device_state_sweep(caplog):
+    """Test device details are read only for devices updated on server since previous reload."""
+
+    def run_test_device_state_sweep(config):
+        assert getdevcount[0] == get_size("devices")
+        common.reload_devices(config)
+        assert getdevcount[0] == get_size("devices")    # device states served from cache
+        set_size(devices=2, codec=1, disabled=True)     # devices disabled on server
+        common.reload_devices(config)
+        assert getdevcount[0] == get_size("devices")
+        assert mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_devices == 0
+
+    common.chirp_setup_and_run_test(caplog, run_test_device_state_sweep, test_params=dict(devices=2, codec=1))
+
+def test_paged_device_list(caplog):
+    """Test device list is read page by page with page size smaller than device count."""
+
+    def run_test_paged_device_list(config):
+        assert get_size("idevices") == mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_devices
+        set_size(devices=4, codec=1)
+        common.reload_devices(config)
+        assert get_size("idevices") == mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_devices
+        assert get_size("sensors") * get_size("idevices") == mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_sensors
+
+    common.chirp_setup_and_run_test(caplog, run_test_paged_device_list, conf_file=PAGING_CONFIGURATION_FILE, test_params=dict(devices=5, codec=1))
+
+def test_concurrent_reload_order(caplog):
+    """Test concurrently processed devices are registered in device list order."""
+
+    def run_test_concurrent_reload_order(config):
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).get_published()
+        common.reload_devices(config)
+        dev_euis = []
+        for message in mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).get_published():
+            sub_topics = message[0].split("/")
+            if sub_topics[-1] == "config" and message[1] and sub_topics[2] not in dev_euis:
+                dev_euis.append(sub_topics[2])
+        assert dev_euis == [f"dev_eui{i}" for i in range(0, get_size("devices"))]
+        assert get_size("idevices") == mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_devices
+
+    common.chirp_setup_and_run_test(caplog, run_test_concurrent_reload_order, conf_file=RELOAD_WORKERS_CONFIGURATION_FILE, test_params=dict(devices=7, codec=0))
+
+def test_concurrent_reload_faulty_codec(caplog):
+    """Test faulty codec is isolated to its device while processed concurrently."""
+
+    common.chirp_setup_and_run_test(caplog, common.check_for_no_registration, conf_file=RELOAD_WORKERS_CONFIGURATION_FILE, test_params=dict(devices=3, codec=3), allowed_msg_level=logging.ERROR)
+    i_sensor_err = 0
+    for record in caplog.records:
+        if record.msg == ERRMSG_DEVICE_IGNORED: i_sensor_err += 1
+    assert i_sensor_err == 3
+
+def test_async_grpc_reload(caplog):
+    """Test asyncio gRPC client registers devices in list order and reuses cached profiles/states."""
+
+    def run_test_async_grpc_reload(config):
+        assert getprofilecount[0] == get_size("devices")
+        assert getdevcount[0] == get_size("devices")
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).get_published()
+        common.reload_devices(config)
+        assert getprofilecount[0] == get_size("devices")    # all profiles served from cache
+        assert getdevcount[0] == get_size("devices")        # device states served from cache
+        dev_euis = []
+        for message in mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).get_published():
+            sub_topics = message[0].split("/")
+            if sub_topics[-1] == "config" and message[1] and sub_topics[2] not in dev_euis:
+                dev_euis.append(sub_topics[2])
+        assert dev_euis == [f"dev_eui{i}" for i in range(0, get_size("devices"))]
+        set_size(devices=3, codec=1, disabled=True)     # devices disabled on server
+        common.reload_devices(config)
+        assert getdevcount[0] == get_size("devices")
+        assert mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_devices == 0
+
+    common.chirp_setup_and_run_test(caplog, run_test_async_grpc_reload, conf_file=GRPC_ASYNC_CONFIGURATION_FILE, test_params=dict(devices=5, codec=0))
+
+def test_async_grpc_codec_off_loop(caplog):
+    """Test asyncio gRPC client evaluates codecs outside of event loop thread."""
+    evaluated_in = []
+    build_device_discovery = chirpha.grpc.ChirpGrpc.build_device_discovery
+
+    def recording_build_device_discovery(self, device, profile):
+        evaluated_in.append(threading.current_thread().name)
+        return build_device_discovery(self, device, profile)
+
+    def run_test_async_grpc_codec_off_loop(config):
+        assert len(evaluated_in) == get_size("devices")
+        assert "chirp-grpc-aio" not in evaluated_in
+
+    with mock.patch("chirpha.grpc.ChirpGrpc.build_device_discovery", new=recording_build_device_discovery):
+        common.chirp_setup_and_run_test(caplog, run_test_async_grpc_codec_off_loop, conf_file=GRPC_ASYNC_CONFIGURATION_FILE, test_params=dict(devices=3, codec=1))
+
+def test_codec_cache(caplog, tmp_path):
+    """Test codec shared by device profiles is evaluated once, persisted evaluation results are reused after restart."""
+    cache_file = str(tmp_path / "codec_cache.json")
+    evaljs = chirpha.codec.dukpy.JSInterpreter.evaljs
+    evaluated = []
+
+    def counting_evaljs(self, code, **kwargs):
+        if "getHaDeviceInfo" in code:
+            evaluated.append(code)
+        return evaljs(self, code, **kwargs)
+
+    def run_test_codec_cache(config):
+        common.reload_devices(config)
+        assert get_size("idevices") == mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_devices
+        assert get_size("sensors") * get_size("idevices") == mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_sensors
+
+    with mock.patch("chirpha.grpc.CODEC_CACHE_FILE", new=cache_file), mock.patch("chirpha.codec.dukpy.JSInterpreter.evaljs", new=counting_evaljs):
+        common.chirp_setup_and_run_test(caplog, run_test_codec_cache, conf_file=CODEC_CACHE_CONFIGURATION_FILE, test_params=dict(devices=3, codec=1))
+        assert len(evaluated) == 1
+        assert os.path.isfile(cache_file)
+        common.chirp_setup_and_run_test(caplog, run_test_codec_cache, conf_file=CODEC_CACHE_CONFIGURATION_FILE, test_params=dict(devices=3, codec=1))
+        assert len(evaluated) == 1
+
+def test_codec_cache_prune(caplog, tmp_path):
+    """Test persisted codec cache keeps only codecs used by device profiles of latest full reload."""
+    cache_file = str(tmp_path / "codec_cache.json")
+
+    def run_test_codec_cache_prune(config):
+        common.reload_devices(config)
+
+    def cached_codecs():
+        with open(cache_file, "r") as file:
+            return set(json.load(file))
+
+    with mock.patch("chirpha.grpc.CODEC_CACHE_FILE", new=cache_file):
+        common.chirp_setup_and_run_test(caplog, run_test_codec_cache_prune, conf_file=CODEC_CACHE_CONFIGURATION_FILE, test_params=dict(devices=3, codec=1))
+        first_codecs = cached_codecs()
+        assert len(first_codecs) == 1
+        common.chirp_setup_and_run_test(caplog, run_test_codec_cache_prune, conf_file=CODEC_CACHE_CONFIGURATION_FILE, test_params=dict(devices=3, codec=2))  # profile codec changed
+        assert len(cached_codecs()) == 1 and not cached_codecs() & first_codecs
+        assert "1 codec(s) not used by device profiles dropped from codec cache" in caplog.text
+
+    cache = chirpha.codec.CodecCache()
+    cache.put("codec0", {"entities": {}})
+    cache.put("codec1", {"entities": {}})
+    cache.prune()   # both used since created
+    assert cache.get("codec0") is not None
+    cache.prune()   # only codec0 read since previous prune
+    assert cache.get("codec0") is not None and cache.get("codec1") is None
+
+def test_codec_worker_pool(caplog):
+    """Test codecs evaluated in worker processes - devices to be installed."""
+
+    def run_test_codec_worker_pool(config):
+        assert get_size("idevices") == mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_devices
+        assert get_size("sensors") * get_size("idevices") == mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_sensors
+
+    common.chirp_setup_and_run_test(caplog, run_test_codec_worker_pool, conf_file=CODEC_WORKERS_CONFIGURATION_FILE, test_params=dict(devices=3, codec=1))
+
+def test_codec_worker_timeout(caplog):
+    """Test runaway codec evaluation is stopped on timeout, device not installed."""
+
+    common.chirp_setup_and_run_test(caplog, common.check_for_no_registration, conf_file=CODEC_WORKERS_CONFIGURATION_FILE, test_params=dict(devices=1, codec=22), allowed_msg_level=logging.ERROR)
+    i_sensor_err1 = 0
+    i_sensor_err2 = 0
+    for record in caplog.records:
+        if record.msg == ERRMSG_CODEC_ERROR: i_sensor_err1 += 1
+        if record.msg == ERRMSG_DEVICE_IGNORED: i_sensor_err2 += 1
+    assert i_sensor_err1 == 1 and i_sensor_err2 == 1
+
+def test_quickjs_engine(caplog):
+    """Test codecs evaluated with configured JavaScript engine, default engine used if it is not installed."""
+
+    def run_test_quickjs_engine(config):
+        assert get_size("idevices") == mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_devices
+        assert get_size("sensors") * get_size("idevices") == mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_sensors
+
+    common.chirp_setup_and_run_test(caplog, run_test_quickjs_engine, conf_file=QUICKJS_CONFIGURATION_FILE, test_params=dict(devices=2, codec=1), allowed_msg_level=logging.WARNING)
+
+def test_codec_fast_path(caplog):
+    """Test object literal codecs are parsed without JavaScript engine, codecs with logic are evaluated."""
+    evaljs = chirpha.codec.dukpy.JSInterpreter.evaljs
+    evaluated = []
+
+    def counting_evaljs(self, code, **kwargs):
+        if "getHaDeviceInfo" in code:
+            evaluated.append(code)
+        return evaljs(self, code, **kwargs)
+
+    def run_test_codec_fast_path(config):
+        assert get_size("idevices") == mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_devices
+        assert get_size("sensors") * get_size("idevices") == mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_sensors
+
+    with mock.patch("chirpha.codec.dukpy.JSInterpreter.evaljs", new=counting_evaljs):
+        common.chirp_setup_and_run_test(caplog, run_test_codec_fast_path, test_params=dict(devices=2, codec=1))
+        assert len(evaluated) == 0
+        common.chirp_setup_and_run_test(caplog, run_test_codec_fast_path, conf_file=NO_FAST_PATH_CONFIGURATION_FILE, test_params=dict(devices=2, codec=1))
+        assert len(evaluated) == 1
+
+def test_api_key_cache(caplog, tmp_path):
+    """Test api key created once and reused from cache while accepted by api server."""
+    api_key_file = str(tmp_path / "chirpha_api_key.json")
+    tenant_list = api.TenantServiceStub.List
+    run = subprocess.run
+    created = []
+
+    def counting_run(args, **kwargs):
+        created.append(args)
+        return run(args, **kwargs)
+
+    def checking_list(self, listTenantsReq, metadata):
+        if ("authorization", "Bearer revoked") in metadata:
+            raise Exception("UNAUTHENTICATED")
+        return tenant_list(self, listTenantsReq, metadata)
+
+    with mock.patch("chirpha.grpc.API_KEY_CACHE_FILE", new=api_key_file), mock.patch("chirpha.grpc.subprocess.run", new=counting_run), mock.patch.object(api.TenantServiceStub, "List", new=checking_list):
+        common.chirp_setup_and_run_test(caplog, None)
+        assert len(created) == 1
+        assert os.stat(api_key_file).st_mode & 0o777 == 0o600
+        common.chirp_setup_and_run_test(caplog, None)
+        assert len(created) == 1
+        assert "Cached api key a-b-c-d reused" in caplog.text
+        with open(api_key_file, "w") as file:
+            json.dump({"id": "a-b-c-d", "token": "revoked"}, file)
+        common.chirp_setup_and_run_test(caplog, None, conf_file=GRPC_ASYNC_CONFIGURATION_FILE)
+        assert len(created) == 2
+        with open(api_key_file, "r") as file:
+            assert json.load(file)["token"] != "revoked"
@@ -4,7 +4,7 @@ import time
 from tests import common
 
 from .patches import get_size, mqtt, set_size
-from tests.common import NO_APP_CONFIGURATION_FILE, MIN_SLEEP
+from tests.common import NO_APP_CONFIGURATION_FILE, GRPC_ASYNC_CONFIGURATION_FILE, MIN_SLEEP
 from chirpha.const import WARMSG_APPID_WRONG
 
 def test_entry_setup_unload(caplog):
@@ -28,6 +28,22 @@ def test_setup_with_no_tenants(caplog):
         if "Tenant '" in record.msg: i_sensor_ten += 1
     assert i_sensor_warn == 1 and i_sensor_ten == 1
 
+def test_async_grpc_setup_with_no_apps(caplog):
+    """Test asyncio gRPC client creates missing application and app is up."""
+
+    common.chirp_setup_and_run_test(caplog, None, test_params=dict(applications=0), a_live_at_end=True, conf_file=GRPC_ASYNC_CONFIGURATION_FILE, allowed_msg_level=logging.WARNING)
+    i_sensor_warn = 0
+    i_sensor_app = 0
+    for record in caplog.records:
+        if record.msg == WARMSG_APPID_WRONG: i_sensor_warn += 1
+        if "Application '" in record.msg: i_sensor_app += 1
+    assert i_sensor_warn == 1 and i_sensor_app == 1
+
+def test_async_grpc_connection_failure(caplog):
+    """Test app exits in case of grpc.aio failure."""
+
+    common.chirp_setup_and_run_test(caplog, None, conf_file=GRPC_ASYNC_CONFIGURATION_FILE, test_params=dict(grpc=0), a_live_at_end=False)
+
 def test_setup_with_autoselected_tenant_no_apps(caplog):
     """Test if integration unloads with default configuration."""
 
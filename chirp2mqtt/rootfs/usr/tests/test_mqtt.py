@@ -1,13 +1,30 @@
 """Test the ChirpStack LoRa integration MQTT integration class."""
 
+import asyncio
+import copy
 import time
+import json
 import logging
+import os
+import re
+import threading
+from unittest import mock
+
+import pytest
 
 from chirpha.const import BRIDGE_CONF_COUNT, CONF_APPLICATION_ID, WARMSG_DEVCLS_REMOVED
 from tests import common
+import chirpha.discovery
+import chirpha.grpc
+import chirpha.mqtt
 
 from .patches import get_size, mqtt, set_size
-from tests.common import PAYLOAD_PRINT_CONFIGURATION_FILE
+from tests.common import PAYLOAD_PRINT_CONFIGURATION_FILE, INCREMENTAL_CONFIGURATION_FILE, DISCOVERY_SNAPSHOT_CONFIGURATION_FILE
+from tests.common import ONBOARD_CONFIGURATION_FILE, MESSAGE_QUEUE_CONFIGURATION_FILE, ASYNCIO_RUNTIME_CONFIGURATION_FILE
+from tests.common import ASYNCIO_PER_DEVICE_CONFIGURATION_FILE, MESSAGE_QUEUE_DELAY_CONFIGURATION_FILE, REGULAR_CONFIGURATION_NONZERO_DELAYS
+from tests.common import MESSAGE_QUEUE_INCREMENTAL_CONFIGURATION_FILE
+from tests.common import DEVICE_WORKERS_CONFIGURATION_FILE, DISCOVERY_NODE_ID_CONFIGURATION_FILE, CONFIG_HASH_CONFIGURATION_FILE
+from tests.common import DEVICE_DISCOVERY_CONFIGURATION_FILE, COMPACT_DISCOVERY_CONFIGURATION_FILE, DISCOVERY_TEMPLATES_CONFIGURATION_FILE
 
 def test_extended_debug_level(caplog):
     """Test run with extended debug enabled."""
@@ -105,3 +122,477 @@ def test_humidifier_dev_class(caplog):
 
 # to remove retained messages
 # mosquitto_pub -h ha -u loramqtt -P ploramqtt -t "application/72a56954-700f-4a52-90d2-86cf76df5c57/bridge/status"  -n -r -d
+
+def test_incremental_reload(caplog):
+    """Test incremental reload publishes only added/changed devices and removes disappeared ones."""
+
+    def run_test_incremental_reload(config):
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).get_published()
+        common.reload_devices(config)   # nothing changed
+        assert mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_devices == 0
+        assert common.count_messages(r'/config$', None) == 0
+        set_size(devices=3, codec=1)    # device added
+        common.reload_devices(config)
+        assert mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_devices == 1
+        assert mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_sensors == get_size("sensors")
+        set_size(devices=1, codec=1)    # devices removed
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).get_published()
+        common.reload_devices(config)
+        assert mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_devices == 0
+        assert common.count_messages_with_no_payload(r'/config$') == 2 * get_size("sensors")
+        set_size(devices=1, codec=2)    # profile changed
+        common.reload_devices(config)
+        assert mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_devices == get_size("idevices")
+        assert mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_sensors == get_size("idevices") * get_size("sensors")
+        restart_topic = f"application/{config.get(CONF_APPLICATION_ID)}/bridge/restart"
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).publish(restart_topic, "full")  # full rebuild on request
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).wait_empty_queue()
+        assert mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_devices == get_size("idevices")
+
+    common.chirp_setup_and_run_test(caplog, run_test_incremental_reload, conf_file=INCREMENTAL_CONFIGURATION_FILE, test_params=dict(devices=2, codec=1))
+
+def test_discovery_snapshot(caplog, tmp_path):
+    """Test discovery published from snapshot file at startup, devices changed meanwhile are republished after reconciliation."""
+    snapshot_file = str(tmp_path / "discovery_snapshot.json")
+
+    def run_test_discovery_snapshot(config):
+        for i in range(0, 50):
+            if "Discovery snapshot reconciliation requested" in caplog.text: break
+            time.sleep(0.1)
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).wait_empty_queue()
+
+    with mock.patch("chirpha.mqtt.DISCOVERY_SNAPSHOT_FILE", new=snapshot_file):
+        common.chirp_setup_and_run_test(caplog, None, conf_file=DISCOVERY_SNAPSHOT_CONFIGURATION_FILE, test_params=dict(devices=2, codec=1))
+        assert "from discovery snapshot" not in caplog.text
+        with open(snapshot_file, "r") as file:
+            snapshot = json.load(file)
+        assert len(snapshot["devices"]) == get_size("idevices")
+        assert all(device["dev_conf"]["codec_hash"] for device in snapshot["devices"])
+        caplog.clear()
+        common.chirp_setup_and_run_test(caplog, run_test_discovery_snapshot, conf_file=DISCOVERY_SNAPSHOT_CONFIGURATION_FILE, test_params=dict(devices=2, codec=2))  # profile changed
+        assert "from discovery snapshot" in caplog.text
+        assert "Discovery snapshot reconciliation requested" in caplog.text
+
+def test_discovery_snapshot_restore(caplog, tmp_path):
+    """Test values of devices published from snapshot and not changed since are restored after reconciliation."""
+    snapshot_file = str(tmp_path / "discovery_snapshot.json")
+
+    def run_test_discovery_snapshot_restore(config):
+        for i in range(0, 50):
+            if common.count_messages(r'/device/dev_eui0/event/up$', r'"batteryLevel":95', keep_history=True): break
+            time.sleep(0.1)
+        assert "Discovery snapshot reconciliation requested" in caplog.text
+        assert common.count_messages(r'/device/dev_eui0/event/up$', r'"batteryLevel":95', keep_history=True) == 1
+        assert common.count_messages(r'/device/dev_eui1/event/up$', r'"batteryLevel"', keep_history=True) == 0  # external power source
+
+    with mock.patch("chirpha.mqtt.DISCOVERY_SNAPSHOT_FILE", new=snapshot_file):
+        common.chirp_setup_and_run_test(caplog, None, conf_file=DISCOVERY_SNAPSHOT_CONFIGURATION_FILE, test_params=dict(devices=2, codec=0))
+        caplog.clear()
+        common.chirp_setup_and_run_test(caplog, run_test_discovery_snapshot_restore, conf_file=DISCOVERY_SNAPSHOT_CONFIGURATION_FILE, test_params=dict(devices=2, codec=0))
+        assert "from discovery snapshot" in caplog.text
+
+def test_onboard_on_join(caplog):
+    """Test device added on api server is published on join/first uplink, unknown device is looked up once."""
+
+    def run_test_onboard_on_join(config):
+        set_size(devices=3, codec=1)    # devices added
+        for dev_no, event in ((1, "join"), (2, "up"), (2, "up")):
+            topic = f"application/{config.get(CONF_APPLICATION_ID)}/device/dev_eui{dev_no}/event/{event}"
+            mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).publish(topic, '{"devEui": "dev_eui' + str(dev_no) + '"}')
+            mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).wait_empty_queue()
+        assert common.count_messages(r'/dev_eui1/.*/config$', None, keep_history=True) == get_size("sensors")
+        assert common.count_messages(r'/dev_eui2/.*/config$', None, keep_history=True) == get_size("sensors")
+        for i in range(0, 2):
+            topic = f"application/{config.get(CONF_APPLICATION_ID)}/device/unknown_dev/event/up"
+            mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).publish(topic, '{"devEui": "unknown_dev"}')
+            mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).wait_empty_queue()
+
+    common.chirp_setup_and_run_test(caplog, run_test_onboard_on_join, conf_file=ONBOARD_CONFIGURATION_FILE, test_params=dict(devices=1, codec=1))
+    assert caplog.text.count("Device dev_eui1 onboarded") == 1
+    assert caplog.text.count("Device dev_eui2 onboarded") == 1
+    assert caplog.text.count("Device unknown_dev not onboarded") == 1
+
+@pytest.mark.parametrize("conf_file", [REGULAR_CONFIGURATION_NONZERO_DELAYS, MESSAGE_QUEUE_DELAY_CONFIGURATION_FILE])
+def test_bridge_on_after_delay(caplog, conf_file):
+    """Test bridge is turned on after start delay by bridge worker or with bridge lock held, not on timer thread alone."""
+    turned_on = []
+    turn_bridge_on = chirpha.mqtt.ChirpToHA.turn_bridge_on
+
+    def recording_turn_bridge_on(self, restore_messages):
+        turned_on.append((threading.current_thread().name, self._bridge_lock.locked()))
+        return turn_bridge_on(self, restore_messages)
+
+    def run_test_bridge_on_after_delay(config):
+        for i in range(0, 50):
+            if turned_on: break
+            time.sleep(0.1)
+        if config.get("options_message_queue"):
+            assert turned_on == [("chirp-bridge-messages", False)]
+        else:
+            assert turned_on == [(turned_on[0][0], True)]
+
+    with mock.patch("chirpha.mqtt.ChirpToHA.turn_bridge_on", new=recording_turn_bridge_on):
+        common.chirp_setup_and_run_test(caplog, run_test_bridge_on_after_delay, conf_file=conf_file, test_params=dict(devices=1, codec=1))
+
+def test_message_queue(caplog):
+    """Test uplinks are processed by device worker while device reload is in progress on bridge worker."""
+    reload_started = threading.Event()
+    reload_release = threading.Event()
+    get_current_device_entities = chirpha.grpc.ChirpGrpc.get_current_device_entities
+
+    def blocking_get_current_device_entities(self, known_devices=None):
+        if reload_started.is_set():     # initial reload is not blocked
+            reload_release.wait(5)
+        reload_started.set()
+        return get_current_device_entities(self, known_devices)
+
+    def run_test_message_queue(config):
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).get_published()
+        restart_topic = f"application/{config.get(CONF_APPLICATION_ID)}/bridge/restart"
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).publish(restart_topic, "")
+        topic = f"application/{config.get(CONF_APPLICATION_ID)}/device/dev_eui0/event/up"
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).publish(topic, '{"object": {"counter": 77}}')
+        for i in range(0, 50):
+            if common.count_messages(r'/device/dev_eui0/event/cur$', r'"counter": 77', keep_history=True): break
+            time.sleep(0.1)
+        assert common.count_messages(r'/device/dev_eui0/event/cur$', r'"counter": 77', keep_history=True) == 1
+        assert common.count_messages(r'/config$', None, keep_history=True) == 0     # reload still waits
+        reload_release.set()
+        for i in range(0, 50):
+            if mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_devices == get_size("idevices"): break
+            time.sleep(0.1)
+
+    with mock.patch("chirpha.grpc.ChirpGrpc.get_current_device_entities", new=blocking_get_current_device_entities):
+        common.chirp_setup_and_run_test(caplog, run_test_message_queue, conf_file=MESSAGE_QUEUE_CONFIGURATION_FILE, test_params=dict(devices=2, codec=1))
+
+
+def test_values_cache_during_reload(caplog):
+    """Test values cached by device worker while devices are reloaded by bridge worker are kept."""
+    bridges = []
+    discovery_started = threading.Event()
+    discovery_release = threading.Event()
+    publish_device_discovery = chirpha.mqtt.ChirpToHA.publish_device_discovery
+
+    def blocking_publish_device_discovery(self, device):
+        bridges.append(self)
+        if device["dev_conf"]["dev_eui"] == "dev_eui2":     # added device, unchanged devices are processed already
+            discovery_started.set()
+            discovery_release.wait(5)
+        return publish_device_discovery(self, device)
+
+    def run_test_values_cache_during_reload(config):
+        set_size(devices=3, codec=1)    # device added
+        restart_topic = f"application/{config.get(CONF_APPLICATION_ID)}/bridge/restart"
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).publish(restart_topic, "")
+        assert discovery_started.wait(5)
+        topic = f"application/{config.get(CONF_APPLICATION_ID)}/device/dev_eui0/event/up"
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).publish(topic, '{"object": {"counter": 77}}')
+        for i in range(0, 50):
+            if common.count_messages(r'/device/dev_eui0/event/cur$', r'"counter": 77', keep_history=True): break
+            time.sleep(0.1)
+        discovery_release.set()
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).wait_empty_queue()
+        for i in range(0, 50):
+            if "Devices reloaded, 3 device" in caplog.text: break
+            time.sleep(0.1)
+        assert bridges[-1]._values_cache["dev_eui0"]["object"]["counter"] == 77
+        assert bridges[-1]._values_cache["dev_eui2"] == {}
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).publish(restart_topic, "full")
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).wait_empty_queue()
+
+    with mock.patch("chirpha.mqtt.ChirpToHA.publish_device_discovery", new=blocking_publish_device_discovery):
+        common.chirp_setup_and_run_test(caplog, run_test_values_cache_during_reload, conf_file=MESSAGE_QUEUE_INCREMENTAL_CONFIGURATION_FILE, test_params=dict(devices=2, codec=1))
+
+
+def test_asyncio_runtime(caplog):
+    """Test messages, bridge tasks and timers are handled on bridge event loop, not on MQTT network or executor threads."""
+    handled = []
+
+    def recording(name, method):
+        def recording_method(self, *args, **kwargs):
+            try:
+                on_loop = asyncio.get_running_loop() is self._loop
+            except RuntimeError:    # no running event loop in thread
+                on_loop = False
+            handled.append((name, on_loop))
+            return method(self, *args, **kwargs)
+        return recording_method
+
+    def run_test_asyncio_runtime(config):
+        topic = f"application/{config.get(CONF_APPLICATION_ID)}/device/dev_eui0/event/up"
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).publish(topic, '{"object": {"counter": 77}}')
+        common.reload_devices(config)
+        for i in range(0, 50):
+            if {"process_up", "publish_devices", "disable_cur"} <= {name for name, on_loop in handled}: break
+            time.sleep(0.1)
+        assert {"process_config", "process_up", "publish_devices", "disable_cur"} <= {name for name, on_loop in handled}
+        assert [name for name, on_loop in handled if not on_loop] == []
+        assert "Using asyncio runtime" in caplog.text
+
+    with mock.patch.multiple(
+        "chirpha.mqtt.ChirpToHA",
+        **{name: recording(name, getattr(chirpha.mqtt.ChirpToHA, name)) for name in ("process_config", "process_up", "publish_devices", "disable_cur")},
+    ):
+        common.chirp_setup_and_run_test(caplog, run_test_asyncio_runtime, conf_file=ASYNCIO_RUNTIME_CONFIGURATION_FILE, test_params=dict(devices=2, codec=1))
+
+
+def test_asyncio_device_status(caplog):
+    """Test device visibility for per device online status is read outside of event loop, device events keep order."""
+    read_on_loop = []
+    get_device_visibility_info = chirpha.grpc.ChirpGrpc.get_device_visibility_info
+
+    def recording_get_device_visibility_info(self, dev_eui):
+        try:
+            asyncio.get_running_loop()
+            read_on_loop.append(dev_eui)
+        except RuntimeError:    # executor thread
+            pass
+        return get_device_visibility_info(self, dev_eui)
+
+    def run_test_asyncio_device_status(config):
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).get_published()
+        topic = f"application/{config.get(CONF_APPLICATION_ID)}/device/dev_eui0/event/up"
+        for counter in (77, 78):
+            mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).publish(topic, f'{{"object": {{"counter": {counter}}}}}')
+        for i in range(0, 50):
+            if common.count_messages(r'/device/dev_eui0/event/cur$', r'"counter": 78', keep_history=True): break
+            time.sleep(0.1)
+        cur_messages = [
+            json.loads(published[1]) for published in mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).get_published(keep_history=True)
+            if published[0].endswith("/device/dev_eui0/event/cur") and published[1] and "counter" in published[1]
+        ]
+        assert [message["object"]["counter"] for message in cur_messages][-2:] == [77, 78]
+        assert all("status" in message for message in cur_messages)
+        assert not read_on_loop
+
+    with mock.patch("chirpha.grpc.ChirpGrpc.get_device_visibility_info", new=recording_get_device_visibility_info):
+        common.chirp_setup_and_run_test(caplog, run_test_asyncio_device_status, conf_file=ASYNCIO_PER_DEVICE_CONFIGURATION_FILE, test_params=dict(devices=2, codec=1))
+
+
+def test_device_workers(caplog):
+    """Test uplinks are sharded by device to worker threads keeping per device order."""
+    processed = []
+    process_message = chirpha.mqtt.ChirpToHA.process_message
+
+    def recording_process_message(self, message, route=None):
+        if message.topic.endswith("/event/up"):
+            processed.append((message.topic.split("/")[-3], threading.current_thread().name, json.loads(message.payload)["object"]["counter"]))
+        return process_message(self, message, route)
+
+    def run_test_device_workers(config):
+        for counter in range(1, 6):
+            for dev_no in range(0, 4):
+                topic = f"application/{config.get(CONF_APPLICATION_ID)}/device/dev_eui{dev_no}/event/up"
+                mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).publish(topic, json.dumps({"object": {"counter": counter}}))
+        for i in range(0, 50):
+            if len(processed) == 20: break
+            time.sleep(0.1)
+        assert len(processed) == 20
+        for dev_no in range(0, 4):
+            device_events = [event for event in processed if event[0] == f"dev_eui{dev_no}"]
+            assert [event[2] for event in device_events] == [1, 2, 3, 4, 5]
+            assert len({event[1] for event in device_events}) == 1
+        assert len({event[1] for event in processed}) == 3
+        assert common.count_messages(r'/device/dev_eui3/event/cur$', r'"counter": 5', keep_history=True) == 1
+
+    with mock.patch("chirpha.mqtt.ChirpToHA.process_message", new=recording_process_message):
+        common.chirp_setup_and_run_test(caplog, run_test_device_workers, conf_file=DEVICE_WORKERS_CONFIGURATION_FILE, test_params=dict(devices=4, codec=1))
+
+
+def test_topic_router(caplog):
+    """Test uplinks of devices not tracked by bridge are rejected before payload decoding."""
+
+    def run_test_topic_router(config):
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).get_published()
+        topic = f"application/{config.get(CONF_APPLICATION_ID)}/device/dev_eui_unknown/event/up"
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).publish(topic, '{"object": not json')
+        topic = f"application/{config.get(CONF_APPLICATION_ID)}/device/dev_eui0/event/up"
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).publish(topic, '{"object": {"counter": 77}}')
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).wait_empty_queue()
+        assert common.count_messages(r'/device/dev_eui0/event/cur$', r'"counter": 77', keep_history=True) == 1
+        assert common.count_messages(r'/device/dev_eui_unknown/event/cur$', None, keep_history=True) == 0
+
+    common.chirp_setup_and_run_test(caplog, run_test_topic_router, test_params=dict(devices=1, codec=1))
+
+
+def test_discovery_node_id(caplog, tmp_path):
+    """Test registrations are published and subscribed under bridge node id, disappeared devices are removed."""
+    node_id_file = str(tmp_path / "discovery_node_id.json")
+    subscribed = []
+    subscribe = chirpha.mqtt.ChirpToHA.subscribe
+
+    def recording_subscribe(self, topic):
+        subscribed.append(topic)
+        return subscribe(self, topic)
+
+    def run_test_discovery_node_id(config):
+        node_id_topic = r'^homeassistant/[^/]+/chirp2mqtt_[0-9a-f]{32}/dev_eui\d+_[^/]+/config$'
+        assert common.count_messages(node_id_topic, None, keep_history=True) == get_size("idevices") * get_size("sensors")
+        assert common.count_messages(r'^homeassistant/[^/]+/dev_eui\d+/', None, keep_history=True) == 0
+        assert [topic for topic in subscribed if topic.endswith("/config")] == ["homeassistant/+/+/+/config"]  # to remove registrations published without node id
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).publish("homeassistant/sensor/zigbee2mqtt_0x00158d0001a2b3c4_bridge/temperature/config", '{"device": {}}')   # not bridge registration
+        set_size(devices=1, codec=1)    # device removed
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).get_published()
+        common.reload_devices(config)
+        assert common.count_messages_with_no_payload(node_id_topic) == get_size("sensors")
+
+    def run_test_discovery_node_id_migrated(config):
+        assert [topic for topic in subscribed if topic.endswith("/config")] == [
+            f"homeassistant/+/{chirpha.mqtt.to_lower_case_no_blanks('Chirp2MQTT ' + chirpha.mqtt.generate_unique_id(config))}/+/config",
+        ]
+
+    with mock.patch("chirpha.mqtt.ChirpToHA.subscribe", new=recording_subscribe), mock.patch("chirpha.mqtt.DISCOVERY_NODE_ID_FILE", new=node_id_file):
+        common.chirp_setup_and_run_test(caplog, run_test_discovery_node_id, conf_file=DISCOVERY_NODE_ID_CONFIGURATION_FILE, test_params=dict(devices=2, codec=1))
+        with open(node_id_file, "r") as file:
+            assert json.load(file)["node_id"].startswith("chirp2mqtt_")
+        subscribed.clear()
+        caplog.clear()
+        common.chirp_setup_and_run_test(caplog, run_test_discovery_node_id_migrated, conf_file=DISCOVERY_NODE_ID_CONFIGURATION_FILE, test_params=dict(devices=2, codec=1))
+
+
+def test_discovery_node_id_toggle(caplog, tmp_path):
+    """Test registrations published before node id was set are migrated to node id topics or removed once."""
+    node_id_file = str(tmp_path / "discovery_node_id.json")
+    subscribe = chirpha.mqtt.ChirpToHA.subscribe
+    migrated_topic = "homeassistant/sensor/dev_eui0/counter/config"
+    removed_topic = "homeassistant/sensor/dev_eui5/counter/config"
+
+    def retained_subscribe(self, topic):
+        ret_val = subscribe(self, topic)
+        if topic == "homeassistant/+/+/+/config":   # retained registrations published without node id
+            for old_topic, unique_id in ((migrated_topic, "chirp2mqtt_dev_eui0_counter"), (removed_topic, "chirp2mqtt_dev_eui5_counter")):
+                mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).publish(
+                    old_topic, json.dumps({"device": {"via_device": self._bridge_indentifier}, "unique_id": unique_id, "time_stamp": 1})
+                )
+        return ret_val
+
+    def run_test_discovery_node_id_toggle(config):
+        node_id = chirpha.mqtt.to_lower_case_no_blanks('Chirp2MQTT ' + chirpha.mqtt.generate_unique_id(config))
+        assert common.count_messages(f"^{migrated_topic}$", r'"migrate_discovery": true', keep_history=True) == 1
+        assert common.count_messages_with_no_payload(f"^{migrated_topic}$", keep_history=True) == 1
+        assert common.count_messages(f"^{removed_topic}$", r'"migrate_discovery"', keep_history=True) == 0
+        assert common.count_messages_with_no_payload(f"^{removed_topic}$", keep_history=True) == 1
+        assert common.count_messages(f"^homeassistant/sensor/{node_id}/dev_eui0_counter/config$", r'"unique_id"', keep_history=True) == 2  # published again after migration
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).get_published()
+        common.reload_devices(config)
+        assert common.count_messages_with_no_payload(r'/config$') == 0
+        assert common.count_messages(r'/config$', r'"migrate_discovery"') == 0   # migrated once
+
+    with mock.patch("chirpha.mqtt.ChirpToHA.subscribe", new=retained_subscribe), mock.patch("chirpha.mqtt.DISCOVERY_NODE_ID_FILE", new=node_id_file):
+        common.chirp_setup_and_run_test(caplog, run_test_discovery_node_id_toggle, conf_file=DISCOVERY_NODE_ID_CONFIGURATION_FILE, test_params=dict(devices=2, codec=1))
+        assert os.path.isfile(node_id_file)
+        common.chirp_setup_and_run_test(caplog, None, test_params=dict(devices=2, codec=1))   # node id not set
+        assert not os.path.isfile(node_id_file)
+
+
+def test_config_hash(caplog, tmp_path):
+    """Test unchanged registrations are not published again on reload or restart, disappeared devices are removed."""
+    config_hash_file = str(tmp_path / "config_hashes.json")
+
+    def run_test_config_hash(config):
+        assert common.count_messages(r'/dev_eui\d+/.*/config$', r'"time_stamp"', keep_history=True) == 0
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).get_published()
+        common.reload_devices(config)   # nothing changed
+        assert common.count_messages(r'/config$', None) == 0
+        set_size(devices=1, codec=1)    # device removed
+        common.reload_devices(config)
+        assert common.count_messages(r'/dev_eui\d+/.*/config$', None, keep_history=True) == get_size("sensors")
+        assert common.count_messages_with_no_payload(r'/dev_eui1/.*/config$') == get_size("sensors")
+        set_size(devices=2, codec=2)    # device added, profile changed
+        common.reload_devices(config)
+        assert mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_devices == get_size("idevices")
+
+    def run_test_config_hash_restart(config):
+        assert common.count_messages(r'/dev_eui\d+/.*/config$', r'"unique_id"', keep_history=True) == 0     # not changed since previous run
+        assert common.count_messages_with_no_payload(r'/dev_eui1/.*/config$', keep_history=True) == get_size("sensors")  # disappeared since previous run
+        restart_topic = f"application/{config.get(CONF_APPLICATION_ID)}/bridge/restart"
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).publish(restart_topic, "full")    # all registrations published again
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).wait_empty_queue()
+
+    with mock.patch("chirpha.mqtt.CONFIG_HASH_FILE", new=config_hash_file):
+        common.chirp_setup_and_run_test(caplog, run_test_config_hash, conf_file=CONFIG_HASH_CONFIGURATION_FILE, test_params=dict(devices=2, codec=1))
+        caplog.clear()
+        common.chirp_setup_and_run_test(caplog, run_test_config_hash_restart, conf_file=CONFIG_HASH_CONFIGURATION_FILE, test_params=dict(devices=1, codec=2))
+        assert "registration hash(es) loaded" in caplog.text
+
+
+def test_device_discovery(caplog):
+    """Test one registration per device is published, per entity registrations of the device are migrated."""
+
+    def run_test_device_discovery(config):
+        device_topic = r'^homeassistant/device/dev_eui\d+/config$'
+        assert common.count_messages(device_topic, r'"components"', keep_history=True) == get_size("idevices")
+        assert common.count_messages(r'^homeassistant/(?!device/)[^/]+/dev_eui\d+/', None, keep_history=True) == 0
+        published = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).get_published()
+        device_config = json.loads([msg[1] for msg in published if msg[0] == "homeassistant/device/dev_eui0/config"][-1])
+        assert len(device_config["components"]) == get_size("sensors")
+        assert "availability" in device_config and "state_topic" in device_config
+        assert not [component for component in device_config["components"].values() if "device" in component or "availability" in component]
+        component_id, component = next(iter(device_config["components"].items()))
+        migrated_topic = f"homeassistant/{component['platform']}/dev_eui0/{component_id}/config"
+        removed_topic = "homeassistant/sensor/dev_eui0/removed/config"
+        for topic, unique_id in ((migrated_topic, component["unique_id"]), (removed_topic, "chirp2mqtt_dev_eui0_removed")):   # registrations of previous version
+            mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).publish(
+                topic, json.dumps({"device": device_config["device"], "unique_id": unique_id, "time_stamp": device_config["time_stamp"] - 1})
+            )
+        common.reload_devices(config)
+        assert common.count_messages(f"^{migrated_topic}$", r'"migrate_discovery": true', keep_history=True) == 1
+        assert common.count_messages_with_no_payload(f"^{migrated_topic}$", keep_history=True) == 1
+        assert common.count_messages(f"^{removed_topic}$", r'"migrate_discovery"', keep_history=True) == 0
+        assert common.count_messages_with_no_payload(f"^{removed_topic}$", keep_history=True) == 1
+        assert common.count_messages(r'^homeassistant/device/dev_eui0/config$', r'"components"') == 2    # published again after migration
+        common.reload_devices(config)
+
+    common.chirp_setup_and_run_test(caplog, run_test_device_discovery, conf_file=DEVICE_DISCOVERY_CONFIGURATION_FILE, test_params=dict(devices=2, codec=1))
+
+
+def test_compact_discovery(caplog):
+    """Test registrations are published with abbreviated keys and '~' device topic, disappeared devices are removed."""
+
+    def run_test_compact_discovery(config):
+        published = [msg for msg in mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).get_published() if re.search(r'/dev_eui\d+/.*/config$', msg[0])]
+        assert len(published) == get_size("idevices") * get_size("sensors")
+        for topic, payload, _, _ in published:
+            discovery_config = json.loads(payload)
+            dev_eui = topic.split("/")[2]
+            assert discovery_config["~"] == f"application/{config.get(CONF_APPLICATION_ID)}/device/{dev_eui}"
+            assert discovery_config["stat_t"] == "~/event/up" and "state_topic" not in discovery_config
+            expanded = chirpha.discovery.expand_discovery_config(discovery_config)
+            assert expanded["state_topic"] == f"{discovery_config['~']}/event/up"
+            assert expanded["device"]["via_device"].startswith("chirp2mqtt_bridge_")
+        set_size(devices=1, codec=1)    # device removed
+        common.reload_devices(config)
+        assert common.count_messages_with_no_payload(r'/dev_eui1/.*/config$') == get_size("sensors")
+
+    common.chirp_setup_and_run_test(caplog, run_test_compact_discovery, conf_file=COMPACT_DISCOVERY_CONFIGURATION_FILE, test_params=dict(devices=2, codec=1))
+
+
+@pytest.mark.parametrize("codec", [2, 10, 17, 18, 21])
+def test_discovery_templates(caplog, codec):
+    """Test discovery payloads prepared from profile entity templates equal payloads prepared one by one."""
+    sensors = {}
+    get_sensor_conf_data = chirpha.mqtt.ChirpToHA.get_sensor_conf_data
+
+    def recording_get_sensor_conf_data(self, dev_id, sensor, device, dev_conf):
+        sensor_args = (dev_id, copy.deepcopy(sensor), copy.deepcopy(device), copy.deepcopy(dev_conf))
+        conf_data = get_sensor_conf_data(self, dev_id, sensor, device, dev_conf)
+        sensors[(dev_conf["dev_eui"], dev_id)] = (self, sensor_args, conf_data)     # last reload kept
+        return conf_data
+
+    with mock.patch("chirpha.mqtt.ChirpToHA.get_sensor_conf_data", new=recording_get_sensor_conf_data):
+        common.chirp_setup_and_run_test(caplog, None, conf_file=DISCOVERY_TEMPLATES_CONFIGURATION_FILE, test_params=dict(devices=3, codec=codec))
+    assert len(sensors) == get_size("idevices") * get_size("sensors")
+    templates = {}
+    for bridge, (dev_id, sensor, device, dev_conf), conf_data in sensors.values():
+        expected = bridge.get_conf_data(dev_id, copy.deepcopy(sensor), copy.deepcopy(device), dev_conf)
+        assert conf_data == expected
+        dev_settings = f"dev_eui{dev_conf['dev_eui']}"
+        if dev_settings in sensor["entity_conf"] or dev_settings in device:     # prepared one by one
+            continue
+        template_key = (
+            dev_conf["codec_hash"], dev_id, sensor["entity_conf"].get("uplink_interval"), dev_conf["measurement_names"].get(dev_id), bool(dev_conf["dev_name"])
+        )
+        if template_key not in templates:
+            templates[template_key] = bridge.compile_discovery_template(dev_id, copy.deepcopy(sensor), copy.deepcopy(device), dev_conf)
+        assert bridge.fill_discovery_template(templates[template_key], dev_conf) == expected
+    assert len(templates) == get_size("sensors")    # devices share profile
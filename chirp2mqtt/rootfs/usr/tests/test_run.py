@@ -2,18 +2,20 @@
 
 import time
 import logging
+from unittest import mock
 
 from chirpha.const import BRIDGE_CONF_COUNT, CONF_APPLICATION_ID
 from chirpha.const import CONF_OPTIONS_START_DELAY, CONF_OPTIONS_RESTORE_AGE, CONF_OPTIONS_ONLINE_PER_DEVICE
 
 from tests import common
+import chirpha.grpc
 
-from .patches import get_size, mqtt, set_size
+from .patches import get_size, mqtt, set_size, getdevcount
 from tests.common import PAYLOAD_PRINT_CONFIGURATION_FILE, REGULAR_CONFIGURATION_FILE, REGULAR_CONFIGURATION_FILE_INFO
 from tests.common import REGULAR_CONFIGURATION_FILE_ERROR, CONF_MQTT_DISC, WITH_DELAY_CONFIGURATION_FILE
 from tests.common import REGULAR_CONFIGURATION_FILE_INFO_NO_MQTT, REGULAR_CONFIGURATION_FILE_DEBUG_NO_MQTT
 from tests.common import REGULAR_CONFIGURATION_FILE_WRONG_LOG_LEVEL, REGULAR_CONFIGURATION_PER_DEVICE, REGULAR_CONFIGURATION_NONZERO_DELAYS
-from tests.common import REGULAR_CONFIGURATION_EXPIRE_AFTER
+from tests.common import REGULAR_CONFIGURATION_EXPIRE_AFTER, VISIBILITY_TTL_CONFIGURATION_FILE
 from tests.common import MIN_SLEEP
 
 def test_ha_status_received(caplog):
@@ -298,6 +300,26 @@ def test_ha_online_rec(caplog):
 
     common.chirp_setup_and_run_test(caplog, run_test_ha_online_rec, test_params=dict(devices=1, codec=0), conf_file=WITH_DELAY_CONFIGURATION_FILE, allowed_msg_level=logging.WARNING)
 
+def test_bridge_on_deferred(caplog):
+    """Test message processing is not blocked by start delay, values are restored after delay."""
+
+    def run_test_bridge_on_deferred(config):
+        for i in range(0, 30):  # initial start restoration might still be in progress
+            if "Previous sensor values restored" in caplog.text: break
+            time.sleep(MIN_SLEEP)
+        caplog.clear()
+        reload_time = time.time()
+        common.reload_devices(config)
+        assert time.time() - reload_time < config[CONF_OPTIONS_START_DELAY]
+        assert "Previous sensor values restored" not in caplog.text
+        for i in range(0, 30):
+            if "Previous sensor values restored" in caplog.text: break
+            time.sleep(MIN_SLEEP)
+        assert "Previous sensor values restored" in caplog.text
+        assert time.time() - reload_time >= config[CONF_OPTIONS_START_DELAY]
+
+    common.chirp_setup_and_run_test(caplog, run_test_bridge_on_deferred, test_params=dict(devices=1, codec=0), conf_file=WITH_DELAY_CONFIGURATION_FILE, allowed_msg_level=logging.WARNING)
+
 def test_no_mqtt_short_error_message(caplog):
     """Test payload join for array data with more than 1 sublevel."""
 
@@ -440,6 +462,58 @@ def test_per_device_online(caplog):
 
     common.chirp_setup_and_run_test(caplog, run_test_per_device_online, test_params=dict(devices=1, codec=0), conf_file=REGULAR_CONFIGURATION_PER_DEVICE, allowed_msg_level=logging.WARNING)
 
+def test_device_visibility_cache(caplog):
+    """Test device visibility data is cached, refreshed by uplinks and served stale if server fails."""
+
+    def publish_up(config):
+        for i in range(0, mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_devices):
+            dev_eui = f"dev_eui{i}"
+            topic = f"application/{config.get(CONF_APPLICATION_ID)}/device/{dev_eui}/event/up"
+            msg = f'{{"batteryLevel": 76}}'
+            mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).publish(topic, msg)
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).wait_empty_queue()
+
+    def run_test_device_visibility_cache(config):
+        time.sleep(MIN_SLEEP+MIN_SLEEP)
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).get_published()
+        device_reads = getdevcount[0]
+        publish_up(config)
+        publish_up(config)
+        assert getdevcount[0] == device_reads + mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_devices  # second status from cache
+        no_of_cur_msgs_on = common.count_messages(r'/device/.*/cur$', '"status": "online"', keep_history=True)
+        assert no_of_cur_msgs_on == mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_devices    # last seen refreshed by uplink
+        time.sleep(config.get("options_visibility_ttl"))
+        set_size(devices=1, codec=0, grpc=0)    # server not reachable
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).get_published()
+        publish_up(config)
+        no_of_cur_msgs_on = common.count_messages(r'/device/.*/cur$', '"status": "online"', keep_history=True)
+        assert no_of_cur_msgs_on == mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).stat_devices
+        assert "visibility data not refreshed" in caplog.text
+        set_size(devices=1, codec=0)
+
+    common.chirp_setup_and_run_test(caplog, run_test_device_visibility_cache, test_params=dict(devices=1, codec=0), conf_file=VISIBILITY_TTL_CONFIGURATION_FILE, allowed_msg_level=logging.WARNING)
+
+def test_uplink_event_time(caplog):
+    """Test device last seen time is taken from uplink event time, bridge time is used for uplink without event time."""
+    last_seen = []
+    update_device_last_seen = chirpha.grpc.ChirpGrpc.update_device_last_seen
+
+    def recording_update_device_last_seen(self, dev_eui, time_stamp):
+        last_seen.append(time_stamp)
+        return update_device_last_seen(self, dev_eui, time_stamp)
+
+    def run_test_uplink_event_time(config):
+        topic = f"application/{config.get(CONF_APPLICATION_ID)}/device/dev_eui0/event/up"
+        for event_time in ('"2024-01-02T03:04:05.123456789Z"', '"2024-01-02T05:04:05+02:00"', '"not a time"', None):
+            msg = f'{{"batteryLevel": 76, "time": {event_time}}}' if event_time else '{"batteryLevel": 76}'
+            mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).publish(topic, msg)
+        mqtt.Client(mqtt.CallbackAPIVersion.VERSION2).wait_empty_queue()
+        assert last_seen[:2] == [1704164645.123456, 1704164645.0]
+        assert all(abs(time_stamp - time.time()) < 5 for time_stamp in last_seen[2:]) and len(last_seen) == 4
+
+    with mock.patch("chirpha.grpc.ChirpGrpc.update_device_last_seen", new=recording_update_device_last_seen):
+        common.chirp_setup_and_run_test(caplog, run_test_uplink_event_time, test_params=dict(devices=1, codec=0), conf_file=VISIBILITY_TTL_CONFIGURATION_FILE, allowed_msg_level=logging.WARNING)
+
 def test_not_per_device_online(caplog):
     """Test sensor device status configuration for not per device checks."""
 